@@ -0,0 +1,406 @@
+import io
+import json
+import time
+import asyncio
+from pathlib import Path
+import platform
+import tempfile
+from functools import partial
+import contextlib
+from collections.abc import Callable, Awaitable
+
+import cv2
+import yaml
+import numpy as np
+import logfire
+from pydantic import Field, BaseModel
+import PIL.Image as Image
+
+from auto_click.cores.config import ConfigModel
+from auto_click.cores.device import AsyncAdbDevice
+from auto_click.cores.compare import (
+    Frame,
+    ImageComparison,
+    select_matcher,
+    _sync_match_pyramid,
+    _sync_match_template,
+    _load_reduced_template,
+    _load_and_convert_template,
+)
+from auto_click.cores.positions import PositionIndex
+
+
+def _synthetic_frame(button_image: np.ndarray, width: int, height: int) -> np.ndarray:
+    """Pastes a template onto a textured background so matching has realistic distractors."""
+    rng = np.random.default_rng(seed=0)
+    background = rng.integers(0, 255, size=(height // 8, width // 8), dtype=np.uint8)
+    frame = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+    template_h, template_w = button_image.shape[:2]
+    y, x = (height - template_h) // 3, (width - template_w) // 2
+    frame[y : y + template_h, x : x + template_w] = button_image
+    return frame
+
+
+def _timeit(func: Callable[[], object], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def _sample(func: Callable[[], object], repeat: int) -> list[float]:
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+async def _sample_async(func: Callable[[], Awaitable[object]], repeat: int) -> list[float]:
+    await func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "mean_ms": round(float(np.mean(samples)), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "runs": len(samples),
+    }
+
+
+class RecordedFrame(BaseModel):
+    name: str = Field(..., description="The file name of the frame.")
+    png: bytes = Field(..., description="The PNG encoded frame.")
+    positions: dict[str, tuple[int, int]] = Field(
+        default_factory=dict,
+        description="The top-left corner of each template pasted into a synthetic frame.",
+    )
+
+
+def _load_corpus(
+    corpus_dir: Path, config: ConfigModel, width: int, height: int
+) -> list[RecordedFrame]:
+    """Loads recorded frames of a game, or builds synthetic ones when none are checked in.
+
+    Each synthetic frame contains one template of the config at a fixed position, so
+    repeated runs over the corpus see the same screens in the same order.
+    """
+    recorded = sorted(corpus_dir.glob("*.png"))
+    if recorded:
+        return [RecordedFrame(name=path.name, png=path.read_bytes()) for path in recorded]
+    frames = []
+    for index, image_cfg in enumerate(config.image_list):
+        button_image = cv2.imread(image_cfg.image_path)
+        rng = np.random.default_rng(seed=index)
+        background = rng.integers(0, 255, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        frame = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+        template_h, template_w = button_image.shape[:2]
+        x = int(rng.integers(0, width - template_w))
+        y = int(rng.integers(0, height - template_h))
+        frame[y : y + template_h, x : x + template_w] = button_image
+        _, png = cv2.imencode(".png", frame)
+        frames.append(
+            RecordedFrame(
+                name=f"synthetic_{index:02d}.png",
+                png=png.tobytes(),
+                positions={image_cfg.image_path: (x, y)},
+            )
+        )
+    return frames
+
+
+class Benchmark(BaseModel):
+    """Times the capture decode and template matching hot paths.
+
+    Attributes:
+        config_path (str): The game config whose templates are benchmarked.
+        corpus_dir (str): Recorded frames of the game; synthetic frames are used if empty.
+        width (int): The width of synthetic frames.
+        height (int): The height of synthetic frames.
+        repeat (int): How many times each operation is timed.
+
+    Methods:
+        suite: Runs every benchmark and writes the results as JSON.
+        pyramid: Compares full-resolution and pyramid matching.
+        matchers: Picks the fastest accurate matcher of every template.
+        taps: Times taps on a device through `input` and through `sendevent`.
+    """
+
+    config_path: str = Field(default="./configs/games/mahjong.yaml")
+    corpus_dir: str = Field(
+        default="", description="Defaults to ./data/frames/<config name> when empty."
+    )
+    width: int = Field(default=1920, description="The width of the synthetic frame.")
+    height: int = Field(default=1080, description="The height of the synthetic frame.")
+    repeat: int = Field(default=10, description="How many times each match is timed.")
+
+    def _load_config(self) -> ConfigModel:
+        config_dict = yaml.safe_load(Path(self.config_path).read_text(encoding="utf-8"))
+        return ConfigModel(**config_dict)
+
+    def _corpus(self, config: ConfigModel) -> list[RecordedFrame]:
+        corpus_dir = Path(self.corpus_dir or f"./data/frames/{Path(self.config_path).stem}")
+        return _load_corpus(corpus_dir, config, self.width, self.height)
+
+    def _bench_decode(self, frames: list[RecordedFrame]) -> dict[str, list[float]]:
+        samples: dict[str, list[float]] = {
+            "decode/png": [],
+            "decode/pil": [],
+            "decode/rgba": [],
+            "gray/bgr": [],
+        }
+        for recorded in frames:
+            pil_image = Image.open(io.BytesIO(recorded.png))
+            pil_image.load()
+            color = cv2.imdecode(np.frombuffer(recorded.png, dtype=np.uint8), cv2.IMREAD_COLOR)
+            rgba = cv2.cvtColor(color, cv2.COLOR_BGR2RGBA)
+            samples["decode/png"] += _sample(
+                partial(Frame.from_screenshot, recorded.png), self.repeat
+            )
+            samples["decode/pil"] += _sample(
+                partial(Frame.from_screenshot, pil_image), self.repeat
+            )
+            samples["decode/rgba"] += _sample(partial(Frame.from_screenshot, rgba), self.repeat)
+            samples["gray/bgr"] += _sample(
+                partial(cv2.cvtColor, color, cv2.COLOR_BGR2GRAY), self.repeat
+            )
+        return samples
+
+    def _bench_match(
+        self, config: ConfigModel, frames: list[RecordedFrame]
+    ) -> dict[str, list[float]]:
+        gray = Frame.from_screenshot(frames[0].png).gray
+        samples: dict[str, list[float]] = {}
+        for image_cfg in config.image_list:
+            button_image = _load_and_convert_template(image_cfg.image_path)
+            template_h, template_w = button_image.shape[:2]
+            samples.setdefault(f"match_template/{template_h}x{template_w}", []).extend(
+                _sample(partial(_sync_match_template, gray, button_image), self.repeat)
+            )
+        return samples
+
+    async def _bench_find(
+        self, config: ConfigModel, frames: list[RecordedFrame]
+    ) -> dict[str, list[float]]:
+        samples: dict[str, list[float]] = {"find/full": [], "find/roi": []}
+        for recorded in frames:
+            frame = Frame.from_screenshot(recorded.png)
+            for image_cfg in config.image_list:
+                if image_cfg.image_path not in recorded.positions and recorded.positions:
+                    continue
+                comparison = partial(
+                    ImageComparison, image_cfg=image_cfg, screenshot=frame, match_mode="full"
+                )
+                samples["find/full"] += await _sample_async(
+                    lambda comparison=comparison: comparison().find(), self.repeat
+                )
+                if image_cfg.image_path in recorded.positions:
+                    x, y = recorded.positions[image_cfg.image_path]
+                    button_h, button_w = _load_and_convert_template(image_cfg.image_path).shape
+                    position_index = PositionIndex()
+                    position_index.update(image_cfg, x + button_w // 2, y + button_h // 2)
+                    samples["find/roi"] += await _sample_async(
+                        lambda comparison=comparison, index=position_index: comparison(
+                            position_index=index
+                        ).find(),
+                        self.repeat,
+                    )
+        return {name: values for name, values in samples.items() if values}
+
+    async def _bench_tick(
+        self, config_dict: dict[str, object], frames: list[RecordedFrame]
+    ) -> dict[str, list[float]]:
+        # The controller pulls in the desktop and browser backends, import it only when needed
+        from auto_click.controller import RemoteController
+        from auto_click.cores.screenshot import Screenshot, ShiftPosition
+
+        class StandInController(RemoteController):
+            """Replays the corpus as the device screen and records clicks instead of sending them."""
+
+            clicks: list[tuple[int, int]] = Field(default_factory=list)
+
+            async def get_screenshot(self) -> Screenshot:
+                recorded = frames[self.tick_count % len(frames)]
+                return Screenshot(
+                    screenshot=recorded.png, device=ShiftPosition(shift_x=0, shift_y=0)
+                )
+
+            async def click_button(self, device_details: Screenshot) -> None:
+                self.clicks.append((self.found_result.button_x, self.found_result.button_y))
+
+        # Positions learned during the run must not leak into the real ./logs
+        with tempfile.TemporaryDirectory() as workdir, contextlib.chdir(workdir):
+            controller = StandInController(**config_dict)
+            samples = await _sample_async(controller.run, self.repeat * len(frames))
+            controller.position_index.close()
+        return {"tick/run": samples}
+
+    def suite(
+        self,
+        output: str = "./logs/benchmark.json",
+        baseline: str | None = None,
+        tolerance: float = 1.25,
+        tick: bool = True,
+    ) -> None:
+        """Runs every benchmark and writes machine-readable results.
+
+        Args:
+            output (str): Where to write the results as JSON.
+            baseline (str | None): A previous results file to check for regressions.
+            tolerance (float): How much slower than the baseline p50 a benchmark may get.
+            tick (bool): Whether to time a full controller tick against a stand-in device.
+
+        Raises:
+            SystemExit: If a benchmark regressed beyond the tolerance.
+        """
+        config = self._load_config()
+        frames = self._corpus(config)
+        samples = self._bench_decode(frames)
+        samples.update(self._bench_match(config, frames))
+        samples.update(asyncio.run(self._bench_find(config, frames)))
+        if tick:
+            config_dict = config.model_dump()
+            for image_dict in config_dict["image_list"]:
+                # The tick runs in a scratch directory, so templates need absolute paths
+                image_dict["image_path"] = Path(image_dict["image_path"]).resolve().as_posix()
+                image_dict["delay_after_click"] = 0
+            samples.update(asyncio.run(self._bench_tick(config_dict, frames)))
+        results = {name: _summarize(values) for name, values in samples.items()}
+
+        report = {
+            "config": self.config_path,
+            "frames": [recorded.name for recorded in frames],
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "results": results,
+        }
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        for name, summary in results.items():
+            print(  # noqa: T201
+                f"{name:<32} mean={summary['mean_ms']:8.3f}ms p50={summary['p50_ms']:8.3f}ms "
+                f"p95={summary['p95_ms']:8.3f}ms"
+            )
+
+        if baseline is not None:
+            baseline_results = json.loads(Path(baseline).read_text(encoding="utf-8"))["results"]
+            regressions = [
+                f"{name}: p50 {results[name]['p50_ms']:.3f}ms > "
+                f"{tolerance} x {previous['p50_ms']:.3f}ms"
+                for name, previous in baseline_results.items()
+                if name in results and results[name]["p50_ms"] > previous["p50_ms"] * tolerance
+            ]
+            if regressions:
+                print("Regressions:\n" + "\n".join(regressions))  # noqa: T201
+                raise SystemExit(1)
+
+    def pyramid(self, factor: int = 2) -> None:
+        """Compares full-resolution matching with coarse-to-fine pyramid matching.
+
+        Args:
+            factor (int): The downscale factor of the coarse level.
+        """
+        config = self._load_config()
+        total_full, total_pyramid = 0.0, 0.0
+        for image_cfg in config.image_list:
+            button_image = _load_and_convert_template(image_cfg.image_path)
+            reduced_button_image = _load_reduced_template(image_cfg.image_path, factor)
+            gray = _synthetic_frame(button_image, self.width, self.height)
+            reduced = cv2.resize(
+                gray, (self.width // factor, self.height // factor), interpolation=cv2.INTER_AREA
+            )
+            full_val, full_loc = _sync_match_template(gray, button_image)
+            pyramid_val, pyramid_loc = _sync_match_pyramid(
+                gray, reduced, button_image, reduced_button_image, factor
+            )
+            full_ms = _timeit(partial(_sync_match_template, gray, button_image), self.repeat)
+            pyramid_ms = _timeit(
+                partial(
+                    _sync_match_pyramid, gray, reduced, button_image, reduced_button_image, factor
+                ),
+                self.repeat,
+            )
+            total_full += full_ms
+            total_pyramid += pyramid_ms
+            print(  # noqa: T201
+                f"{Path(image_cfg.image_path).name:<24} full={full_ms:7.2f}ms "
+                f"pyramid={pyramid_ms:7.2f}ms speedup={full_ms / pyramid_ms:5.2f}x "
+                f"same_location={full_loc == pyramid_loc} score_delta={full_val - pyramid_val:.4f}"
+            )
+        print(  # noqa: T201
+            f"{'total':<24} full={total_full:7.2f}ms pyramid={total_pyramid:7.2f}ms "
+            f"speedup={total_full / total_pyramid:5.2f}x"
+        )
+
+    def matchers(self, output: str = "./logs/matchers.json", repeat: int = 3) -> None:
+        """Times every matcher on the corpus and stores the fastest accurate one per template.
+
+        On recorded frames, where the template positions are unknown, the `ccoeff` matcher
+        decides whether and where each template is on the frame.
+
+        Args:
+            output (str): The selection file read by the controller.
+            repeat (int): How many times each matcher runs on each frame.
+        """
+        config = self._load_config()
+        frames = self._corpus(config)
+        grays = [Frame.from_screenshot(frame.png).gray for frame in frames]
+        selection: dict[str, str] = {}
+        for image_cfg in config.image_list:
+            button_image = _load_and_convert_template(image_cfg.image_path)
+            samples = []
+            for frame, gray in zip(frames, grays, strict=True):
+                expected = frame.positions.get(image_cfg.image_path)
+                if expected is None and not frame.positions:
+                    max_val, max_loc = _sync_match_template(gray, button_image)
+                    expected = max_loc if max_val > image_cfg.confidence else None
+                samples.append((gray, expected))
+            name, timings = select_matcher(
+                button_image, samples, image_cfg.confidence, repeat=repeat
+            )
+            selection[image_cfg.image_path] = name
+            measured = " ".join(f"{key}={value:7.2f}ms" for key, value in timings.items())
+            print(f"{Path(image_cfg.image_path).name:<24} {name:<7} {measured}")  # noqa: T201
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(selection, indent=2), encoding="utf-8")
+
+    def taps(self, serial: str, x: int = 0, y: int = 0) -> None:
+        """Times taps on a device through the `input` command and through `sendevent`.
+
+        Every tap lands on the device, so pick a point where tapping does nothing.
+
+        Args:
+            serial (str): The device serial.
+            x (int): The x coordinate of the taps.
+            y (int): The y coordinate of the taps.
+        """
+
+        async def _run() -> None:
+            for touch_injection in (False, True):
+                device = AsyncAdbDevice(serial=serial, touch_injection=touch_injection)
+                await device.connect()
+                samples = await _sample_async(partial(device.click, x, y), self.repeat)
+                mode = "sendevent" if device._input.touch is not None else "input"  # noqa: SLF001
+                await device.close()
+                summary = " ".join(f"{key}={value}" for key, value in _summarize(samples).items())
+                print(f"{mode:<10} {summary}")  # noqa: T201
+
+        asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    import fire
+
+    logfire.configure(send_to_logfire=False, console=False)
+
+    fire.Fire(Benchmark)
@@ -6,7 +6,11 @@ from pathlib import Path
 import yaml
 from pydantic import Field, BaseModel
 
+from auto_click.scheduler import PollingScheduler
 from auto_click.controller import RemoteController
+from auto_click.cores.notify import dispatcher
+from auto_click.cores.reload import ConfigWatcher
+from auto_click.cores.metrics import metrics
 
 logging.getLogger("sqlalchemy.engine.Engine").disabled = True
 
@@ -16,24 +20,104 @@ class AutoClicker(BaseModel):
     loop_delay: float = Field(
         default=0.1, description="Delay in seconds between loop iterations to prevent CPU overuse"
     )
+    max_loop_delay: float = Field(
+        default=2.0, description="The longest delay in seconds while the screen is idle"
+    )
+    backoff_factor: float = Field(
+        default=1.5, description="How much the delay grows after each idle iteration"
+    )
+    metrics_path: str | None = Field(
+        default=None, description="Periodically dump per-stage tick timings to this JSON file"
+    )
+    metrics_interval: float = Field(
+        default=30.0, description="Seconds between dumps of the tick timings"
+    )
+    metrics_port: int | None = Field(
+        default=None, description="Serve the tick timings over HTTP on this local port"
+    )
+    reload_interval: float | None = Field(
+        default=1.0,
+        description="Seconds between checks of the config file for changes, never reloaded when None",
+    )
 
-    async def load_yaml(self) -> dict[str, Any]:
-        config_obj = Path(self.config_path)
+    async def load_yaml(self, config_path: str | None = None) -> dict[str, Any]:
+        config_obj = Path(config_path or self.config_path)
         config_content = config_obj.read_text(encoding="utf-8")
         config_dict = yaml.safe_load(config_content)
         return config_dict
 
-    async def __call__(self) -> None:
-        config = await self.load_yaml()
-        remote_controller = RemoteController(**config)
+    async def start_metrics(self) -> list[asyncio.Task[None]]:
+        """Starts exporting tick timings as configured, returning the tasks to cancel."""
+        tasks = []
+        if self.metrics_path is not None:
+            tasks.append(
+                asyncio.create_task(
+                    metrics.dump_periodically(self.metrics_path, self.metrics_interval)
+                )
+            )
+        if self.metrics_port is not None:
+            server = await metrics.serve(port=self.metrics_port)
+            tasks.append(asyncio.create_task(server.serve_forever()))
+        return tasks
+
+    async def stop_metrics(self, tasks: list[asyncio.Task[None]]) -> None:
+        for task in tasks:
+            task.cancel()
+        if self.metrics_path is not None:
+            await asyncio.to_thread(metrics.dump, self.metrics_path)
+
+    async def watch_config(
+        self,
+        remote_controller: RemoteController,
+        config_path: str,
+        overrides: dict[str, Any] | None = None,
+    ) -> None:
+        """Hands every valid change of a config file to the controller for its next tick."""
+        watcher = ConfigWatcher(
+            path=config_path, interval=self.reload_interval, overrides=overrides or {}
+        )
+        async for config in watcher.changes():
+            remote_controller.pending_config = config
+
+    async def drive(self, remote_controller: RemoteController) -> None:
+        """Runs the controller until its task is done or an error stops it."""
+        scheduler = PollingScheduler(
+            min_delay=self.loop_delay,
+            max_delay=max(self.max_loop_delay, self.loop_delay),
+            backoff_factor=self.backoff_factor,
+        )
         while True:
+            # A changed config is swapped in between ticks, never in the middle of one
+            await remote_controller.reload()
             await remote_controller.run()
             if remote_controller.task_done:
                 break
             if remote_controller.error_occurred:
                 break
-            # Small delay to prevent CPU overuse
-            await asyncio.sleep(self.loop_delay)
+            # Poll quickly while things happen and back off on an idle screen
+            delay = scheduler.next_delay(
+                clicked=remote_controller.clicked,
+                matched=remote_controller.matched,
+                screen_changed=remote_controller.change_detector.any_dirty,
+            )
+            await asyncio.sleep(delay)
+
+    async def __call__(self) -> None:
+        config = await self.load_yaml()
+        remote_controller = RemoteController(**config)
+        metrics_tasks = await self.start_metrics()
+        watcher = None
+        if self.reload_interval is not None:
+            watcher = asyncio.create_task(self.watch_config(remote_controller, self.config_path))
+        try:
+            await self.drive(remote_controller)
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            await self.stop_metrics(metrics_tasks)
+            await asyncio.to_thread(remote_controller.position_index.close)
+            await asyncio.to_thread(remote_controller.archiver.close)
+            await dispatcher.close()
 
 
 def main() -> None:
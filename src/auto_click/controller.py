@@ -1,26 +1,83 @@
+from typing import get_args
 import asyncio
+from pathlib import Path
 import secrets
 import datetime
 from functools import cached_property
 
 import pytz
+import numpy as np
+import orjson
 import logfire
-from adbutils import AdbDevice
-from pydantic import Field, computed_field
+from pydantic import Field, computed_field, model_validator
 import pyautogui
 from adbutils.errors import AdbError
 from playwright.async_api import Page
 
-from .cores.config import ConfigModel
+from .cores.pool import MatchPool
+from .cores.scene import SceneTracker
+from .cores.stats import HitStatistics
+from .cores.bundle import TemplateBundle, default_bundle_path
+from .cores.change import TileChangeDetector
+from .cores.config import ImageModel, ConfigModel, MatcherName
+from .cores.device import AsyncAdbDevice
 from .cores.notify import DiscordNotify
-from .cores.compare import FoundPosition, ImageComparison
+from .cores.replay import ReplayDevice
+from .cores.archive import CaptureArchiver
+from .cores.compare import (
+    Frame,
+    FoundPosition,
+    ImageComparison,
+    register_template_bundle,
+    _load_and_convert_template,
+)
 from .cores.manager import ADBDeviceManager
+from .cores.metrics import TickMetrics, metrics
+from .cores.calibrate import ScaleCalibration, estimate_scale
+from .cores.positions import PositionIndex
 from .cores.screenshot import Screenshot, ShiftPosition, ScreenshotManager
 
+# Fields tied to the capture session or the archiver, which a reload keeps
+_RESTART_FIELDS = {
+    "target",
+    "host",
+    "serial",
+    "capture_mode",
+    "browser_capture_mode",
+    "browser_image_format",
+    "screenshot_format",
+    "screenshot_quality",
+    "screenshot_scale",
+    "screenshot_quota_mb",
+}
+# Fields that decide match results, previous results no longer apply when they change
+_MATCH_FIELDS = {"match_mode", "pyramid_factor", "matcher", "matcher_selection_path"}
+
 
 class RemoteController(ConfigModel):
     found_result: FoundPosition = Field(default_factory=FoundPosition)
     screenshot_manager: ScreenshotManager = Field(default_factory=ScreenshotManager)
+    position_index: PositionIndex = Field(default_factory=PositionIndex.load)
+    change_detector: TileChangeDetector = Field(default_factory=TileChangeDetector)
+    calibration: ScaleCalibration = Field(default_factory=ScaleCalibration.load)
+    metrics: TickMetrics = Field(
+        default_factory=lambda: metrics,
+        description="Per-stage latency histograms, shared by every controller in the process.",
+    )
+    match_pool: MatchPool | None = Field(
+        default=None,
+        title="Match Pool",
+        description="A worker pool shared with other controllers, a private thread per match when None",
+        frozen=False,
+        deprecated=False,
+    )
+    previous_results: dict[tuple[str, str], FoundPosition] = Field(
+        default_factory=dict,
+        title="Previous Results",
+        description="The last match result of each image, reused while its screen area is unchanged",
+        frozen=False,
+        deprecated=False,
+    )
     notified_count: int = Field(
         default=0,
         title="Notified",
@@ -42,6 +99,131 @@ class RemoteController(ConfigModel):
         frozen=False,
         deprecated=False,
     )
+    tick_count: int = Field(
+        default=0,
+        title="Tick Count",
+        description="How many frames have been matched",
+        frozen=False,
+        deprecated=False,
+    )
+    matched: bool = Field(
+        default=False,
+        title="Matched",
+        description="Whether any image was found in the last tick",
+        frozen=False,
+        deprecated=False,
+    )
+    clicked: bool = Field(
+        default=False,
+        title="Clicked",
+        description="Whether a click was made in the last tick",
+        frozen=False,
+        deprecated=False,
+    )
+    missed_ticks: int = Field(
+        default=0,
+        title="Missed Ticks",
+        description="How many consecutive ticks found no image",
+        frozen=False,
+        deprecated=False,
+    )
+    template_scale: float = Field(
+        default=1.0,
+        title="Template Scale",
+        description="The factor templates are resized by to match the device resolution",
+        frozen=False,
+        deprecated=False,
+    )
+    calibrated_resolution: tuple[int, int] | None = Field(
+        default=None,
+        title="Calibrated Resolution",
+        description="The frame resolution the template scale was calibrated for",
+        frozen=False,
+        deprecated=False,
+    )
+    calibration_attempt_tick: int | None = Field(
+        default=None,
+        title="Calibration Attempt Tick",
+        description="The tick of the last anchor search that found no anchor",
+        frozen=False,
+        deprecated=False,
+    )
+    template_bundles: dict[float, TemplateBundle] = Field(
+        default_factory=dict,
+        title="Template Bundles",
+        description="The bundle templates of each scale are served from",
+        frozen=False,
+        deprecated=False,
+    )
+    pending_config: ConfigModel | None = Field(
+        default=None,
+        title="Pending Config",
+        description="A reloaded config waiting to be applied before the next tick",
+        frozen=False,
+        deprecated=False,
+    )
+
+    @model_validator(mode="after")
+    def _load_template_bundle(self) -> "RemoteController":
+        image_paths = [image_cfg.image_path for image_cfg in self.image_list]
+        bundle = TemplateBundle.ensure(
+            image_paths, default_bundle_path(image_paths), factors=(2, 4)
+        )
+        self._use_bundle(bundle)
+        return self
+
+    def _use_bundle(self, bundle: TemplateBundle, image_paths: list[str] | None = None) -> None:
+        """Serves templates of a scale from a bundle, retiring the earlier one of that scale."""
+        replaces = self.template_bundles.get(bundle.scale)
+        register_template_bundle(bundle, image_paths=image_paths, replaces=replaces)
+        if self.match_pool is not None:
+            self.match_pool.share_bundle(bundle, replaces=replaces)
+        self.template_bundles[bundle.scale] = bundle
+
+    @cached_property
+    def archiver(self) -> CaptureArchiver:
+        return CaptureArchiver.shared(
+            image_format=self.screenshot_format,
+            quality=self.screenshot_quality,
+            scale=self.screenshot_scale,
+            quota_mb=self.screenshot_quota_mb,
+        )
+
+    @cached_property
+    def scene_tracker(self) -> SceneTracker:
+        return SceneTracker(scenes=self.scenes, default_timeout=self.scene_timeout)
+
+    @cached_property
+    def matcher_selection(self) -> dict[str, MatcherName]:
+        """The matcher `benchmark.py matchers` picked for each image path."""
+        selection_path = Path(self.matcher_selection_path)
+        if not selection_path.exists():
+            return {}
+        selection = orjson.loads(selection_path.read_bytes())
+        matchers = get_args(MatcherName)
+        unknown = {path: name for path, name in selection.items() if name not in matchers}
+        if unknown:
+            logfire.warn(
+                "Ignoring unknown matchers", path=self.matcher_selection_path, matchers=unknown
+            )
+        return {path: name for path, name in selection.items() if name in matchers}
+
+    def _matcher_for(self, image_cfg: ImageModel) -> MatcherName:
+        return (
+            image_cfg.matcher or self.matcher_selection.get(image_cfg.image_path) or self.matcher
+        )
+
+    @cached_property
+    def hit_stats(self) -> HitStatistics:
+        return HitStatistics(
+            size=len(self.image_list),
+            rare_hit_rate=self.rare_hit_rate,
+            max_interval=self.max_check_interval,
+        )
+
+    @property
+    def device_name(self) -> str:
+        return f"{self.target}@{self.host}:{self.serial}" if self.serial else self.target
 
     @computed_field
     @cached_property
@@ -51,12 +233,27 @@ class RemoteController(ConfigModel):
         return apps.serial
 
     async def get_screenshot(self) -> Screenshot:
+        if self.target.startswith("replay://"):
+            screenshot = await self.screenshot_manager.from_replay(url=self.target)
+            return screenshot
         if self.target.startswith("http"):
-            screenshot = await self.screenshot_manager.from_browser(url=self.target)
+            screenshot = await self.screenshot_manager.from_browser(
+                url=self.target,
+                mode=self.browser_capture_mode,
+                clip=self._capture_region(),
+                image_format=self.browser_image_format,
+            )
             return screenshot
         if self.target.startswith("com"):
+            if "target_serial" not in self.__dict__:
+                # Device discovery talks to every device, keep it off the event loop
+                await asyncio.to_thread(getattr, self, "target_serial")
             screenshot = await self.screenshot_manager.from_adb(
-                url=self.target, serial=self.target_serial
+                url=self.target,
+                serial=self.target_serial,
+                mode=self.capture_mode,
+                check_interval=self.foreground_check_interval,
+                device_name=self.device_name,
             )
             return screenshot
         # 返回 screenshot 和 shift_position，而不是 device
@@ -69,7 +266,12 @@ class RemoteController(ConfigModel):
                 await device_details.device.mouse.click(
                     x=self.found_result.button_x, y=self.found_result.button_y
                 )
-            elif isinstance(device_details.device, AdbDevice):
+            elif isinstance(device_details.device, AsyncAdbDevice):
+                latency = await device_details.device.click(
+                    x=self.found_result.button_x, y=self.found_result.button_y
+                )
+                self.metrics.observe(self.device_name, "input_delivery", latency)
+            elif isinstance(device_details.device, ReplayDevice):
                 device_details.device.click(
                     x=self.found_result.button_x, y=self.found_result.button_y
                 )
@@ -84,24 +286,24 @@ class RemoteController(ConfigModel):
         current_hour = datetime.datetime.now(pytz.timezone("Asia/Taipei")).hour
         if (20 <= current_hour < 24) or (0 <= current_hour < 1):
             return
-        if not isinstance(device_details.device, AdbDevice):
+        if not isinstance(device_details.device, AsyncAdbDevice):
             return
         if self.notified_count == 0:
             logfire.warn("Switching Game!!")
-            device_details.device.click(x=1600, y=630)
+            await device_details.device.click(x=1600, y=630)
             await asyncio.sleep(5)
-            device_details.device.click(x=1600, y=830)
+            await device_details.device.click(x=1600, y=830)
             await asyncio.sleep(5)
-            device_details.device.click(x=1600, y=930)
+            await device_details.device.click(x=1600, y=930)
             await asyncio.sleep(5)
 
             # 也可以透過下面方式來 click
-            # device_details.device.shell("input tap 1600 630")
+            # await device_details.device.shell("input tap 1600 630")
 
             notify = DiscordNotify(
                 title="老闆!! 我已經幫您打完王朝了 目前已切換至五對五",
                 description="王朝已完成",
-                target_image=device_details.screenshot,
+                target_image=device_details.to_image(),
             )
             self.notified_count += 1
             logfire.info("Game has been switched.")
@@ -109,46 +311,450 @@ class RemoteController(ConfigModel):
             notify = DiscordNotify(
                 title="老闆!! 我已經幫您打完王朝/五對五了",
                 description="五對五已完成",
-                target_image=device_details.screenshot,
+                target_image=device_details.to_image(),
             )
             self.task_done = True
             logfire.info("The task has been completed.")
-        await notify.send_notify()
+        with self.metrics.measure(self.device_name, "notify"):
+            await notify.send_notify()
+
+    def _capture_region(self) -> tuple[int, int, int, int] | None:
+        """The screen region around every known template position, None for the full screen.
+
+        Only `persistent` browser captures are clipped, and the full screen is still captured
+        every `browser_full_capture_every` ticks so moved or new buttons are picked up.
+        """
+        if self.browser_capture_mode != "persistent":
+            return None
+        if self.tick_count % self.browser_full_capture_every == 0:
+            return None
+        region = None
+        for image_cfg in self.image_list:
+            known_position = self.position_index.get(image_cfg)
+            if known_position is None:
+                return None
+            template_h, template_w = _load_and_convert_template(
+                image_cfg.image_path, self.template_scale
+            ).shape[:2]
+            x0 = known_position[0] - template_w // 2 - self.roi_padding
+            y0 = known_position[1] - template_h // 2 - self.roi_padding
+            x1 = known_position[0] + (template_w - template_w // 2) + self.roi_padding
+            y1 = known_position[1] + (template_h - template_h // 2) + self.roi_padding
+            if region is None:
+                region = (x0, y0, x1, y1)
+            else:
+                region = (
+                    min(region[0], x0),
+                    min(region[1], y0),
+                    max(region[2], x1),
+                    max(region[3], y1),
+                )
+        if region is None:
+            return None
+        # Starting on the tile grid lets clipped and full frames be compared pixel for pixel
+        step = self.change_detector.tile_size
+        x0, y0, x1, y1 = region
+        return x0 - x0 % step, y0 - y0 % step, x1, y1
+
+    def _is_unchanged(self, image_cfg: ImageModel, previous: FoundPosition, frame: Frame) -> bool:
+        """Whether the screen area that decided the previous result is unchanged since then."""
+        key = (image_cfg.image_name, image_cfg.image_path)
+        if previous.button_x is None or previous.button_y is None:
+            # A miss searched the whole frame, so any change may reveal the image
+            return not self.change_detector.is_dirty(since=key)
+        # A hit only depends on the pixels under the matched template
+        template_h, template_w = _load_and_convert_template(
+            image_cfg.image_path, self.template_scale
+        ).shape[:2]
+        # Results are screen positions, the change detector works in frame pixels
+        x0 = max(previous.button_x - frame.origin[0] - template_w // 2, 0)
+        y0 = max(previous.button_y - frame.origin[1] - template_h // 2, 0)
+        window = (x0, y0, x0 + template_w, y0 + template_h)
+        return not self.change_detector.is_dirty(window, since=key)
+
+    def _changed_region(
+        self, image_cfg: ImageModel, frame: Frame
+    ) -> tuple[int, int, int, int] | None:
+        """The part of the frame a previously missed image can newly appear in."""
+        dirty_bounds = self.change_detector.dirty_bounds(
+            since=(image_cfg.image_name, image_cfg.image_path)
+        )
+        if dirty_bounds is None:
+            return None
+        template_h, template_w = _load_and_convert_template(
+            image_cfg.image_path, self.template_scale
+        ).shape[:2]
+        x0, y0, x1, y1 = dirty_bounds
+        return (
+            max(x0 - template_w, 0),
+            max(y0 - template_h, 0),
+            min(x1 + template_w, frame.width),
+            min(y1 + template_h, frame.height),
+        )
+
+    @property
+    def calibration_due(self) -> bool:
+        if self.calibrated_resolution is not None:
+            return False
+        return (
+            self.calibration_attempt_tick is None
+            or self.tick_count - self.calibration_attempt_tick >= self.calibration_retry_interval
+        )
+
+    async def calibrate(self, frame: Frame) -> None:
+        """Finds the template scale for the resolution of the device and loads its templates.
+
+        Scales are stored per device and resolution, so the anchor search only runs the first
+        time a device is seen at a resolution. Afterwards every match stays single-scale. A
+        frame without any anchor on it, like a loading screen, leaves the device uncalibrated
+        and the search is repeated `calibration_retry_interval` ticks later.
+
+        Args:
+            frame (Frame): A full-screen frame of the device.
+        """
+        scale = self.calibration.get(self.device_name, frame.width, frame.height)
+        if scale is None:
+            anchors = [
+                _load_and_convert_template(image_cfg.image_path)
+                for image_cfg in self.image_list
+                if image_cfg.image_name in self.calibration_anchors
+            ]
+            scale, score = await asyncio.to_thread(estimate_scale, frame.gray, anchors)
+            if score < self.calibration_confidence:
+                logfire.warn(
+                    "No calibration anchor on screen, keeping the original template size",
+                    device=self.device_name,
+                    score=score,
+                    retry_in_ticks=self.calibration_retry_interval,
+                )
+                self.calibration_attempt_tick = self.tick_count
+                return
+            await asyncio.to_thread(
+                self.calibration.set, self.device_name, frame.width, frame.height, scale
+            )
+        self.template_scale = scale
+        if scale != 1:
+            image_paths = [image_cfg.image_path for image_cfg in self.image_list]
+            bundle = await asyncio.to_thread(
+                lambda: TemplateBundle.ensure(
+                    image_paths, default_bundle_path(image_paths, scale=scale), (2, 4), scale
+                )
+            )
+            self._use_bundle(bundle)
+        self.calibrated_resolution = (frame.width, frame.height)
+        # Results and change tracking of the previous scale no longer apply
+        self.previous_results.clear()
+        self.change_detector.forget()
+        logfire.info("Calibrated template scale", device=self.device_name, scale=scale)
+
+    def _compile_bundles(
+        self, image_paths: list[str]
+    ) -> tuple[list[TemplateBundle], set[str] | None]:
+        """Brings the bundles of every scale in use up to date with a new image list.
+
+        Returns:
+            tuple[list[TemplateBundle], set[str] | None]: The bundles, and the image paths
+                whose cached templates are stale, or None when all of them are.
+        """
+        previous = self.template_bundles.get(1.0)
+        bundles = [
+            TemplateBundle.ensure(
+                image_paths, default_bundle_path(image_paths, scale=scale), (2, 4), scale
+            )
+            for scale in dict.fromkeys([1.0, self.template_scale])
+        ]
+        if previous is None:
+            return bundles, None
+        previous_digests = {path: entry.digest for path, entry in previous.entries.items()}
+        digests = {path: entry.digest for path, entry in bundles[0].entries.items()}
+        stale = {
+            image_path
+            for image_path in previous_digests.keys() | digests.keys()
+            if previous_digests.get(image_path) != digests.get(image_path)
+        }
+        return bundles, stale
+
+    def _carry_over(self, previous_images: list[ImageModel], stale_paths: set[str]) -> None:
+        """Keeps the results and hit counts of the images a reload left unchanged."""
+        previous_keys = {
+            (image_cfg.image_name, image_cfg.image_path): index
+            for index, image_cfg in enumerate(previous_images)
+        }
+        sources = [
+            previous_keys.get((image_cfg.image_name, image_cfg.image_path))
+            for image_cfg in self.image_list
+        ]
+        if "hit_stats" in self.__dict__:
+            self.hit_stats.reindex(sources)
+            self.hit_stats.rare_hit_rate = self.rare_hit_rate
+            self.hit_stats.max_interval = self.max_check_interval
+        unchanged = {
+            (image_cfg.image_name, image_cfg.image_path)
+            for image_cfg, source in zip(self.image_list, sources, strict=True)
+            if source is not None
+            and previous_images[source] == image_cfg
+            and image_cfg.image_path not in stale_paths
+        }
+        for key in list(self.previous_results):
+            if key not in unchanged:
+                del self.previous_results[key]
+        # A template replaced at the same path must not be compared with its old frames
+        self.change_detector.forget(
+            {(image_cfg.image_name, image_cfg.image_path) for image_cfg in previous_images}
+            - unchanged
+        )
+
+    async def reload(self) -> None:
+        """Applies the pending config between two ticks.
+
+        The capture session, the archiver and every cache outlive the reload. Only the
+        templates whose image changed are read again, and images kept from the previous
+        config keep their hit counts and, when unchanged, their previous results. A config
+        whose templates cannot be read is dropped and the previous one keeps running.
+        """
+        config, self.pending_config = self.pending_config, None
+        if config is None:
+            return
+        ignored = sorted(
+            name for name in _RESTART_FIELDS if getattr(config, name) != getattr(self, name)
+        )
+        if ignored:
+            logfire.warn("Config changes that need a restart were ignored", fields=ignored)
+        changes = {
+            name: getattr(config, name)
+            for name in ConfigModel.model_fields
+            if name not in _RESTART_FIELDS and getattr(config, name) != getattr(self, name)
+        }
+        if not changes:
+            return
+        previous_images = self.image_list
+        try:
+            bundles, stale_paths = await asyncio.to_thread(
+                self._compile_bundles, [image_cfg.image_path for image_cfg in config.image_list]
+            )
+        except (OSError, ValueError) as e:
+            # Nothing was swapped yet, a bad edit must never stop a running controller
+            logfire.warn(
+                "Reloading the config failed, keeping the previous one",
+                device=self.device_name,
+                error=repr(e),
+            )
+            return
+        for bundle in bundles:
+            self._use_bundle(bundle, image_paths=stale_paths)
+        # The config fields are frozen, swap them all at once while no tick is running
+        self.__dict__.update(changes)
+        if "scenes" in changes or "scene_timeout" in changes:
+            self.__dict__.pop("scene_tracker", None)
+        if "matcher_selection_path" in changes:
+            self.__dict__.pop("matcher_selection", None)
+        if stale_paths is None or _MATCH_FIELDS & changes.keys():
+            self.previous_results.clear()
+        self._carry_over(previous_images, stale_paths or set())
+        logfire.info("Reloaded config", device=self.device_name, fields=sorted(changes))
+
+    async def _timed_find(self, comparison: ImageComparison) -> FoundPosition:
+        template = comparison.image_cfg.image_path
+        with self.metrics.measure(self.device_name, "match", template=template):
+            found_result = await comparison.find()
+        if found_result.button_x is not None:
+            self.metrics.increment(self.device_name, "hits", template=template)
+        return found_result
+
+    async def _match_in_batches(
+        self,
+        comparisons: dict[int, ImageComparison],
+        frame: Frame,
+        found_results: dict[int, FoundPosition],
+    ) -> int:
+        """Matches the comparisons in batches, most often found first.
+
+        Returns:
+            int: How many images were matched before a clickable hit ended the tick.
+        """
+        order = self.hit_stats.order(list(comparisons))
+        for start in range(0, len(order), self.match_batch_size):
+            batch = order[start : start + self.match_batch_size]
+            matched = await asyncio.gather(*[self._timed_find(comparisons[i]) for i in batch])
+            will_click = False
+            for index, found_result in zip(batch, matched, strict=True):
+                config_dict = self.image_list[index]
+                key = (config_dict.image_name, config_dict.image_path)
+                self.previous_results[key] = found_result.model_copy()
+                self.change_detector.mark(key)
+                self.hit_stats.record(index, found_result.button_x is not None, self.tick_count)
+                found_results[index] = found_result
+                if found_result.button_x is not None:
+                    will_click = will_click or (self.enable and config_dict.enable_click)
+                    if config_dict.enable_screenshot:
+                        # Only fresh hits are archived, reused results show an unchanged screen
+                        self.archiver.submit(frame, config_dict)
+            if will_click and self.stop_after_click:
+                for index in order[start + self.match_batch_size :]:
+                    config_dict = self.image_list[index]
+                    self.previous_results.pop(
+                        (config_dict.image_name, config_dict.image_path), None
+                    )
+                    found_results[index] = FoundPosition()
+                return start + len(batch)
+        return len(order)
+
+    async def match_images(self, frame: Frame) -> list[FoundPosition]:
+        """Matches the images against the frame, most often found first.
+
+        Images whose area is unchanged reuse their previous result, rarely found images are
+        only tested every few ticks, and once a clickable image is found the remaining
+        batches are skipped when `stop_after_click` is set.
+
+        Args:
+            frame (Frame): The decoded frame of the current tick.
+
+        Returns:
+            list[FoundPosition]: One result per entry of `image_list`, in order.
+        """
+        found_results: dict[int, FoundPosition] = {}
+        comparisons: dict[int, ImageComparison] = {}
+        active_images = self.scene_tracker.active_images()
+        for index, config_dict in enumerate(self.image_list):
+            key = (config_dict.image_name, config_dict.image_path)
+            not_in_scene = (
+                active_images is not None and config_dict.image_name not in active_images
+            )
+            if (
+                not_in_scene
+                or self.tick_count % config_dict.check_every != 0
+                or not self.hit_stats.is_due(index, self.tick_count)
+            ):
+                # The screen may change while this image is not checked, so forget its result
+                self.previous_results.pop(key, None)
+                found_results[index] = FoundPosition()
+                continue
+            previous = self.previous_results.get(key)
+            if previous is not None and self._is_unchanged(config_dict, previous, frame):
+                found_results[index] = previous.model_copy()
+                continue
+            search_region = None
+            if previous is not None and previous.button_x is None:
+                search_region = self._changed_region(config_dict, frame)
+            comparisons[index] = ImageComparison(
+                image_cfg=config_dict,
+                screenshot=frame,
+                position_index=self.position_index,
+                roi_padding=self.roi_padding,
+                match_mode=config_dict.match_mode or self.match_mode,
+                pyramid_factor=self.pyramid_factor,
+                search_region=search_region,
+                match_pool=self.match_pool,
+                owner=self.device_name,
+                template_scale=self.template_scale,
+                matcher=self._matcher_for(config_dict),
+            )
+        shared_arrays = self._shared_arrays(frame) if self.match_pool and comparisons else []
+        if shared_arrays:
+            self.match_pool.share(shared_arrays)
+        try:
+            tested = await self._match_in_batches(comparisons, frame, found_results)
+        finally:
+            if shared_arrays:
+                self.match_pool.release(shared_arrays)
+        self.metrics.increment(
+            self.device_name, "templates_skipped", len(self.image_list) - tested
+        )
+        return [found_results[index] for index in range(len(self.image_list))]
+
+    def _shared_arrays(self, frame: Frame) -> list[np.ndarray]:
+        """The frame arrays the templates are matched against, for the match pool to share."""
+        arrays = [frame.gray]
+        if self.match_mode == "pyramid" or any(
+            image_cfg.match_mode == "pyramid" for image_cfg in self.image_list
+        ):
+            arrays.append(frame.reduced(self.pyramid_factor))
+        return arrays
+
+    async def check_foreground(self) -> None:
+        """Verifies the foreground app right away after `foreground_check_misses` missed ticks.
+
+        Raises:
+            ForegroundError: If another app is in the foreground.
+        """
+        if not self.target.startswith("com") or self.missed_ticks < self.foreground_check_misses:
+            return
+        # Nothing matches for a while, the app may have left the foreground
+        self.missed_ticks = 0
+        with self.metrics.measure(self.device_name, "foreground_check"):
+            await self.screenshot_manager.verify_foreground(url=self.target)
 
     async def run(self) -> None:
+        device = self.device_name
         try:
-            device_details = await self.get_screenshot()
-            for config_dict in self.image_list:
-                image_compare = ImageComparison(
-                    image_cfg=config_dict, screenshot=device_details.screenshot
+            with self.metrics.measure(device, "capture"):
+                device_details = await self.get_screenshot()
+            with self.metrics.measure(device, "decode"):
+                # Decode once per capture; every template is matched against the same frame
+                frame = await asyncio.to_thread(
+                    Frame.from_screenshot, device_details.screenshot, device_details.origin
                 )
-
-                self.found_result = await image_compare.find()
+            with self.metrics.measure(device, "change_detection"):
+                self.change_detector.update(frame)
+            if self.calibration_anchors and self.calibration_due:
+                with self.metrics.measure(device, "calibrate"):
+                    await self.calibrate(frame)
+            with self.metrics.measure(device, "match_all"):
+                found_results = await self.match_images(frame=frame)
+            self.tick_count += 1
+            self.metrics.increment(device, "ticks")
+            found_names = [
+                config_dict.image_name
+                for config_dict, result in zip(self.image_list, found_results, strict=True)
+                if result.button_x is not None
+            ]
+            self.scene_tracker.observe(found_names)
+            self.matched = bool(found_names)
+            self.missed_ticks = 0 if self.matched else self.missed_ticks + 1
+            await self.check_foreground()
+            self.clicked = False
+            for config_dict, found_result in zip(self.image_list, found_results, strict=True):
+                self.found_result = found_result
                 if self.enable and config_dict.enable_click and self.found_result.button_x:
-                    await self.click_button(device_details=device_details)
+                    with self.metrics.measure(device, "click", template=config_dict.image_path):
+                        await self.click_button(device_details=device_details)
+                    self.metrics.increment(device, "clicks")
+                    self.clicked = True
 
                     if self.found_result.found_button_name_en == "confirm":
                         await self.switch_game(device_details=device_details)
 
-                    await asyncio.sleep(config_dict.delay_after_click)
+                    with self.metrics.measure(device, "post_click_sleep"):
+                        await asyncio.sleep(config_dict.delay_after_click)
+                    if self.stop_after_click:
+                        # The rest of the frame is stale, the next tick captures a fresh one
+                        break
+
+        except EOFError:
+            logfire.info("The recorded frames have all been replayed.")
+            self.task_done = True
 
         except AdbError:
+            self.metrics.increment(device, "errors")
             notify = DiscordNotify(
                 title="尊敬的老闆, 發生錯誤!!",
                 description="請檢查一下您的模擬器是否有開啟",
                 target_image=None,
             )
-            await notify.send_notify()
+            with self.metrics.measure(device, "notify"):
+                await notify.send_notify()
             logfire.error("Error Occurred, Please check your emulator", _exc_info=True)
             self.error_occurred = True
 
         except Exception as e:
+            self.metrics.increment(device, "errors")
             notify = DiscordNotify(
                 title="尊敬的老闆, 發生錯誤!!",
                 description=f"採棉花的過程中發生錯誤，請您檢查一下 {e!s}",
                 target_image=None,
             )
-            await notify.send_notify()
+            with self.metrics.measure(device, "notify"):
+                await notify.send_notify()
             _random_interval = secrets.randbelow(5)
             logfire.error(
                 f"Error Occurred, Retrying in {_random_interval} seconds", _exc_info=True
@@ -0,0 +1,175 @@
+from pathlib import Path
+import datetime
+import threading
+from collections import deque
+
+import cv2
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+from .config import ImageModel, ArchiveFormat
+from .compare import Frame
+
+_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+_QUALITY_FLAGS = {"jpeg": cv2.IMWRITE_JPEG_QUALITY, "webp": cv2.IMWRITE_WEBP_QUALITY}
+_shared: dict[str, "CaptureArchiver"] = {}
+_shared_lock = threading.Lock()
+
+
+class CaptureArchiver(BaseModel):
+    """Encodes and stores frames in a worker thread so the tick loop never waits on disk.
+
+    Frames wait in a bounded queue that drops the oldest frame when full. After every write
+    the oldest archived files are deleted until the directory fits in the quota. Controllers
+    get their archiver from `shared`, so all of them writing to one directory share one
+    worker and one quota.
+
+    Attributes:
+        directory (str): Where archived frames are written.
+        image_format (ArchiveFormat): `jpeg` or `webp`.
+        quality (int): The encoder quality, 1 to 100.
+        scale (float): Frames are downscaled by this factor before encoding.
+        max_queue (int): Frames waiting beyond this drop the oldest one.
+        quota_mb (float): The most disk space the archive may use.
+
+    Methods:
+        shared: Returns the process-wide archiver of a directory.
+        submit: Queues a frame for archiving without waiting.
+        close: Writes what is queued and stops the worker.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    directory: str = Field(default="./logs/screenshots", description="The archive directory")
+    image_format: ArchiveFormat = Field(default="jpeg", description="The archive image format")
+    quality: int = Field(default=80, ge=1, le=100, description="The encoder quality")
+    scale: float = Field(default=1.0, gt=0, le=1, description="The downscale factor")
+    max_queue: int = Field(default=8, ge=1, description="The capacity of the frame queue")
+    quota_mb: float = Field(default=512.0, gt=0, description="The disk quota in megabytes")
+    _queue: deque[tuple[Frame, ImageModel, datetime.datetime]] = PrivateAttr(default_factory=deque)
+    _ready: threading.Condition = PrivateAttr(default_factory=threading.Condition)
+    _worker: threading.Thread | None = PrivateAttr(default=None)
+    _closing: bool = PrivateAttr(default=False)
+    _files: deque[tuple[Path, int]] = PrivateAttr(default_factory=deque)
+    _usage: int = PrivateAttr(default=0)
+    _dropped: int = PrivateAttr(default=0)
+
+    @classmethod
+    def shared(cls, **settings: object) -> "CaptureArchiver":
+        """Returns the archiver of a directory, creating it on first use.
+
+        The first caller's settings apply to the directory, later callers asking for other
+        settings get a warning.
+
+        Args:
+            **settings (object): The fields of the archiver.
+
+        Returns:
+            CaptureArchiver: The archiver every caller in the process shares for the directory.
+        """
+        archiver = cls(**settings)
+        key = Path(archiver.directory).resolve().as_posix()
+        with _shared_lock:
+            shared = _shared.setdefault(key, archiver)
+        if shared is not archiver and shared.model_dump() != archiver.model_dump():
+            logfire.warn(
+                "Archive settings differ, using those of the first controller",
+                directory=archiver.directory,
+            )
+        return shared
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def submit(self, frame: Frame, image_cfg: ImageModel) -> None:
+        """Queues a frame in which `image_cfg` was found.
+
+        Args:
+            frame (Frame): The decoded frame of the tick.
+            image_cfg (ImageModel): The image that was found.
+        """
+        with self._ready:
+            if self._closing:
+                return
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self._dropped += 1
+            self._queue.append((frame, image_cfg, datetime.datetime.now()))
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._archive_forever, name="capture-archiver", daemon=True
+                )
+                self._worker.start()
+            self._ready.notify()
+
+    def _scan(self) -> None:
+        """Picks up files archived by earlier runs, oldest first, so they count to the quota."""
+        directory = Path(self.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(
+            (path for path in directory.iterdir() if path.suffix in _EXTENSIONS.values()),
+            key=lambda path: path.stat().st_mtime,
+        )
+        for path in existing:
+            size = path.stat().st_size
+            self._files.append((path, size))
+            self._usage += size
+
+    def _encode(self, frame: Frame) -> bytes:
+        image = frame.color
+        if self.scale < 1:
+            image = cv2.resize(
+                image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA
+            )
+        _, encoded = cv2.imencode(
+            _EXTENSIONS[self.image_format],
+            image,
+            [_QUALITY_FLAGS[self.image_format], self.quality],
+        )
+        return encoded.tobytes()
+
+    def _write(self, frame: Frame, image_cfg: ImageModel, captured_at: datetime.datetime) -> None:
+        encoded = self._encode(frame)
+        name = f"{captured_at:%Y%m%d-%H%M%S-%f}_{Path(image_cfg.image_path).stem}"
+        path = Path(self.directory, name + _EXTENSIONS[self.image_format])
+        path.write_bytes(encoded)
+        self._files.append((path, len(encoded)))
+        self._usage += len(encoded)
+        quota = int(self.quota_mb * 1024 * 1024)
+        while self._usage > quota and len(self._files) > 1:
+            oldest, size = self._files.popleft()
+            oldest.unlink(missing_ok=True)
+            self._usage -= size
+
+    def _archive_forever(self) -> None:
+        self._scan()
+        while True:
+            with self._ready:
+                while not self._queue and not self._closing:
+                    self._ready.wait()
+                if not self._queue:
+                    return
+                frame, image_cfg, captured_at = self._queue.popleft()
+            try:
+                self._write(frame, image_cfg, captured_at)
+            except Exception:
+                logfire.error("Failed to archive a capture", image_path=image_cfg.image_path)
+
+    def close(self) -> None:
+        with _shared_lock:
+            # Later callers of `shared` get a new archiver instead of a closed one
+            key = Path(self.directory).resolve().as_posix()
+            if _shared.get(key) is self:
+                del _shared[key]
+        with self._ready:
+            if self._closing:
+                # Every controller sharing the archiver closes it
+                return
+            self._closing = True
+            self._ready.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        if self._dropped:
+            logfire.warn("Dropped captures while the archiver was busy", count=self._dropped)
@@ -0,0 +1,249 @@
+import os
+import struct
+import hashlib
+from pathlib import Path
+import threading
+
+import cv2
+import numpy as np
+import orjson
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+_MAGIC = b"ACTB"
+_PREFIX = struct.Struct("<4sI")
+_ALIGNMENT = 64
+
+
+def _file_digest(image_path: str) -> str:
+    return hashlib.sha256(Path(image_path).read_bytes()).hexdigest()
+
+
+def default_bundle_path(
+    image_paths: list[str], directory: str = "./logs/templates", scale: float = 1.0
+) -> str:
+    """Names a bundle after the templates it holds and their versions on disk.
+
+    An edited template gives the bundle a new name, so a compiled bundle is never rewritten
+    while this or another process still has it mapped.
+    """
+    versions = []
+    for image_path in sorted(set(image_paths)):
+        try:
+            stat = Path(image_path).stat()
+        except OSError:
+            versions.append(f"{image_path}\0missing")
+            continue
+        versions.append(f"{image_path}\0{stat.st_mtime_ns}\0{stat.st_size}")
+    key = hashlib.sha256("\n".join(versions).encode("utf-8")).hexdigest()
+    suffix = "" if scale == 1 else f"@{scale:g}x"
+    return f"{directory}/{key[:16]}{suffix}.bundle"
+
+
+def rescale_template(image: np.ndarray, scale: float) -> np.ndarray:
+    """Resizes a grayscale template captured at another resolution to the frame resolution."""
+    if scale == 1:
+        return image
+    height, width = image.shape[:2]
+    size = (max(round(width * scale), 1), max(round(height * scale), 1))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    return cv2.resize(image, size, interpolation=interpolation)
+
+
+def _reduce(image: np.ndarray, factor: int) -> np.ndarray:
+    """Downscales a grayscale template the same way frames are downscaled for matching."""
+    height, width = image.shape[:2]
+    return cv2.resize(image, (width // factor, height // factor), interpolation=cv2.INTER_AREA)
+
+
+class TemplateEntry(BaseModel):
+    digest: str = Field(..., description="The SHA-256 of the source PNG file.")
+    levels: dict[int, tuple[int, int, int]] = Field(
+        ..., description="(offset, height, width) of the template at each downscale factor."
+    )
+
+
+class TemplateBundle(BaseModel):
+    """Grayscale templates and their pyramid levels compiled into one memory-mapped file.
+
+    The file holds a JSON header followed by the raw pixel data. Every process maps it
+    read-only, so the templates live once in the OS page cache no matter how many workers
+    use them, and nothing has to be decoded from PNG at startup. A bundle can hold the
+    templates rescaled for a device whose resolution differs from the one they were cut at.
+
+    Attributes:
+        path (str): The bundle file.
+        entries (dict[str, TemplateEntry]): The templates in the bundle, keyed by image path.
+        scale (float): The factor the source images were resized by.
+
+    Methods:
+        compile: Builds a bundle from template images.
+        load: Maps an existing bundle file.
+        ensure: Loads a bundle, recompiling it when a source image changed.
+        get: Returns a template level as a read-only array.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    path: str = Field(..., description="The bundle file")
+    entries: dict[str, TemplateEntry] = Field(default_factory=dict)
+    scale: float = Field(default=1.0, description="The factor the source images were resized by")
+    _data: np.memmap | None = PrivateAttr(default=None)
+
+    @classmethod
+    def compile(
+        cls,
+        image_paths: list[str],
+        path: str,
+        factors: tuple[int, ...] = (2, 4),
+        scale: float = 1.0,
+    ) -> "TemplateBundle":
+        """Decodes template images once and writes them, with pyramid levels, into a bundle.
+
+        Args:
+            image_paths (list[str]): The template images to include.
+            path (str): Where to write the bundle file.
+            factors (tuple[int, ...]): The downscale factors to precompute.
+            scale (float): Resizes the images by this factor before anything else.
+
+        Returns:
+            TemplateBundle: The mapped bundle.
+
+        Raises:
+            ValueError: If an image cannot be read or decoded.
+        """
+        entries: dict[str, TemplateEntry] = {}
+        chunks: list[bytes] = []
+        offset = 0
+        for image_path in dict.fromkeys(image_paths):
+            color = cv2.imread(image_path)
+            if color is None:
+                raise ValueError(f"Cannot decode template image: {image_path}")
+            gray = rescale_template(cv2.cvtColor(color, cv2.COLOR_BGR2GRAY), scale)
+            levels = {}
+            for factor, level in [(1, gray), *[(f, _reduce(gray, f)) for f in factors]]:
+                levels[factor] = (offset, level.shape[0], level.shape[1])
+                chunks.append(level.tobytes())
+                offset += level.size
+            entries[image_path] = TemplateEntry(digest=_file_digest(image_path), levels=levels)
+
+        header = orjson.dumps(
+            {
+                "scale": scale,
+                "templates": {key: entry.model_dump() for key, entry in entries.items()},
+            },
+            option=orjson.OPT_NON_STR_KEYS,
+        )
+        data_start = -(-(_PREFIX.size + len(header)) // _ALIGNMENT) * _ALIGNMENT
+        bundle_path = Path(path)
+        bundle_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = bundle_path.with_name(
+            f"{bundle_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with temp_path.open("wb") as bundle_file:
+            bundle_file.write(_PREFIX.pack(_MAGIC, len(header)))
+            bundle_file.write(header)
+            bundle_file.write(b"\0" * (data_start - _PREFIX.size - len(header)))
+            bundle_file.writelines(chunks)
+        # Readers in other processes only ever see a complete bundle
+        try:
+            temp_path.replace(bundle_path)
+        except OSError:
+            temp_path.unlink(missing_ok=True)
+            # Windows refuses to replace a mapped file, which is fine if it is up to date
+            if not bundle_path.exists():
+                raise
+            existing = cls.load(path)
+            if existing.scale != scale or not existing.is_fresh(list(entries), factors):
+                raise
+            return existing
+        logfire.info("Compiled template bundle", path=path, templates=len(entries), scale=scale)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "TemplateBundle":
+        """Maps a bundle file read-only.
+
+        Args:
+            path (str): The bundle file.
+
+        Returns:
+            TemplateBundle: The mapped bundle.
+
+        Raises:
+            ValueError: If the file is not a template bundle.
+        """
+        with Path(path).open("rb") as bundle_file:
+            magic, header_size = _PREFIX.unpack(bundle_file.read(_PREFIX.size))
+            if magic != _MAGIC:
+                raise ValueError(f"Not a template bundle: {path}")
+            header = orjson.loads(bundle_file.read(header_size))
+        if "templates" not in header:
+            raise ValueError(f"Outdated template bundle: {path}")
+        data_start = -(-(_PREFIX.size + header_size) // _ALIGNMENT) * _ALIGNMENT
+        bundle = cls(
+            path=path,
+            entries={key: TemplateEntry(**entry) for key, entry in header["templates"].items()},
+            scale=header["scale"],
+        )
+        if Path(path).stat().st_size > data_start:
+            bundle._data = np.memmap(path, dtype=np.uint8, mode="r", offset=data_start)
+        return bundle
+
+    @classmethod
+    def ensure(
+        cls,
+        image_paths: list[str],
+        path: str,
+        factors: tuple[int, ...] = (2, 4),
+        scale: float = 1.0,
+    ) -> "TemplateBundle":
+        """Loads a bundle, recompiling it when it is missing or a source image changed.
+
+        Args:
+            image_paths (list[str]): The template images the bundle must contain.
+            path (str): The bundle file.
+            factors (tuple[int, ...]): The downscale factors to precompute.
+            scale (float): The factor the images must be resized by.
+
+        Returns:
+            TemplateBundle: An up-to-date bundle.
+        """
+        if Path(path).exists():
+            try:
+                bundle = cls.load(path)
+            except ValueError:
+                logfire.warn("Replacing invalid template bundle", path=path)
+            else:
+                if bundle.scale == scale and bundle.is_fresh(image_paths, factors):
+                    return bundle
+        return cls.compile(image_paths, path, factors, scale)
+
+    def is_fresh(self, image_paths: list[str], factors: tuple[int, ...] = ()) -> bool:
+        for image_path in image_paths:
+            entry = self.entries.get(image_path)
+            if entry is None or not set(factors).issubset(entry.levels):
+                return False
+            if entry.digest != _file_digest(image_path):
+                return False
+        return True
+
+    @property
+    def data(self) -> np.memmap | None:
+        return self._data
+
+    def get(self, image_path: str, factor: int = 1) -> np.ndarray | None:
+        """Returns a template level as a read-only view into the mapped file.
+
+        Args:
+            image_path (str): The template image path.
+            factor (int): The downscale factor, 1 for full resolution.
+
+        Returns:
+            np.ndarray | None: The grayscale template, or None if it is not in the bundle.
+        """
+        entry = self.entries.get(image_path)
+        if self._data is None or entry is None or factor not in entry.levels:
+            return None
+        offset, height, width = entry.levels[factor]
+        return np.asarray(self._data[offset : offset + height * width]).reshape(height, width)
@@ -0,0 +1,116 @@
+import os
+from pathlib import Path
+import threading
+
+import cv2
+import numpy as np
+import orjson
+import logfire
+from pydantic import Field, BaseModel
+
+from .bundle import rescale_template
+from .locking import file_lock
+
+
+def _best_score(gray: np.ndarray, template: np.ndarray) -> float:
+    if min(template.shape[:2]) < 8 or any(
+        t > g for t, g in zip(template.shape[:2], gray.shape[:2], strict=True)
+    ):
+        return -1.0
+    matched = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+    return float(cv2.minMaxLoc(matched)[1])
+
+
+def _scan(gray: np.ndarray, anchors: list[np.ndarray], scales: np.ndarray) -> tuple[float, float]:
+    best_scale, best_score = 1.0, -1.0
+    for scale in scales:
+        for anchor in anchors:
+            score = _best_score(gray, rescale_template(anchor, float(scale)))
+            if score > best_score:
+                best_scale, best_score = float(scale), score
+    return best_scale, best_score
+
+
+def estimate_scale(
+    gray: np.ndarray,
+    anchors: list[np.ndarray],
+    min_scale: float = 0.4,
+    max_scale: float = 2.0,
+    step: float = 0.05,
+) -> tuple[float, float]:
+    """Finds the factor that resizes templates to the resolution of a frame.
+
+    The scales are first scanned on a half-resolution frame, then refined around the best
+    one at full resolution. Only the anchors that are actually on screen can score well, so
+    a few distinctive templates of the current screen are enough.
+
+    Args:
+        gray (np.ndarray): The grayscale frame.
+        anchors (list[np.ndarray]): Grayscale templates at their original resolution.
+        min_scale (float): The smallest scale to try.
+        max_scale (float): The largest scale to try.
+        step (float): The spacing of the coarse scan.
+
+    Returns:
+        tuple[float, float]: The scale rounded to two decimals and its match score.
+    """
+    height, width = gray.shape[:2]
+    reduced = cv2.resize(gray, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+    coarse_scales = np.arange(min_scale, max_scale + step / 2, step)
+    coarse_scale, _ = _scan(reduced, [rescale_template(a, 0.5) for a in anchors], coarse_scales)
+    fine_scales = np.arange(coarse_scale - step, coarse_scale + step + 0.005, 0.01)
+    scale, score = _scan(gray, anchors, fine_scales[fine_scales > 0])
+    return round(scale, 2), score
+
+
+class ScaleCalibration(BaseModel):
+    """Template scales found for each device and resolution, kept on disk between runs.
+
+    Attributes:
+        path (str): The JSON file holding the scales.
+        scales (dict[str, float]): Scales keyed by `device@widthxheight`.
+
+    Methods:
+        load: Reads the stored scales.
+        get: Returns the scale of a device and resolution.
+        set: Stores the scale of a device and resolution.
+    """
+
+    path: str = Field(default="./logs/calibration.json", description="The calibration file")
+    scales: dict[str, float] = Field(default_factory=dict, description="The calibrated scales")
+
+    @staticmethod
+    def key(device: str, width: int, height: int) -> str:
+        return f"{device}@{width}x{height}"
+
+    @classmethod
+    def load(cls, path: str = "./logs/calibration.json") -> "ScaleCalibration":
+        calibration_path = Path(path)
+        if not calibration_path.exists():
+            return cls(path=path)
+        return cls(path=path, scales=orjson.loads(calibration_path.read_bytes()))
+
+    def get(self, device: str, width: int, height: int) -> float | None:
+        return self.scales.get(self.key(device, width, height))
+
+    def set(self, device: str, width: int, height: int, scale: float) -> None:
+        """Stores a scale, keeping the scales other controllers stored since this one loaded.
+
+        The file is read again and rewritten under a lock, so controllers calibrating other
+        devices at the same time never drop each other's scales.
+        """
+        key = self.key(device, width, height)
+        calibration_path = Path(self.path)
+        with file_lock(self.path):
+            stored = (
+                orjson.loads(calibration_path.read_bytes()) if calibration_path.exists() else {}
+            )
+            self.scales = {**self.scales, **stored, key: scale}
+            temp_path = calibration_path.with_name(
+                f"{calibration_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            temp_path.write_bytes(orjson.dumps(self.scales, option=orjson.OPT_INDENT_2))
+            temp_path.replace(calibration_path)
+        logfire.info(
+            "Stored template scale", device=device, width=width, height=height, scale=scale
+        )
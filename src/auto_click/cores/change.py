@@ -0,0 +1,193 @@
+from collections.abc import Hashable, Iterable
+
+import cv2
+import numpy as np
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+from .compare import Frame
+
+
+class TileChangeDetector(BaseModel):
+    """Detects which parts of the screen changed since an earlier frame.
+
+    Frames are compared on a downsampled grayscale copy and the per-pixel difference is
+    averaged over a grid of tiles, so a static screen costs a single vectorized diff. A fade
+    or slow animation may stay below the threshold between two frames, so cached results are
+    checked against the frame they were computed on, which `mark` remembers for them.
+
+    Frames clipped to different screen regions are compared where they overlap on screen.
+    Tiles the earlier frame did not show count as dirty, but only a change where both frames
+    show the screen counts as activity.
+
+    Attributes:
+        tile_size (int): The edge length of a tile in full-resolution pixels.
+        downsample (int): The factor frames are downscaled by before diffing.
+        threshold (float): Mean absolute gray-level difference above which a tile is dirty.
+
+    Methods:
+        update: Compares a new frame with the previous one and stores it.
+        mark: Remembers the current frame as the one a result was computed on.
+        forget: Drops the frames remembered for results that no longer apply.
+        is_dirty: Whether any changed tile overlaps a region.
+        dirty_bounds: The bounding box of all changed tiles.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    tile_size: int = Field(default=64, description="The tile edge length in pixels")
+    downsample: int = Field(default=4, description="The downscale factor before diffing")
+    threshold: float = Field(default=2.0, description="The mean difference of a dirty tile")
+    _previous: np.ndarray | None = PrivateAttr(default=None)
+    _dirty: np.ndarray | None = PrivateAttr(default=None)
+    _active: bool = PrivateAttr(default=True)
+    _origin: tuple[int, int] = PrivateAttr(default=(0, 0))
+    _references: dict[Hashable, tuple[tuple[int, int], np.ndarray]] = PrivateAttr(
+        default_factory=dict
+    )
+    _since: dict[int, tuple[np.ndarray, np.ndarray | None]] = PrivateAttr(default_factory=dict)
+
+    @property
+    def any_dirty(self) -> bool:
+        """Whether the screen changed where the last two frames both show it."""
+        return self._active
+
+    def update(self, frame: Frame) -> np.ndarray | None:
+        """Compares a frame with the previous one and remembers it for the next call.
+
+        Args:
+            frame (Frame): The newly captured frame.
+
+        Returns:
+            np.ndarray | None: A boolean (rows, cols) grid of dirty tiles, or None when there
+                is no comparable previous frame and everything must be treated as changed.
+        """
+        small = frame.reduced(self.downsample)
+        previous, self._previous = self._previous, small
+        origin, self._origin = self._origin, frame.origin
+        self._since.clear()
+        compared = self._compare(previous, origin)
+        if compared is None:
+            self._dirty, self._active = None, True
+            return None
+        changed, unseen = compared
+        self._dirty, self._active = changed | unseen, bool(changed.any())
+        return self._dirty
+
+    def _compare(
+        self, previous: np.ndarray | None, origin: tuple[int, int]
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """Diffs the current frame with an earlier one where both show the same screen area.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray] | None: The tiles that changed and the tiles the
+                earlier frame did not show, or None when the frames cannot be compared.
+        """
+        if previous is None or self._previous is None:
+            return None
+        # Where the current frame starts within the earlier one, in downsampled pixels
+        offset_x, offset_y = (self._origin[0] - origin[0], self._origin[1] - origin[1])
+        if offset_x % self.downsample or offset_y % self.downsample:
+            return None
+        offset_x, offset_y = offset_x // self.downsample, offset_y // self.downsample
+        height, width = self._previous.shape[:2]
+        x0, y0 = max(-offset_x, 0), max(-offset_y, 0)
+        x1 = min(width, previous.shape[1] - offset_x)
+        y1 = min(height, previous.shape[0] - offset_y)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        if (x0, y0, x1, y1) == (0, 0, width, height) and previous.shape == self._previous.shape:
+            diff = cv2.absdiff(self._previous, previous)
+        else:
+            diff = np.zeros_like(self._previous)
+            diff[y0:y1, x0:x1] = cv2.absdiff(
+                self._previous[y0:y1, x0:x1],
+                previous[y0 + offset_y : y1 + offset_y, x0 + offset_x : x1 + offset_x],
+            )
+        step = max(self.tile_size // self.downsample, 1)
+        row_starts = np.arange(0, height, step)
+        col_starts = np.arange(0, width, step)
+        row_sums = np.add.reduceat(diff, row_starts, axis=0, dtype=np.int64)
+        tile_sums = np.add.reduceat(row_sums, col_starts, axis=1)
+        tile_heights = np.diff(np.append(row_starts, height))
+        tile_widths = np.diff(np.append(col_starts, width))
+        tile_means = tile_sums / np.outer(tile_heights, tile_widths)
+        seen_rows = (row_starts >= y0) & (row_starts + tile_heights <= y1)
+        seen_cols = (col_starts >= x0) & (col_starts + tile_widths <= x1)
+        return tile_means > self.threshold, ~np.outer(seen_rows, seen_cols)
+
+    def mark(self, key: Hashable) -> None:
+        """Remembers the current frame as the one the result stored under `key` came from."""
+        if self._previous is not None:
+            self._references[key] = (self._origin, self._previous)
+
+    def forget(self, keys: Iterable[Hashable] | None = None) -> None:
+        """Drops the frames marked under `keys`, or under every key when None."""
+        if keys is None:
+            self._references.clear()
+            return
+        for key in keys:
+            self._references.pop(key, None)
+
+    def _dirty_tiles(self, since: Hashable | None) -> np.ndarray | None:
+        if since is None:
+            return self._dirty
+        reference = self._references.get(since)
+        if reference is None:
+            return None
+        origin, small = reference
+        # Results computed on the same frame share their comparison within a tick
+        cached = self._since.get(id(small))
+        if cached is None:
+            compared = self._compare(small, origin)
+            dirty = None if compared is None else compared[0] | compared[1]
+            cached = self._since[id(small)] = (small, dirty)
+        return cached[1]
+
+    def is_dirty(
+        self, region: tuple[int, int, int, int] | None = None, since: Hashable | None = None
+    ) -> bool:
+        """Checks whether any changed tile overlaps a region.
+
+        Args:
+            region (tuple[int, int, int, int] | None): (x0, y0, x1, y1) in full-resolution
+                pixels, or None for the whole frame.
+            since (Hashable | None): Compare with the frame marked under this key instead of
+                the previous frame.
+
+        Returns:
+            bool: True when the region may have changed.
+        """
+        dirty = self._dirty_tiles(since)
+        if dirty is None:
+            return True
+        if region is None:
+            return bool(dirty.any())
+        x0, y0, x1, y1 = region
+        step = max(self.tile_size // self.downsample, 1) * self.downsample
+        rows = slice(y0 // step, (y1 - 1) // step + 1)
+        cols = slice(x0 // step, (x1 - 1) // step + 1)
+        return bool(dirty[rows, cols].any())
+
+    def dirty_bounds(self, since: Hashable | None = None) -> tuple[int, int, int, int] | None:
+        """Returns the bounding box of all changed tiles in full-resolution pixels.
+
+        Args:
+            since (Hashable | None): Compare with the frame marked under this key instead of
+                the previous frame.
+
+        Returns:
+            tuple[int, int, int, int] | None: (x0, y0, x1, y1), or None when nothing changed
+                or there is no frame to compare with.
+        """
+        dirty = self._dirty_tiles(since)
+        if dirty is None or not dirty.any():
+            return None
+        step = max(self.tile_size // self.downsample, 1) * self.downsample
+        rows = np.flatnonzero(dirty.any(axis=1))
+        cols = np.flatnonzero(dirty.any(axis=0))
+        return (
+            int(cols[0] * step),
+            int(rows[0] * step),
+            int((cols[-1] + 1) * step),
+            int((rows[-1] + 1) * step),
+        )
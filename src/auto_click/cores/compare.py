@@ -1,36 +1,135 @@
+import time
 from typing import TYPE_CHECKING
 import asyncio
 from pathlib import Path
-from functools import lru_cache
+from functools import cached_property
 
 import cv2
 import numpy as np
-import pandas as pd
 import logfire
-from pydantic import Field, BaseModel, ConfigDict
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
 import PIL.Image as Image
 
-from .config import ImageModel
+from .pool import MatchPool
+from .bundle import TemplateBundle, rescale_template
+from .config import MatchMode, ImageModel, MatcherName
+from .positions import PositionIndex
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
     from cv2.typing import MatLike
 
 
-@lru_cache(maxsize=32)
-def _load_and_convert_template(image_path: str) -> "MatLike":
+_template_bundles: list[TemplateBundle] = []
+_templates: dict[tuple[str, float], "MatLike"] = {}
+_reduced_templates: dict[tuple[str, int, float], "MatLike"] = {}
+
+
+def forget_templates(image_paths: "Iterable[str] | None" = None) -> None:
+    """Drops cached templates so they are read again on their next use.
+
+    Args:
+        image_paths (Iterable[str] | None): The templates to drop, every template when None.
+    """
+    if image_paths is None:
+        _templates.clear()
+        _reduced_templates.clear()
+        _orb_features.clear()
+        return
+    stale = set(image_paths)
+    for cache in (_templates, _reduced_templates, _orb_features):
+        # Matching threads may add entries meanwhile, so iterate over a snapshot of the keys
+        for key in list(cache):
+            if key[0] in stale:
+                cache.pop(key, None)
+
+
+def register_template_bundle(
+    bundle: TemplateBundle,
+    image_paths: "Iterable[str] | None" = None,
+    replaces: TemplateBundle | None = None,
+) -> None:
+    """Serves templates from a compiled bundle instead of decoding their PNG files.
+
+    Args:
+        bundle (TemplateBundle): The bundle to read templates from.
+        image_paths (Iterable[str] | None): The cached templates the bundle replaces, every
+            template when None.
+        replaces (TemplateBundle | None): An earlier bundle of the same templates to stop
+            serving from.
+    """
+    retired = {bundle.path} if replaces is None else {bundle.path, replaces.path}
+    _template_bundles[:] = [
+        registered for registered in _template_bundles if registered.path not in retired
+    ]
+    _template_bundles.insert(0, bundle)
+    forget_templates(image_paths)
+
+
+def _bundled_template(image_path: str, factor: int, scale: float = 1.0) -> "MatLike | None":
+    for bundle in _template_bundles:
+        if bundle.scale != scale:
+            continue
+        template = bundle.get(image_path, factor)
+        if template is not None:
+            return template
+    return None
+
+
+def _load_and_convert_template(image_path: str, scale: float = 1.0) -> "MatLike":
     """Load and convert template image to grayscale with caching.
 
     Args:
         image_path (str): Path to the template image.
+        scale (float): Resizes the template to a device of a different resolution.
 
     Returns:
         MatLike: Grayscale template image.
 
     Notes:
-        Results are cached using LRU cache to avoid repeated disk I/O.
+        Results are cached per path and scale until `forget_templates` drops them, to avoid
+        repeated disk I/O. Templates found in a registered bundle are memory-mapped views and
+        are never decoded.
+    """
+    key = (image_path, scale)
+    template = _templates.get(key)
+    if template is not None:
+        return template
+    template = _bundled_template(image_path, 1, scale)
+    if template is None and scale != 1:
+        template = rescale_template(_load_and_convert_template(image_path), scale)
+    if template is None:
+        color_button_image = cv2.imread(image_path)
+        template = cv2.cvtColor(color_button_image, cv2.COLOR_BGR2GRAY)
+    _templates[key] = template
+    return template
+
+
+def _load_reduced_template(image_path: str, factor: int, scale: float = 1.0) -> "MatLike":
+    """Load the grayscale template downscaled for the coarse pyramid level.
+
+    Args:
+        image_path (str): Path to the template image.
+        factor (int): The downscale factor of the coarse level.
+        scale (float): Resizes the template to a device of a different resolution.
+
+    Returns:
+        MatLike: Downscaled grayscale template image.
     """
-    color_button_image = cv2.imread(image_path)
-    return cv2.cvtColor(color_button_image, cv2.COLOR_BGR2GRAY)
+    key = (image_path, factor, scale)
+    template = _reduced_templates.get(key)
+    if template is not None:
+        return template
+    template = _bundled_template(image_path, factor, scale)
+    if template is None:
+        button_image = _load_and_convert_template(image_path, scale)
+        height, width = button_image.shape[:2]
+        template = cv2.resize(
+            button_image, (width // factor, height // factor), interpolation=cv2.INTER_AREA
+        )
+    _reduced_templates[key] = template
+    return template
 
 
 def _sync_match_template(
@@ -59,6 +158,360 @@ def _sync_match_template(
     return max_val, max_loc
 
 
+def _search_window(
+    center: tuple[int, int],
+    template_shape: tuple[int, ...],
+    frame_shape: tuple[int, ...],
+    padding: int,
+) -> tuple[int, int, int, int] | None:
+    """Computes a padded search window around a known button center.
+
+    Args:
+        center (tuple[int, int]): The last known (x, y) center of the button.
+        template_shape (tuple[int, ...]): The shape of the grayscale template.
+        frame_shape (tuple[int, ...]): The shape of the grayscale frame.
+        padding (int): Extra pixels to search on every side of the template.
+
+    Returns:
+        tuple[int, int, int, int] | None: (x0, y0, x1, y1) of the window, or None when the
+            clipped window cannot contain the template.
+    """
+    template_h, template_w = template_shape[:2]
+    frame_h, frame_w = frame_shape[:2]
+    x0 = max(center[0] - template_w // 2 - padding, 0)
+    y0 = max(center[1] - template_h // 2 - padding, 0)
+    x1 = min(center[0] + (template_w - template_w // 2) + padding, frame_w)
+    y1 = min(center[1] + (template_h - template_h // 2) + padding, frame_h)
+    if x1 - x0 < template_w or y1 - y0 < template_h:
+        return None
+    return x0, y0, x1, y1
+
+
+class Frame(BaseModel):
+    """A captured screen decoded once and shared by every template match in a tick.
+
+    Attributes:
+        source (Union[Image.Image, bytes, np.ndarray]): The raw screenshot as returned by the
+            capture backend; arrays are RGBA pixels from a raw framebuffer capture.
+        gray (np.ndarray): The decoded grayscale image used for template matching.
+        origin (tuple[int, int]): The screen position of the top-left pixel, non-zero for
+            captures clipped to a region of the screen.
+
+    Methods:
+        from_screenshot: Decodes a screenshot into a frame.
+        color: The BGR image, decoded lazily on first access.
+        reduced: The grayscale image downscaled for the pyramid match mode.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    source: Image.Image | bytes | np.ndarray = Field(..., description="The raw screenshot data")
+    gray: np.ndarray = Field(..., description="The grayscale image used for matching")
+    origin: tuple[int, int] = Field(default=(0, 0), description="The screen position of (0, 0)")
+    _reduced: dict[int, np.ndarray] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_screenshot(
+        cls, screenshot: "Image.Image | bytes | np.ndarray", origin: tuple[int, int] = (0, 0)
+    ) -> "Frame":
+        """Decodes a screenshot straight to grayscale without building a color image.
+
+        Args:
+            screenshot (Union[Image.Image, bytes, np.ndarray]): PNG or JPEG bytes, a PIL image
+                or RGBA pixels.
+            origin (tuple[int, int]): The screen position of the screenshot's top-left pixel.
+
+        Returns:
+            Frame: The decoded frame.
+        """
+        if isinstance(screenshot, np.ndarray):
+            gray_screenshot = cv2.cvtColor(screenshot, cv2.COLOR_RGBA2GRAY)
+        elif isinstance(screenshot, bytes):
+            screenshot_array = np.frombuffer(screenshot, dtype=np.uint8)
+            gray_screenshot = cv2.imdecode(screenshot_array, cv2.IMREAD_GRAYSCALE)
+        elif screenshot.mode == "L":
+            gray_screenshot = np.asarray(screenshot)
+        elif screenshot.mode == "RGBA":
+            gray_screenshot = cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGBA2GRAY)
+        else:
+            gray_screenshot = cv2.cvtColor(
+                np.asarray(screenshot.convert("RGB")), cv2.COLOR_RGB2GRAY
+            )
+        return cls(source=screenshot, gray=gray_screenshot, origin=origin)
+
+    @property
+    def width(self) -> int:
+        return int(self.gray.shape[1])
+
+    @property
+    def height(self) -> int:
+        return int(self.gray.shape[0])
+
+    def reduced(self, factor: int) -> "MatLike":
+        """Returns the grayscale image downscaled by `factor`, computed once per frame.
+
+        Args:
+            factor (int): The downscale factor.
+
+        Returns:
+            MatLike: The downscaled grayscale image.
+        """
+        if factor not in self._reduced:
+            self._reduced[factor] = cv2.resize(
+                self.gray,
+                (self.width // factor, self.height // factor),
+                interpolation=cv2.INTER_AREA,
+            )
+        return self._reduced[factor]
+
+    @cached_property
+    def color(self) -> "MatLike":
+        """The BGR image, only decoded when a consumer actually needs color."""
+        if isinstance(self.source, np.ndarray):
+            return cv2.cvtColor(self.source, cv2.COLOR_RGBA2BGR)
+        if isinstance(self.source, bytes):
+            screenshot_array = np.frombuffer(self.source, dtype=np.uint8)
+            return cv2.imdecode(screenshot_array, cv2.IMREAD_COLOR)
+        return cv2.cvtColor(np.asarray(self.source.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def _sync_match_pyramid(
+    gray_screenshot: "MatLike",
+    reduced_screenshot: "MatLike",
+    button_image: "MatLike",
+    reduced_button_image: "MatLike",
+    factor: int,
+    top_k: int = 3,
+) -> tuple[float, tuple[int, int]]:
+    """Match on the coarse level, then refine the best candidates at full resolution.
+
+    Args:
+        gray_screenshot (MatLike): Full-resolution grayscale screenshot.
+        reduced_screenshot (MatLike): Screenshot downscaled by `factor`.
+        button_image (MatLike): Full-resolution grayscale template.
+        reduced_button_image (MatLike): Template downscaled by `factor`.
+        factor (int): The downscale factor between the two levels.
+        top_k (int): How many coarse candidates are refined.
+
+    Returns:
+        tuple[float, tuple[int, int]]: (max_val, max_loc) of the best full-resolution match,
+            so the score is comparable with `_sync_match_template`.
+    """
+    coarse_matched = cv2.matchTemplate(
+        reduced_screenshot, reduced_button_image, cv2.TM_CCOEFF_NORMED
+    )
+    template_h, template_w = button_image.shape[:2]
+    reduced_h, reduced_w = reduced_button_image.shape[:2]
+    frame_h, frame_w = gray_screenshot.shape[:2]
+    margin = factor * 2
+    best_val, best_loc = -1.0, (0, 0)
+    for _ in range(top_k):
+        _, coarse_val, _, (coarse_x, coarse_y) = cv2.minMaxLoc(coarse_matched)
+        if coarse_val <= -1.0:
+            break
+        x0 = max(coarse_x * factor - margin, 0)
+        y0 = max(coarse_y * factor - margin, 0)
+        x1 = min(coarse_x * factor + template_w + margin, frame_w)
+        y1 = min(coarse_y * factor + template_h + margin, frame_h)
+        if x1 - x0 >= template_w and y1 - y0 >= template_h:
+            max_val, (loc_x, loc_y) = _sync_match_template(
+                gray_screenshot[y0:y1, x0:x1], button_image
+            )
+            if max_val > best_val:
+                best_val, best_loc = max_val, (loc_x + x0, loc_y + y0)
+        # Suppress this candidate so the next iteration picks a different peak
+        coarse_matched[
+            max(coarse_y - reduced_h // 2, 0) : coarse_y + reduced_h // 2 + 1,
+            max(coarse_x - reduced_w // 2, 0) : coarse_x + reduced_w // 2 + 1,
+        ] = -1.0
+    return best_val, best_loc
+
+
+def _score_at(gray_screenshot: "MatLike", button_image: "MatLike", loc: tuple[int, int]) -> float:
+    """The `TM_CCOEFF_NORMED` score of the template at one location, 0 when it does not fit."""
+    x, y = loc
+    template_h, template_w = button_image.shape[:2]
+    frame_h, frame_w = gray_screenshot.shape[:2]
+    if x < 0 or y < 0 or x + template_w > frame_w or y + template_h > frame_h:
+        return 0.0
+    patch = gray_screenshot[y : y + template_h, x : x + template_w]
+    return float(cv2.matchTemplate(patch, button_image, cv2.TM_CCOEFF_NORMED)[0, 0])
+
+
+def _sync_match_sqdiff(
+    gray_screenshot: "MatLike", button_image: "MatLike", factor: int = 4, reject_above: float = 0.3
+) -> tuple[float, tuple[int, int]]:
+    """Locate the template by squared differences, rejecting frames early on a coarse level.
+
+    The coarse level is a `factor` times smaller search, and a frame whose best coarse
+    difference is above `reject_above` cannot contain the template, so it is never searched
+    at full resolution. Otherwise only a small window around the coarse hit is refined.
+
+    Args:
+        gray_screenshot (MatLike): Grayscale screenshot image.
+        button_image (MatLike): Grayscale template image.
+        factor (int): The downscale factor of the coarse level.
+        reject_above (float): The normalized squared difference that rejects the frame.
+
+    Returns:
+        tuple[float, tuple[int, int]]: The `TM_CCOEFF_NORMED` score at the best location and
+            that location, so the score is comparable with `_sync_match_template`.
+    """
+    template_h, template_w = button_image.shape[:2]
+    frame_h, frame_w = gray_screenshot.shape[:2]
+    if min(template_h, template_w) // factor < 8:
+        matched = cv2.matchTemplate(gray_screenshot, button_image, cv2.TM_SQDIFF_NORMED)
+        _, _, min_loc, _ = cv2.minMaxLoc(matched)
+        return _score_at(gray_screenshot, button_image, min_loc), min_loc
+    reduced_screenshot = cv2.resize(
+        gray_screenshot, (frame_w // factor, frame_h // factor), interpolation=cv2.INTER_AREA
+    )
+    reduced_button_image = cv2.resize(
+        button_image, (template_w // factor, template_h // factor), interpolation=cv2.INTER_AREA
+    )
+    coarse_matched = cv2.matchTemplate(
+        reduced_screenshot, reduced_button_image, cv2.TM_SQDIFF_NORMED
+    )
+    min_val, _, (coarse_x, coarse_y), _ = cv2.minMaxLoc(coarse_matched)
+    if min_val > reject_above:
+        return 0.0, (coarse_x * factor, coarse_y * factor)
+    margin = factor * 2
+    x0 = max(coarse_x * factor - margin, 0)
+    y0 = max(coarse_y * factor - margin, 0)
+    x1 = min(coarse_x * factor + template_w + margin, frame_w)
+    y1 = min(coarse_y * factor + template_h + margin, frame_h)
+    matched = cv2.matchTemplate(gray_screenshot[y0:y1, x0:x1], button_image, cv2.TM_SQDIFF_NORMED)
+    _, _, (loc_x, loc_y), _ = cv2.minMaxLoc(matched)
+    loc = (loc_x + x0, loc_y + y0)
+    return _score_at(gray_screenshot, button_image, loc), loc
+
+
+def _orb(nfeatures: int) -> cv2.ORB:
+    # Small patches leave keypoints near the border of small button templates
+    return cv2.ORB_create(nfeatures=nfeatures, edgeThreshold=15, patchSize=15)
+
+
+_orb_features: dict[tuple[str, float], tuple[tuple, np.ndarray | None]] = {}
+
+
+def _template_features(
+    button_image: "MatLike", template_key: tuple[str, float] | None
+) -> tuple[tuple, np.ndarray | None]:
+    """ORB keypoints of a template, computed once per process, template path and scale."""
+    if template_key is None:
+        return _orb(nfeatures=500).detectAndCompute(button_image, None)
+    if template_key not in _orb_features:
+        _orb_features[template_key] = _orb(nfeatures=500).detectAndCompute(button_image, None)
+    return _orb_features[template_key]
+
+
+def _sync_match_orb(
+    gray_screenshot: "MatLike",
+    button_image: "MatLike",
+    template_key: tuple[str, float] | None = None,
+    ratio: float = 0.75,
+) -> tuple[float, tuple[int, int]]:
+    """Locate the template by matching ORB keypoints, which tolerates a different scale.
+
+    Args:
+        gray_screenshot (MatLike): Grayscale screenshot image.
+        button_image (MatLike): Grayscale template image.
+        template_key (tuple[str, float] | None): The template's image path and scale, which
+            caches its keypoints; they are computed on every call when None.
+        ratio (float): Lowe's ratio test threshold for keypoint matches.
+
+    Returns:
+        tuple[float, tuple[int, int]]: The `TM_CCOEFF_NORMED` score of the template resized
+            to the found scale, and where an unscaled template would have to be placed for
+            its center to land on the found center.
+    """
+    template_keypoints, template_descriptors = _template_features(button_image, template_key)
+    if template_descriptors is None or len(template_keypoints) < 4:
+        return 0.0, (0, 0)
+    frame_keypoints, frame_descriptors = _orb(nfeatures=5000).detectAndCompute(
+        gray_screenshot, None
+    )
+    if frame_descriptors is None or len(frame_keypoints) < 4:
+        return 0.0, (0, 0)
+    pairs = cv2.BFMatcher(cv2.NORM_HAMMING).knnMatch(template_descriptors, frame_descriptors, k=2)
+    good = [
+        pair[0] for pair in pairs if len(pair) == 2 and pair[0].distance < ratio * pair[1].distance
+    ]
+    if len(good) < 4:
+        return 0.0, (0, 0)
+    source = np.float32([template_keypoints[m.queryIdx].pt for m in good])
+    target = np.float32([frame_keypoints[m.trainIdx].pt for m in good])
+    affine, _ = cv2.estimateAffinePartial2D(source, target, method=cv2.RANSAC)
+    if affine is None:
+        return 0.0, (0, 0)
+    template_h, template_w = button_image.shape[:2]
+    center_x, center_y = affine @ np.array([template_w / 2, template_h / 2, 1.0])
+    scale = float(np.hypot(affine[0, 0], affine[1, 0]))
+    scaled = rescale_template(button_image, scale) if abs(scale - 1) > 0.02 else button_image
+    scaled_h, scaled_w = scaled.shape[:2]
+    score = _score_at(
+        gray_screenshot, scaled, (round(center_x - scaled_w / 2), round(center_y - scaled_h / 2))
+    )
+    return score, (round(center_x - template_w / 2), round(center_y - template_h / 2))
+
+
+MATCHERS: dict[MatcherName, "Callable[[MatLike, MatLike], tuple[float, tuple[int, int]]]"] = {
+    "ccoeff": _sync_match_template,
+    "sqdiff": _sync_match_sqdiff,
+    "orb": _sync_match_orb,
+}
+
+
+def select_matcher(
+    button_image: "MatLike",
+    samples: list[tuple["MatLike", tuple[int, int] | None]],
+    confidence: float,
+    repeat: int = 3,
+    tolerance: int = 4,
+) -> tuple[MatcherName, dict[str, float]]:
+    """Times every matcher on sample frames and picks the fastest one that is accurate.
+
+    A matcher is accurate when it scores above `confidence` within `tolerance` pixels of the
+    expected location on every frame that shows the template, and never scores above it on
+    a frame that does not. Samples that never show the template cannot tell whether a
+    matcher finds it at all, so they keep `ccoeff`.
+
+    Args:
+        button_image (MatLike): Grayscale template image.
+        samples (list[tuple[MatLike, tuple[int, int] | None]]): Grayscale frames with the
+            expected top-left corner of the template, or None when it is not on the frame.
+        confidence (float): The template's confidence threshold.
+        repeat (int): How many times each matcher runs on each frame.
+        tolerance (int): Pixels a location may be off.
+
+    Returns:
+        tuple[MatcherName, dict[str, float]]: The chosen matcher, `ccoeff` when none is
+            accurate or no sample shows the template, and the mean milliseconds per frame of each accurate matcher.
+    """
+    timings: dict[str, float] = {}
+    for name, matcher in MATCHERS.items():
+        accurate = True
+        started = time.perf_counter()
+        for gray_screenshot, expected in samples:
+            for _ in range(repeat):
+                max_val, (loc_x, loc_y) = matcher(gray_screenshot, button_image)
+            if expected is None:
+                accurate = max_val <= confidence
+            else:
+                accurate = (
+                    max_val > confidence
+                    and abs(loc_x - expected[0]) <= tolerance
+                    and abs(loc_y - expected[1]) <= tolerance
+                )
+            if not accurate:
+                break
+        if accurate:
+            timings[name] = (time.perf_counter() - started) / (repeat * len(samples)) * 1000
+    if not timings or all(expected is None for _, expected in samples):
+        return "ccoeff", timings
+    return min(timings, key=timings.get), timings
+
+
 class FoundPosition(BaseModel):
     """Represents the position of a found button on the screen.
 
@@ -115,7 +568,19 @@ class ImageComparison(BaseModel):
 
     Attributes:
         image_cfg (ImageModel): The image configuration.
-        screenshot (Union[Image.Image, bytes]): The screenshot image.
+        screenshot (Union[Image.Image, bytes, np.ndarray, Frame]): The screenshot image or an
+            already decoded frame.
+        position_index (Optional[PositionIndex]): Known button centers used to narrow the search.
+        roi_padding (int): Pixels searched around the template at its last known position.
+        match_mode (MatchMode): `full` resolution matching or coarse-to-fine `pyramid` matching.
+        pyramid_factor (int): The downscale factor of the coarse pyramid level.
+        search_region (Optional[tuple[int, int, int, int]]): Limits the full-frame search to
+            this (x0, y0, x1, y1) region, e.g. the part of the screen that changed.
+        match_pool (Optional[MatchPool]): A shared worker pool, `asyncio.to_thread` when None.
+        owner (str): The device the matches are scheduled for in the shared pool.
+        template_scale (float): Resizes templates to the resolution of the device, as
+            calibrated by `calibrate.estimate_scale`.
+        matcher (MatcherName): The matching backend, see `MATCHERS`.
 
     Methods:
         __save_images: Saves the images to the logs directory.
@@ -126,32 +591,94 @@ class ImageComparison(BaseModel):
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
     image_cfg: ImageModel = Field(..., description="The image configuration")
-    screenshot: Image.Image | bytes = Field(..., description="The screenshot image")
+    screenshot: Image.Image | bytes | np.ndarray | Frame = Field(
+        ..., description="The screenshot image"
+    )
+    position_index: PositionIndex | None = Field(
+        default=None, description="Known button centers used to narrow the search"
+    )
+    roi_padding: int = Field(
+        default=80, description="Pixels searched around the template at its last known position"
+    )
+    match_mode: MatchMode = Field(default="full", description="The full-frame match mode")
+    pyramid_factor: int = Field(default=2, description="The coarse pyramid downscale factor")
+    search_region: tuple[int, int, int, int] | None = Field(
+        default=None, description="Limits the full-frame search to this (x0, y0, x1, y1) region"
+    )
+    match_pool: MatchPool | None = Field(default=None, description="A shared worker pool")
+    owner: str = Field(default="", description="The device the matches are scheduled for")
+    template_scale: float = Field(default=1.0, description="The template to frame scale")
+    matcher: MatcherName = Field(default="ccoeff", description="The matching backend")
+
+    @cached_property
+    def frame(self) -> Frame:
+        """The decoded frame, shared with other comparisons when one was passed in."""
+        if isinstance(self.screenshot, Frame):
+            return self.screenshot
+        return Frame.from_screenshot(self.screenshot)
+
+    async def _run_match(
+        self, func: "Callable[..., tuple[float, tuple[int, int]]]", *args: object
+    ) -> tuple[float, tuple[int, int]]:
+        """Runs a matching function in the shared pool, or a thread when there is none."""
+        if self.match_pool is None:
+            return await asyncio.to_thread(func, *args)
+        return await self.match_pool.run(self.owner, func, *args)
+
+    async def _run_matcher(
+        self, gray_region: "MatLike", button_image: "MatLike"
+    ) -> tuple[float, tuple[int, int]]:
+        """Runs the selected matcher, letting `orb` cache the template's keypoints."""
+        if self.matcher == "orb":
+            template_key = (self.image_cfg.image_path, self.template_scale)
+            return await self._run_match(_sync_match_orb, gray_region, button_image, template_key)
+        return await self._run_match(MATCHERS[self.matcher], gray_region, button_image)
+
+    async def _match_full_frame(self, button_image: "MatLike") -> tuple[float, tuple[int, int]]:
+        """Matches the template against the whole frame, or `search_region`, in a thread pool.
 
-    async def record_position(self) -> None:
-        """Record position data to CSV file asynchronously.
+        Args:
+            button_image (MatLike): Grayscale template image.
 
-        This method runs the CSV I/O operations in a thread pool to avoid blocking.
+        Returns:
+            tuple[float, tuple[int, int]]: (max_val, max_loc) from matching, in frame pixels.
         """
-
-        def _sync_record_position() -> None:
-            """Synchronous helper for CSV operations."""
-            position_data = pd.DataFrame()
-            position_log_path = Path("./logs/positions.csv")
-            if position_log_path.exists():
-                position_data = pd.read_csv(position_log_path)
-
-            data_dict_list = [self.image_cfg.model_dump()]
-            new_position_data = pd.DataFrame(data_dict_list).astype(str)
-            merged_data = pd.concat([position_data, new_position_data], ignore_index=True)
-            merged_data = merged_data.drop_duplicates(
-                subset=["image_name", "image_path"], keep="last"
+        frame = self.frame
+        x0, y0, x1, y1 = self.search_region or (0, 0, frame.width, frame.height)
+        # The other backends have their own coarse level or do not use one
+        if self.match_mode == "pyramid" and self.matcher == "ccoeff":
+            factor = self.pyramid_factor
+            reduced_button_image = _load_reduced_template(
+                self.image_cfg.image_path, factor, self.template_scale
             )
-            merged_data = merged_data.reset_index(drop=True)
-            merged_data.to_csv(position_log_path.as_posix(), index=False)
-
-        # Run CSV operations in thread pool to avoid blocking
-        await asyncio.to_thread(_sync_record_position)
+            # Align the region with the coarse grid so both levels share the same origin
+            x0, y0 = x0 - x0 % factor, y0 - y0 % factor
+            gray_region = frame.gray[y0:y1, x0:x1]
+            reduced_region = frame.reduced(factor)[
+                y0 // factor : y1 // factor, x0 // factor : x1 // factor
+            ]
+            # Tiny templates lose too much detail on the coarse level to be located reliably
+            if min(reduced_button_image.shape[:2]) >= 8 and all(
+                r >= t
+                for r, t in zip(reduced_region.shape, reduced_button_image.shape, strict=True)
+            ):
+                max_val, (loc_x, loc_y) = await self._run_match(
+                    _sync_match_pyramid,
+                    gray_region,
+                    reduced_region,
+                    button_image,
+                    reduced_button_image,
+                    factor,
+                )
+                return max_val, (loc_x + x0, loc_y + y0)
+        gray_region = frame.gray[y0:y1, x0:x1]
+        if (
+            gray_region.shape[0] < button_image.shape[0]
+            or gray_region.shape[1] < button_image.shape[1]
+        ):
+            return -1.0, (0, 0)
+        max_val, (loc_x, loc_y) = await self._run_matcher(gray_region, button_image)
+        return max_val, (loc_x + x0, loc_y + y0)
 
     async def find(self) -> FoundPosition:
         """Finds the position of a button image within a screenshot.
@@ -165,27 +692,35 @@ class ImageComparison(BaseModel):
         Notes:
             CPU-intensive template matching is run in a thread pool for better performance.
         """
-        # Convert screenshot to numpy array and grayscale in one step
-        if isinstance(self.screenshot, bytes):
-            # For bytes, decode directly to grayscale
-            screenshot_array = np.frombuffer(self.screenshot, dtype=np.uint8)
-            color_screenshot = cv2.imdecode(screenshot_array, cv2.IMREAD_COLOR)
-        else:
-            # For PIL Image, convert to array
-            color_screenshot = np.array(self.screenshot)
-            color_screenshot = cv2.cvtColor(color_screenshot, cv2.COLOR_RGB2BGR)
-
-        # Convert screenshot to grayscale
-        gray_screenshot: MatLike = cv2.cvtColor(color_screenshot, cv2.COLOR_BGR2GRAY)
+        # Reuse the frame decoded once per tick, or decode it here for standalone use
+        gray_screenshot: MatLike = self.frame.gray
 
         # Load and convert template image (cached)
-        button_image: MatLike = _load_and_convert_template(self.image_cfg.image_path)
-
-        # Match the button image with the screenshot (run in thread pool)
-        max_val, max_loc = await asyncio.to_thread(
-            _sync_match_template, gray_screenshot, button_image
+        button_image: MatLike = _load_and_convert_template(
+            self.image_cfg.image_path, self.template_scale
         )
 
+        # Search around the last known position first, then fall back to the full frame
+        max_val, max_loc = -1.0, (0, 0)
+        known_position = self.position_index.get(self.image_cfg) if self.position_index else None
+        origin_x, origin_y = self.frame.origin
+        window = None
+        if known_position is not None:
+            window = _search_window(
+                (known_position[0] - origin_x, known_position[1] - origin_y),
+                button_image.shape,
+                gray_screenshot.shape,
+                self.roi_padding,
+            )
+        if window is not None:
+            x0, y0, x1, y1 = window
+            max_val, (loc_x, loc_y) = await self._run_matcher(
+                gray_screenshot[y0:y1, x0:x1], button_image
+            )
+            max_loc = (loc_x + x0, loc_y + y0)
+        if max_val <= self.image_cfg.confidence:
+            max_val, max_loc = await self._match_full_frame(button_image)
+
         if max_val > self.image_cfg.confidence:
             logfire.info(
                 "Found Position from Current Screen",
@@ -193,9 +728,9 @@ class ImageComparison(BaseModel):
                 **self.image_cfg.model_dump(exclude_none=True),
             )
 
-            # Calculate X and Y coordinates of the button center
-            click_x = int(max_loc[0] + button_image.shape[1] // 2)
-            click_y = int(max_loc[1] + button_image.shape[0] // 2)
+            # Calculate X and Y coordinates of the button center on screen
+            click_x = int(origin_x + max_loc[0] + button_image.shape[1] // 2)
+            click_y = int(origin_y + max_loc[1] + button_image.shape[0] // 2)
             logfire.info(
                 "Found Image",
                 button_x=click_x,
@@ -203,6 +738,9 @@ class ImageComparison(BaseModel):
                 button_name_en=Path(self.image_cfg.image_path).stem,
                 button_name_cn=self.image_cfg.image_name,
             )
+            if self.position_index is not None:
+                # Persisted by the index's background flusher, off the tick loop
+                self.position_index.update(self.image_cfg, click_x, click_y)
 
             return FoundPosition(
                 button_x=click_x,
@@ -1,5 +1,14 @@
+from typing import Literal
+
 from pydantic import Field, BaseModel, model_validator
 
+MatchMode = Literal["full", "pyramid"]
+MatcherName = Literal["ccoeff", "sqdiff", "orb"]
+AdbCaptureMode = Literal["png", "raw", "stream"]
+ArchiveFormat = Literal["jpeg", "webp"]
+BrowserCaptureMode = Literal["reload", "persistent", "screencast"]
+BrowserImageFormat = Literal["png", "jpeg"]
+
 
 class ImageModel(BaseModel):
     image_name: str = Field(
@@ -36,6 +45,55 @@ class ImageModel(BaseModel):
         frozen=True,
         deprecated=False,
     )
+    match_mode: MatchMode | None = Field(
+        default=None,
+        title="Match Mode",
+        description="Overrides the config-wide match mode for this image.",
+        frozen=True,
+        deprecated=False,
+    )
+    matcher: MatcherName | None = Field(
+        default=None,
+        title="Matcher",
+        description="Overrides the matcher chosen by `benchmark.py matchers` and the config-wide matcher for this image.",
+        frozen=True,
+        deprecated=False,
+    )
+    check_every: int = Field(
+        default=1,
+        ge=1,
+        title="Check Every N Ticks",
+        description="Only test this image every N ticks, for screens that rarely appear.",
+        frozen=True,
+        deprecated=False,
+    )
+
+
+class SceneModel(BaseModel):
+    name: str = Field(
+        ..., title="Scene Name", description="The name of the scene", frozen=True, deprecated=False
+    )
+    images: list[str] = Field(
+        ...,
+        title="Scene Images",
+        description="The `image_name`s that can appear in this scene, only these are tested while in it.",
+        frozen=True,
+        deprecated=False,
+    )
+    transitions: dict[str, str] = Field(
+        default_factory=dict,
+        title="Scene Transitions",
+        description="The scene to move to after an image is found, keyed by `image_name`.",
+        frozen=True,
+        deprecated=False,
+    )
+    timeout: float | None = Field(
+        default=None,
+        title="Scene Timeout",
+        description="Seconds without any hit before falling back to testing every image, `scene_timeout` when unset.",
+        frozen=True,
+        deprecated=False,
+    )
 
 
 class DeviceModel(BaseModel):
@@ -84,3 +142,201 @@ class ConfigModel(DeviceModel):
         frozen=True,
         deprecated=False,
     )
+    roi_padding: int = Field(
+        default=80,
+        title="Search Window Padding",
+        description="Pixels searched around a template's last known position before falling back to the full screen.",
+        frozen=True,
+        deprecated=False,
+    )
+    match_mode: MatchMode = Field(
+        default="full",
+        title="Match Mode",
+        description="Either `full` for full-resolution matching or `pyramid` for coarse-to-fine matching.",
+        frozen=True,
+        deprecated=False,
+    )
+    pyramid_factor: Literal[2, 4] = Field(
+        default=2,
+        title="Pyramid Factor",
+        description="The downscale factor of the coarse level used by the pyramid match mode.",
+        frozen=True,
+        deprecated=False,
+    )
+    matcher: MatcherName = Field(
+        default="ccoeff",
+        title="Matcher",
+        description="`ccoeff` normalized cross-correlation, `sqdiff` squared differences with early rejection, or `orb` keypoints for large or scaled templates.",
+        frozen=True,
+        deprecated=False,
+    )
+    matcher_selection_path: str = Field(
+        default="./logs/matchers.json",
+        title="Matcher Selection",
+        description="The per-image matchers picked by `benchmark.py matchers`, used for images without their own `matcher`.",
+        frozen=True,
+        deprecated=False,
+    )
+    capture_mode: AdbCaptureMode = Field(
+        default="png",
+        title="ADB Capture Mode",
+        description="`png` screenshots, `raw` framebuffer captures, or raw frames `stream`ed over one shell session.",
+        frozen=True,
+        deprecated=False,
+    )
+    foreground_check_interval: float = Field(
+        default=5.0,
+        title="Foreground Check Interval",
+        description="Seconds between background checks that the target app is still in the foreground.",
+        frozen=True,
+        deprecated=False,
+    )
+    foreground_check_misses: int = Field(
+        default=10,
+        title="Foreground Check After Misses",
+        description="Check the foreground app right away after this many ticks without any match.",
+        frozen=True,
+        deprecated=False,
+    )
+    browser_capture_mode: BrowserCaptureMode = Field(
+        default="reload",
+        title="Browser Capture Mode",
+        description="`reload` the page before every capture, keep a `persistent` page and take screenshots of it, or receive frames from a CDP `screencast`.",
+        frozen=True,
+        deprecated=False,
+    )
+    browser_image_format: BrowserImageFormat = Field(
+        default="png",
+        title="Browser Image Format",
+        description="Capture browser frames as lossless `png` or faster `jpeg`.",
+        frozen=True,
+        deprecated=False,
+    )
+    browser_full_capture_every: int = Field(
+        default=10,
+        ge=1,
+        title="Browser Full Capture Interval",
+        description="In `persistent` mode, only the regions around known template positions are captured, except on every Nth tick.",
+        frozen=True,
+        deprecated=False,
+    )
+    screenshot_format: ArchiveFormat = Field(
+        default="jpeg",
+        title="Screenshot Format",
+        description="The format frames are archived in when an image with `enable_screenshot` is found.",
+        frozen=True,
+        deprecated=False,
+    )
+    screenshot_quality: int = Field(
+        default=80,
+        ge=1,
+        le=100,
+        title="Screenshot Quality",
+        description="The JPEG or WebP quality of archived frames.",
+        frozen=True,
+        deprecated=False,
+    )
+    screenshot_scale: float = Field(
+        default=1.0,
+        gt=0,
+        le=1,
+        title="Screenshot Scale",
+        description="Archived frames are downscaled by this factor before encoding.",
+        frozen=True,
+        deprecated=False,
+    )
+    screenshot_quota_mb: float = Field(
+        default=512.0,
+        gt=0,
+        title="Screenshot Quota",
+        description="The most disk space in megabytes archived frames may use, the oldest are deleted first.",
+        frozen=True,
+        deprecated=False,
+    )
+    stop_after_click: bool = Field(
+        default=True,
+        title="Stop After Click",
+        description="End the tick after the first click, since the click changes the screen the rest of the frame was captured from.",
+        frozen=True,
+        deprecated=False,
+    )
+    match_batch_size: int = Field(
+        default=4,
+        ge=1,
+        title="Match Batch Size",
+        description="Images matched concurrently, most often hit first; later batches are skipped once a clickable image is found.",
+        frozen=True,
+        deprecated=False,
+    )
+    rare_hit_rate: float = Field(
+        default=0.05,
+        ge=0,
+        le=1,
+        title="Rare Hit Rate",
+        description="Images recently found less often than this are tested less often.",
+        frozen=True,
+        deprecated=False,
+    )
+    max_check_interval: int = Field(
+        default=4,
+        ge=1,
+        title="Max Check Interval",
+        description="The most ticks between two tests of a rarely found image, 1 to test every image every tick.",
+        frozen=True,
+        deprecated=False,
+    )
+    calibration_anchors: list[str] = Field(
+        default_factory=list,
+        title="Calibration Anchors",
+        description="The `image_name`s used to find the template scale on the first frame of a device with a different resolution; no calibration when empty.",
+        frozen=True,
+        deprecated=False,
+    )
+    calibration_confidence: float = Field(
+        default=0.8,
+        title="Calibration Confidence",
+        description="The match score an anchor must reach for a calibrated scale to be used.",
+        frozen=True,
+        deprecated=False,
+    )
+    calibration_retry_interval: int = Field(
+        default=30,
+        ge=1,
+        title="Calibration Retry Interval",
+        description="Ticks between two anchor searches while no calibration anchor is on screen.",
+        frozen=True,
+        deprecated=False,
+    )
+    scenes: list[SceneModel] = Field(
+        default_factory=list,
+        title="Scenes",
+        description="An optional scene graph, starting in the first scene; every image is tested every tick when empty.",
+        frozen=True,
+        deprecated=False,
+    )
+    scene_timeout: float = Field(
+        default=30.0,
+        gt=0,
+        title="Scene Timeout",
+        description="Seconds without any hit in a scene before falling back to testing every image.",
+        frozen=True,
+        deprecated=False,
+    )
+
+    @model_validator(mode="after")
+    def _check_image_names(self) -> "ConfigModel":
+        image_names = {image_cfg.image_name for image_cfg in self.image_list}
+        scene_names = {scene.name for scene in self.scenes}
+        if len(scene_names) != len(self.scenes):
+            raise ValueError("Scene names must be unique.")
+        for scene in self.scenes:
+            unknown_images = (set(scene.images) | set(scene.transitions)) - image_names
+            if unknown_images:
+                raise ValueError(f"Scene {scene.name} names unknown images: {unknown_images}")
+            unknown_scenes = set(scene.transitions.values()) - scene_names
+            if unknown_scenes:
+                raise ValueError(f"Scene {scene.name} moves to unknown scenes: {unknown_scenes}")
+        unknown_anchors = set(self.calibration_anchors) - image_names
+        if unknown_anchors:
+            raise ValueError(f"Unknown calibration anchors: {unknown_anchors}")
+        return self
@@ -0,0 +1,311 @@
+import time
+from typing import TypeVar
+import asyncio
+from functools import partial
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+import numpy as np
+import logfire
+from adbutils import AppInfo, AdbClient, AdbDevice, adb
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr, model_validator
+from adbutils.errors import AdbError
+
+from .input import TouchScreen, InputChannel
+from .config import AdbCaptureMode
+from .framebuffer import FramebufferStream, capture_raw
+
+T = TypeVar("T")
+
+
+class AsyncAdbDevice(BaseModel):
+    """Runs ADB calls for one device off the event loop, reconnecting when they fail.
+
+    Every device gets its own small thread pool and its own ADB client, so a slow or hung
+    emulator only ever occupies its own threads and sockets while the other devices on the
+    same loop keep going. Calls time out, failed calls reconnect with exponential backoff
+    and are retried, and an idle device is pinged to keep its connection warm. Taps and
+    swipes are queued and sent in batches through one long-lived input shell, written to
+    the touchscreen with `sendevent` where the device allows it. The capture stream and
+    the input shell are each used by one thread at a time, and a reconnect waits for both
+    before it replaces them.
+
+    Attributes:
+        serial (str): The device serial, `host:port` for network devices.
+        client (AdbClient | None): The ADB client, a dedicated one when None.
+        timeout (float): Seconds before a call is abandoned.
+        max_retries (int): Retries of a failed idempotent call.
+        backoff (float): Seconds before the first reconnect, doubled on every further one.
+        max_backoff (float): The longest wait between reconnects.
+        keepalive_interval (float): Seconds of idleness before the device is pinged.
+        max_workers (int): Calls that may run on the device at the same time.
+        max_input_batch (int): The most queued input actions sent in one batch.
+        touch_injection (bool): Whether taps are written to the touchscreen directly.
+
+    Methods:
+        connect: Connects a network device.
+        run: Runs a function with the device in the device's threads.
+        screenshot: Captures a PNG screenshot.
+        capture: Captures a frame in the given capture mode.
+        app_current: Returns the foreground app.
+        send_input: Queues an input command and waits until the device ran it.
+        click: Taps the screen.
+        swipe: Swipes across the screen.
+        shell: Runs a shell command.
+        close: Stops the keepalive and the device's threads.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    serial: str = Field(..., description="The device serial")
+    client: AdbClient | None = Field(default=None, description="The ADB client")
+    timeout: float = Field(default=10.0, description="Seconds before a call is abandoned")
+    max_retries: int = Field(default=2, description="Retries of a failed idempotent call")
+    backoff: float = Field(default=0.5, description="Seconds before the first reconnect")
+    max_backoff: float = Field(default=8.0, description="The longest wait between reconnects")
+    keepalive_interval: float = Field(
+        default=15.0, description="Seconds of idleness before the device is pinged"
+    )
+    max_workers: int = Field(default=2, description="Concurrent calls on the device")
+    max_input_batch: int = Field(default=16, description="Input actions sent in one batch")
+    touch_injection: bool = Field(
+        default=True, description="Whether taps are written to the touchscreen directly"
+    )
+    _device: AdbDevice | None = PrivateAttr(default=None)
+    _stream: FramebufferStream | None = PrivateAttr(default=None)
+    _stream_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _keepalive: asyncio.Task[None] | None = PrivateAttr(default=None)
+    _last_used: float = PrivateAttr(default_factory=time.monotonic)
+    _input: InputChannel | None = PrivateAttr(default=None)
+    _input_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _input_queue: (
+        asyncio.Queue[tuple[Callable[[InputChannel], list[str]], asyncio.Future[None]]] | None
+    ) = PrivateAttr(default=None)
+    _input_task: asyncio.Task[None] | None = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _setup_client(self) -> "AsyncAdbDevice":
+        if self.client is None:
+            # Socket timeouts free the worker thread of a call the loop gave up on
+            self.client = AdbClient(host=adb.host, port=adb.port, socket_timeout=self.timeout)
+        return self
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix=f"adb-{self.serial}"
+            )
+        return self._executor
+
+    @property
+    def device(self) -> AdbDevice:
+        if self._device is None:
+            self._device = self.client.device(serial=self.serial)
+        return self._device
+
+    def _close_stream(self) -> None:
+        with self._stream_lock:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+
+    def _close_input(self) -> None:
+        with self._input_lock:
+            if self._input is not None:
+                self._input.close()
+                self._input = None
+
+    def _reconnect(self) -> None:
+        # Waits for a capture or an input batch still using the old sessions
+        self._close_stream()
+        self._close_input()
+        if ":" in self.serial:
+            self.client.connect(self.serial, timeout=self.timeout)
+        self._device = self.client.device(serial=self.serial)
+
+    async def connect(self) -> None:
+        """Connects a network device, a no-op for USB and emulator serials."""
+        if ":" in self.serial:
+            await self.run(lambda _: self.client.connect(self.serial, timeout=self.timeout))
+
+    async def run(
+        self,
+        func: Callable[[AdbDevice], T],
+        call_timeout: float | None = None,
+        retries: int | None = None,
+    ) -> T:
+        """Runs `func(device)` in the device's threads.
+
+        Args:
+            func (Callable[[AdbDevice], T]): The blocking ADB operation.
+            call_timeout (float | None): Seconds before giving up, defaults to `timeout`.
+            retries (int | None): Retries after reconnecting, defaults to `max_retries`.
+                Pass 0 for operations that must not run twice, like taps.
+
+        Returns:
+            T: The return value of `func`.
+
+        Raises:
+            AdbError: If the last attempt failed.
+            TimeoutError: If the last attempt timed out.
+        """
+        loop = asyncio.get_running_loop()
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, func, self.device),
+                    timeout=call_timeout or self.timeout,
+                )
+            except (AdbError, OSError, TimeoutError) as e:
+                if attempt >= retries:
+                    raise
+                delay = min(self.backoff * 2**attempt, self.max_backoff)
+                logfire.warn(
+                    "ADB call failed, reconnecting",
+                    serial=self.serial,
+                    attempt=attempt + 1,
+                    delay=delay,
+                    error=repr(e),
+                )
+                await asyncio.sleep(delay)
+                try:
+                    await loop.run_in_executor(self.executor, self._reconnect)
+                except (AdbError, OSError):
+                    logfire.warn("ADB reconnect failed", serial=self.serial)
+                attempt += 1
+                continue
+            self._last_used = time.monotonic()
+            if self._keepalive is None or self._keepalive.done():
+                self._keepalive = loop.create_task(self._keep_alive())
+            return result
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            if time.monotonic() - self._last_used < self.keepalive_interval:
+                continue
+            try:
+                await self.run(lambda device: device.shell("true"))
+            except (AdbError, OSError, TimeoutError):
+                logfire.warn("ADB keepalive failed", serial=self.serial)
+
+    async def screenshot(self) -> Image.Image:
+        return await self.run(lambda device: device.screenshot())
+
+    def _capture_stream(self, device: AdbDevice) -> np.ndarray:
+        with self._stream_lock:
+            # A reconnect drops the session, the next capture opens one on the new device
+            if self._stream is None:
+                self._stream = FramebufferStream(device=device)
+            return self._stream.capture()
+
+    async def capture(self, mode: AdbCaptureMode = "png") -> Image.Image | np.ndarray:
+        """Captures a frame as a PIL image or, for `raw` and `stream`, RGBA pixels.
+
+        Args:
+            mode (AdbCaptureMode): `png`, `raw` or `stream`.
+
+        Returns:
+            Image.Image | np.ndarray: The captured frame.
+        """
+        if mode == "stream":
+            return await self.run(self._capture_stream)
+        if mode == "raw":
+            return await self.run(capture_raw)
+        return await self.screenshot()
+
+    async def app_current(self) -> AppInfo:
+        return await self.run(lambda device: device.app_current())
+
+    def _send_input(
+        self, device: AdbDevice, actions: list[Callable[[InputChannel], list[str]]]
+    ) -> None:
+        with self._input_lock:
+            # A reconnect drops the session, the next batch opens one on the new device
+            if self._input is None:
+                touch = TouchScreen.probe(device) if self.touch_injection else None
+                if self.touch_injection and touch is None:
+                    logfire.info("Falling back to the input command", serial=self.serial)
+                self._input = InputChannel(device=device, touch=touch)
+            channel = self._input
+            try:
+                channel.send([command for action in actions for command in action(channel)])
+            except (AdbError, EOFError, OSError):
+                # The channel closed its shell, the next batch opens a new one
+                self._input = None
+                raise
+
+    async def _deliver_input(self) -> None:
+        while True:
+            batch = [await self._input_queue.get()]
+            while len(batch) < self.max_input_batch and not self._input_queue.empty():
+                batch.append(self._input_queue.get_nowait())
+            actions = [action for action, _ in batch]
+            try:
+                # An action that timed out may still have happened, never send it twice
+                await self.run(partial(self._send_input, actions=actions), retries=0)
+            except (AdbError, OSError, TimeoutError) as e:
+                if isinstance(e, TimeoutError):
+                    # The batch may still be writing to the shell, close it once it is done
+                    self.executor.submit(self._close_input)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def send_input(self, command: str | Callable[[InputChannel], list[str]]) -> float:
+        """Queues an input action and waits until the device has run it.
+
+        Actions queued while a batch is on its way are sent together in the next batch.
+
+        Args:
+            command (str | Callable[[InputChannel], list[str]]): A shell command, like one
+                built by `tap_command`, or a function building the commands for a channel.
+
+        Returns:
+            float: Milliseconds from queueing the action until the device confirmed it.
+        """
+        loop = asyncio.get_running_loop()
+        if self._input_task is None or self._input_task.done():
+            self._input_queue = asyncio.Queue()
+            self._input_task = loop.create_task(self._deliver_input())
+        queued_at = time.perf_counter()
+        future = loop.create_future()
+        action = (lambda _channel: [command]) if isinstance(command, str) else command
+        await self._input_queue.put((action, future))
+        await future
+        return (time.perf_counter() - queued_at) * 1000
+
+    async def click(self, x: int, y: int) -> float:
+        return await self.send_input(partial(InputChannel.tap, x=x, y=y))
+
+    async def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> float:
+        return await self.send_input(
+            partial(InputChannel.swipe, x1=x1, y1=y1, x2=x2, y2=y2, duration_ms=duration_ms)
+        )
+
+    async def shell(self, command: str) -> str:
+        return await self.run(lambda device: device.shell(command))
+
+    async def close(self) -> None:
+        if self._keepalive is not None:
+            self._keepalive.cancel()
+            self._keepalive = None
+        if self._input_task is not None:
+            self._input_task.cancel()
+            self._input_task = None
+            self._input_queue = None
+        await asyncio.to_thread(self._close_stream)
+        await asyncio.to_thread(self._close_input)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
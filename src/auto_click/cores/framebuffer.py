@@ -0,0 +1,146 @@
+import struct
+
+import numpy as np
+from adbutils import AdbDevice, AdbConnection
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from adbutils.errors import AdbError
+
+# https://developer.android.com/reference/android/graphics/PixelFormat
+_RGBA_8888 = 1
+_RGBX_8888 = 2
+_BGRA_8888 = 5
+_HEADER = struct.Struct("<III")
+
+
+def _recv_into(conn: AdbConnection, view: memoryview) -> int:
+    """Reads from an ADB connection straight into a buffer until it is full or closed.
+
+    Args:
+        conn (AdbConnection): The open ADB connection.
+        view (memoryview): The writable buffer to fill.
+
+    Returns:
+        int: The number of bytes read.
+    """
+    received = 0
+    while received < len(view):
+        chunk_size = conn.conn.recv_into(view[received:])
+        if chunk_size == 0:
+            break
+        received += chunk_size
+    return received
+
+
+def _wrap_pixels(
+    buffer: bytearray, offset: int, width: int, height: int, pixel_format: int
+) -> np.ndarray:
+    """Wraps the pixel bytes of a raw screencap into an RGBA array without copying.
+
+    Args:
+        buffer (bytearray): The buffer holding the pixel data.
+        offset (int): Where the pixel data starts in the buffer.
+        width (int): The frame width.
+        height (int): The frame height.
+        pixel_format (int): The Android pixel format from the header.
+
+    Returns:
+        np.ndarray: A (height, width, 4) RGBA array.
+
+    Raises:
+        AdbError: If the pixel format is not a 32-bit format.
+    """
+    if pixel_format not in {_RGBA_8888, _RGBX_8888, _BGRA_8888}:
+        raise AdbError(f"Unsupported screencap pixel format: {pixel_format}")
+    pixels = np.frombuffer(buffer, dtype=np.uint8, count=width * height * 4, offset=offset)
+    pixels = pixels.reshape(height, width, 4)
+    if pixel_format == _BGRA_8888:
+        pixels = pixels[..., [2, 1, 0, 3]]
+    return pixels
+
+
+def _read_frame(conn: AdbConnection, header_size: int | None) -> tuple[np.ndarray, int]:
+    """Reads one raw screencap frame from a connection.
+
+    Args:
+        conn (AdbConnection): A connection positioned at the start of a screencap header.
+        header_size (int | None): 12 or 16 bytes, or None to infer it from a one-shot
+            connection that is closed after the frame.
+
+    Returns:
+        tuple[np.ndarray, int]: The RGBA frame and the header size that was used.
+
+    Raises:
+        AdbError: If the device sent a truncated frame.
+    """
+    width, height, pixel_format = _HEADER.unpack(conn.read_exact(_HEADER.size))
+    frame_size = width * height * 4
+    # Android 9+ appends a 4-byte color space to the header
+    extra_size = 4 if header_size is None else header_size - _HEADER.size
+    buffer = bytearray(extra_size + frame_size)
+    received = _recv_into(conn, memoryview(buffer))
+    if header_size is None:
+        extra_size = received - frame_size
+        if extra_size not in {0, 4}:
+            raise AdbError(f"Truncated screencap: got {received} of {frame_size} bytes")
+    elif received < len(buffer):
+        raise AdbError(f"Truncated screencap: got {received} of {len(buffer)} bytes")
+    pixels = _wrap_pixels(buffer, extra_size, width, height, pixel_format)
+    return pixels, _HEADER.size + extra_size
+
+
+def capture_raw(device: AdbDevice) -> np.ndarray:
+    """Captures the screen as raw pixels, skipping PNG encoding on the device.
+
+    Args:
+        device (AdbDevice): The device to capture.
+
+    Returns:
+        np.ndarray: A (height, width, 4) RGBA array backed by the received bytes.
+    """
+    with device.shell("screencap", stream=True) as conn:
+        pixels, _ = _read_frame(conn, header_size=None)
+    return pixels
+
+
+class FramebufferStream(BaseModel):
+    """Captures raw frames through one shell session kept open between frames.
+
+    Attributes:
+        device (AdbDevice): The device to capture.
+
+    Methods:
+        capture: Captures one frame.
+        close: Closes the shell session.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    device: AdbDevice = Field(..., description="The device to capture")
+    _conn: AdbConnection | None = PrivateAttr(default=None)
+    _header_size: int | None = PrivateAttr(default=None)
+
+    def capture(self) -> np.ndarray:
+        """Captures one frame, opening the shell session on first use.
+
+        Returns:
+            np.ndarray: A (height, width, 4) RGBA array backed by the received bytes.
+        """
+        if self._header_size is None:
+            # A one-shot capture tells us how large the header of this Android version is
+            with self.device.shell("screencap", stream=True) as conn:
+                pixels, self._header_size = _read_frame(conn, header_size=None)
+            return pixels
+        if self._conn is None:
+            self._conn = self.device.shell("sh", stream=True)
+        try:
+            self._conn.send(b"screencap\n")
+            pixels, _ = _read_frame(self._conn, header_size=self._header_size)
+        except (AdbError, EOFError, OSError):
+            self.close()
+            raise
+        return pixels
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,241 @@
+import re
+import itertools
+
+import logfire
+from adbutils import AdbDevice, AdbConnection
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from adbutils.errors import AdbError
+
+_DONE = "__auto_click_input_done__"
+
+_DEVICE = re.compile(r"^add device \d+: (\S+)")
+_AXIS = re.compile(r"([0-9a-f]{4})\s*: value -?\d+, min (-?\d+), max (-?\d+)")
+_SIZE = re.compile(r"(Physical|Override) size: (\d+)x(\d+)")
+_ROTATION = (
+    ("dumpsys input", re.compile(r"SurfaceOrientation: (\d)")),
+    ("dumpsys window displays", re.compile(r"mCurrentRotation=(?:ROTATION_)?(\d+)")),
+)
+
+# Linux input event codes, see linux/input-event-codes.h
+_EV_SYN, _EV_KEY, _EV_ABS = 0, 1, 3
+_BTN_TOUCH = 330
+_ABS_MT_POSITION_X, _ABS_MT_POSITION_Y = 0x35, 0x36
+_ABS_MT_PRESSURE, _ABS_MT_TRACKING_ID = 0x3A, 0x39
+
+# A swipe moves the contact once per display frame
+_SWIPE_STEP_MS = 16
+
+
+def tap_command(x: int, y: int) -> str:
+    return f"input tap {int(x)} {int(y)}"
+
+
+def swipe_command(x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> str:
+    return f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {int(duration_ms)}"
+
+
+def _parse_touch_axes(getevent: str) -> tuple[str, dict[int, tuple[int, int]]] | None:
+    """Finds the first input device in `getevent -p` output that reports touch positions."""
+    path, axes = None, {}
+    for line in [*getevent.splitlines(), "add device 0: end"]:
+        if device := _DEVICE.match(line.strip()):
+            if path is not None and {_ABS_MT_POSITION_X, _ABS_MT_POSITION_Y} <= axes.keys():
+                return path, axes
+            path, axes = device.group(1), {}
+        elif axis := _AXIS.search(line):
+            axes[int(axis.group(1), 16)] = (int(axis.group(2)), int(axis.group(3)))
+    return None
+
+
+class TouchScreen(BaseModel):
+    """A touchscreen that taps and swipes are written to directly with `sendevent`.
+
+    `input tap` starts a new app_process, a Java VM, on every call, which takes far longer
+    than the tap itself. `sendevent` is a small native binary, so writing the touch events
+    with it skips the VM start. Screen coordinates are rotated into the panel's natural
+    orientation and scaled to its axis range, both read once when the screen is probed.
+
+    Attributes:
+        path (str): The input device node, like `/dev/input/event2`.
+        axes (dict[int, tuple[int, int]]): The minimum and maximum of every absolute axis.
+        width (int): The display width in its natural orientation.
+        height (int): The display height in its natural orientation.
+        rotation (int): Quarter turns the display is rotated from its natural orientation.
+
+    Methods:
+        probe: Finds the touchscreen of a device, if taps can be written to it.
+        tap: Returns the commands that tap a point.
+        swipe: Returns the commands that swipe between two points.
+    """
+
+    path: str = Field(..., description="The input device node")
+    axes: dict[int, tuple[int, int]] = Field(..., description="The range of every absolute axis")
+    width: int = Field(..., description="The display width in its natural orientation")
+    height: int = Field(..., description="The display height in its natural orientation")
+    rotation: int = Field(default=0, ge=0, le=3, description="Quarter turns of the display")
+    _tracking_ids: itertools.count = PrivateAttr(default_factory=lambda: itertools.count(1))
+
+    @classmethod
+    def probe(cls, device: AdbDevice) -> "TouchScreen | None":
+        """Finds the touchscreen, its display size and rotation, using one-shot shells.
+
+        Args:
+            device (AdbDevice): The device to probe.
+
+        Returns:
+            TouchScreen | None: The touchscreen, or None if any of it is unknown or the
+                shell user may not write to the device node.
+        """
+        try:
+            found = _parse_touch_axes(device.shell("getevent -p"))
+            sizes = {
+                kind: (int(w), int(h)) for kind, w, h in _SIZE.findall(device.shell("wm size"))
+            }
+            rotation = None
+            for command, pattern in _ROTATION:
+                if match := pattern.search(device.shell(command)):
+                    rotation = int(match.group(1))
+                    break
+            if found is None or not sizes or rotation is None:
+                return None
+            path, axes = found
+            if device.shell(f"test -w {path} && echo writable").strip() != "writable":
+                return None
+        except (AdbError, OSError) as e:
+            logfire.warn("Probing the touchscreen failed", serial=device.serial, error=repr(e))
+            return None
+        width, height = sizes.get("Override", sizes.get("Physical"))
+        # Some builds report degrees instead of quarter turns
+        rotation = rotation // 90 if rotation >= 90 else rotation
+        return cls(path=path, axes=axes, width=width, height=height, rotation=rotation)
+
+    def _to_panel(self, x: int, y: int) -> tuple[int, int]:
+        # The inverse of the rotation the input reader applies to raw touches
+        natural = {
+            0: (x, y),
+            1: (self.width - y, x),
+            2: (self.width - x, self.height - y),
+            3: (y, self.height - x),
+        }[self.rotation]
+        panel = []
+        for value, size, axis in zip(
+            natural,
+            (self.width, self.height),
+            (_ABS_MT_POSITION_X, _ABS_MT_POSITION_Y),
+            strict=True,
+        ):
+            low, high = self.axes[axis]
+            scaled = low + round(value * (high - low + 1) / size)
+            panel.append(min(max(scaled, low), high))
+        return panel[0], panel[1]
+
+    def _event(self, kind: int, code: int, value: int) -> str:
+        return f"sendevent {self.path} {kind} {code} {value}"
+
+    def _move(self, x: int, y: int) -> list[str]:
+        panel_x, panel_y = self._to_panel(x, y)
+        return [
+            self._event(_EV_ABS, _ABS_MT_POSITION_X, panel_x),
+            self._event(_EV_ABS, _ABS_MT_POSITION_Y, panel_y),
+            self._event(_EV_SYN, 0, 0),
+        ]
+
+    def _down(self, x: int, y: int) -> list[str]:
+        commands = [self._event(_EV_ABS, _ABS_MT_TRACKING_ID, next(self._tracking_ids))]
+        if _ABS_MT_PRESSURE in self.axes:
+            low, high = self.axes[_ABS_MT_PRESSURE]
+            commands.append(self._event(_EV_ABS, _ABS_MT_PRESSURE, max((low + high) // 2, 1)))
+        commands.append(self._event(_EV_KEY, _BTN_TOUCH, 1))
+        return commands + self._move(x, y)
+
+    def _up(self) -> list[str]:
+        return [
+            self._event(_EV_ABS, _ABS_MT_TRACKING_ID, -1),
+            self._event(_EV_KEY, _BTN_TOUCH, 0),
+            self._event(_EV_SYN, 0, 0),
+        ]
+
+    def tap(self, x: int, y: int) -> list[str]:
+        return self._down(int(x), int(y)) + self._up()
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> list[str]:
+        steps = max(int(duration_ms) // _SWIPE_STEP_MS, 1)
+        commands = self._down(int(x1), int(y1))
+        for step in range(1, steps + 1):
+            commands.append(f"sleep {_SWIPE_STEP_MS / 1000}")
+            commands += self._move(
+                round(x1 + (x2 - x1) * step / steps), round(y1 + (y2 - y1) * step / steps)
+            )
+        return commands + self._up()
+
+
+class InputChannel(BaseModel):
+    """Sends input commands through one shell session kept open between actions.
+
+    Spawning `adb shell input tap` costs a new ADB connection and a new shell for every tap,
+    and the `input` command itself starts a Java VM on the device each time. The channel
+    writes batches of commands to a single interactive shell, followed by an `echo` that
+    tells when the device has run all of them. With a `touch` screen the taps and swipes
+    are written as `sendevent` commands, which skip the VM; without one they fall back to
+    `input`, which only saves the connection and the shell.
+
+    Attributes:
+        device (AdbDevice): The device to send input to.
+        touch (TouchScreen | None): The touchscreen taps are written to, `input` when None.
+
+    Methods:
+        tap: Returns the commands that tap a point.
+        swipe: Returns the commands that swipe between two points.
+        send: Runs a batch of input commands and waits until the device has run them.
+        close: Closes the shell session.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    device: AdbDevice = Field(..., description="The device to send input to")
+    touch: TouchScreen | None = Field(default=None, description="The touchscreen to write to")
+    _conn: AdbConnection | None = PrivateAttr(default=None)
+
+    def tap(self, x: int, y: int) -> list[str]:
+        if self.touch is None:
+            return [tap_command(x, y)]
+        return self.touch.tap(x, y)
+
+    def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> list[str]:
+        if self.touch is None:
+            return [swipe_command(x1, y1, x2, y2, duration_ms)]
+        return self.touch.swipe(x1, y1, x2, y2, duration_ms)
+
+    def _read_until_done(self) -> None:
+        received = b""
+        marker = _DONE.encode()
+        while marker not in received:
+            chunk = self._conn.conn.recv(4096)
+            if not chunk:
+                raise AdbError("The input shell session was closed")
+            # Only the tail can hold a marker split across two reads
+            received = received[-len(marker) :] + chunk
+
+    def send(self, commands: list[str]) -> None:
+        """Runs input commands in order, opening the shell session on first use.
+
+        Args:
+            commands (list[str]): Commands built by `tap`, `swipe` or `tap_command`.
+
+        Raises:
+            AdbError: If the session was closed before the device confirmed the batch.
+        """
+        if self._conn is None:
+            self._conn = self.device.shell("sh", stream=True)
+        line = ";".join([*commands, f"echo {_DONE}"]) + "\n"
+        try:
+            self._conn.send(line.encode("utf-8"))
+            self._read_until_done()
+        except (AdbError, EOFError, OSError):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
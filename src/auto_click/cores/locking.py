@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Holds an exclusive lock on `<path>.lock` while the block runs.
+
+    The lock lives in its own file, so it survives the locked file being replaced, and each
+    call opens it anew, so it excludes other threads of the same process as well as other
+    processes.
+
+    Args:
+        path (str): The file to guard.
+    """
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open("a+b") as lock_file:
+        if os.name == "nt":
+            lock_file.seek(0)
+            # Retries once a second and raises OSError after ten seconds
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -1,5 +1,10 @@
-from adbutils import adb
-from pydantic import Field, BaseModel, model_validator
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logfire
+from adbutils import AdbDevice, adb
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr, model_validator
 from adbutils.errors import AdbError
 
 from auto_click.cores.config import DeviceModel
@@ -10,32 +15,120 @@ class AppInfo(BaseModel):
     package: str = Field(..., description="The package name of the app.")
 
 
+class ForegroundIndex(BaseModel):
+    """A time-limited serial to foreground package index shared by every device manager.
+
+    Attributes:
+        ttl (float): Seconds before a device's foreground package is queried again.
+        max_workers (int): How many devices are queried concurrently.
+
+    Methods:
+        refresh: Queries devices whose entry is missing or expired.
+        serials_for: Returns the serials running a package.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    ttl: float = Field(default=10.0, description="Seconds an entry stays valid")
+    max_workers: int = Field(default=16, description="Devices queried concurrently")
+    _packages: dict[str, tuple[str, float]] = PrivateAttr(default_factory=dict)
+    _serials: dict[str, set[str]] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @staticmethod
+    def _query_package(device: AdbDevice) -> str | None:
+        try:
+            return device.app_current().package
+        except AdbError:
+            logfire.warn("Failed to query the foreground app", serial=device.serial)
+            return None
+
+    def _store(self, serial: str, package: str | None, checked_at: float) -> None:
+        previous = self._packages.pop(serial, None)
+        if previous is not None:
+            self._serials.get(previous[0], set()).discard(serial)
+        if package is not None:
+            self._packages[serial] = (package, checked_at)
+            self._serials.setdefault(package, set()).add(serial)
+
+    def refresh(self, devices: list[AdbDevice], force: bool = False) -> None:
+        """Updates the index for the given devices, querying them concurrently.
+
+        Only devices without a valid entry are queried, and devices no longer connected are
+        forgotten.
+
+        Args:
+            devices (list[AdbDevice]): The currently connected devices.
+            force (bool): Query every device even if its entry has not expired.
+        """
+        now = time.monotonic()
+        connected = {device.serial for device in devices}
+        with self._lock:
+            for serial in set(self._packages) - connected:
+                self._store(serial, None, now)
+            stale = [
+                device
+                for device in devices
+                if force
+                or device.serial not in self._packages
+                or now - self._packages[device.serial][1] > self.ttl
+            ]
+        if not stale:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(stale))) as executor:
+            packages = list(executor.map(self._query_package, stale))
+        with self._lock:
+            for device, package in zip(stale, packages, strict=True):
+                self._store(device.serial, package, now)
+
+    def serials_for(self, package: str) -> list[str]:
+        with self._lock:
+            return sorted(self._serials.get(package, set()))
+
+    def running_apps(self) -> list[AppInfo]:
+        with self._lock:
+            return [
+                AppInfo(serial=serial, package=package)
+                for serial, (package, _) in self._packages.items()
+            ]
+
+
+foreground_index = ForegroundIndex()
+
+
 class ADBDeviceManager(DeviceModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     running_apps: list[AppInfo] = Field(
         default=[], description="The list of running apps on the connected devices."
     )
+    foreground_index: ForegroundIndex = Field(
+        default_factory=lambda: foreground_index,
+        description="The foreground package index, shared by every manager in the process.",
+    )
 
     @model_validator(mode="after")
     def _setup_device(self) -> "ADBDeviceManager":
         adb.connect(addr=f"{self.host}:{self.serial}", timeout=3.0)
 
-        serial_list = []
+        devices = []
         for device in adb.device_list():
             if not device.serial.startswith("emulator"):
-                serial_list.append(device.serial)
+                devices.append(device)
 
-        for serial in serial_list:
-            device = adb.device(serial=serial)
-            running_app = device.app_current()
-            running_details = AppInfo(serial=serial, package=running_app.package)
-            self.running_apps.append(running_details)
+        self.foreground_index.refresh(devices)
+        self.running_apps = self.foreground_index.running_apps()
         return self
 
     def get_correct_serial(self) -> AppInfo:
-        apps = [app for app in self.running_apps if app.package == self.target]
-        if len(apps) == 1:
-            return apps[0]
-        if len(apps) == 0:
+        serials = self.foreground_index.serials_for(self.target)
+        # Several devices may run the same game; prefer the one this config points at
+        configured_serial = f"{self.host}:{self.serial}"
+        if configured_serial in serials:
+            return AppInfo(serial=configured_serial, package=self.target)
+        if len(serials) == 1:
+            return AppInfo(serial=serials[0], package=self.target)
+        if len(serials) == 0:
             raise AdbError("No devices running the target app were found.")
         raise AdbError("Multiple devices running the target app were found.")
 
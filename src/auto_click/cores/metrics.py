@@ -0,0 +1,212 @@
+import time
+import asyncio
+from pathlib import Path
+import threading
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+import orjson
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+# Upper bounds in milliseconds, the last bucket catches everything slower
+_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+
+class LatencyHistogram(BaseModel):
+    """Counts observed latencies into fixed millisecond buckets.
+
+    Attributes:
+        counts (list[int]): Observations per bucket of `_BUCKETS_MS`.
+        total_ms (float): The sum of every observation.
+        max_ms (float): The slowest observation.
+    """
+
+    counts: list[int] = Field(default_factory=lambda: [0] * len(_BUCKETS_MS))
+    total_ms: float = Field(default=0.0)
+    max_ms: float = Field(default=0.0)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, elapsed_ms: float) -> None:
+        for index, bound in enumerate(_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.counts[index] += 1
+                break
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls into."""
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(_BUCKETS_MS, self.counts, strict=True):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> dict[str, float | int | dict[str, int]]:
+        count = self.count
+        return {
+            "count": count,
+            "mean_ms": round(self.total_ms / count, 3) if count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max_ms, 3),
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(_BUCKETS_MS, self.counts, strict=True)
+                if count
+            },
+        }
+
+
+class TickMetrics(BaseModel):
+    """In-process latency histograms and counters for every stage of a controller tick.
+
+    Histograms are keyed by device, stage and template (empty for stages that are not
+    about a single template), counters by device, name and template. The collected data
+    can be dumped to a JSON file periodically or scraped over HTTP, without any external
+    service.
+
+    Attributes:
+        started_at (float): When collection started, as a UNIX timestamp.
+
+    Methods:
+        measure: Times a block of code as a stage.
+        observe: Records one stage latency.
+        increment: Increases a counter.
+        snapshot: Returns every histogram and counter as plain data.
+        to_prometheus: Renders the data in the Prometheus text format.
+        dump: Writes a JSON snapshot to a file.
+        dump_periodically: Keeps dumping snapshots at an interval.
+        serve: Serves snapshots over HTTP.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    started_at: float = Field(default_factory=time.time)
+    _histograms: dict[tuple[str, str, str], LatencyHistogram] = PrivateAttr(default_factory=dict)
+    _counters: dict[tuple[str, str, str], int] = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def observe(self, device: str, stage: str, elapsed_ms: float, template: str = "") -> None:
+        with self._lock:
+            histogram = self._histograms.setdefault((device, stage, template), LatencyHistogram())
+            histogram.observe(elapsed_ms)
+
+    def increment(self, device: str, name: str, amount: int = 1, template: str = "") -> None:
+        key = (device, name, template)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def measure(self, device: str, stage: str, template: str = "") -> Iterator[None]:
+        """Times the enclosed block, awaits included, and records it under `stage`.
+
+        Args:
+            device (str): The device the tick belongs to.
+            stage (str): The stage name, e.g. `capture` or `match`.
+            template (str): The template the stage is about, if any.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(device, stage, (time.perf_counter() - started) * 1000, template)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            histograms = [
+                {"device": device, "stage": stage, "template": template, **histogram.summary()}
+                for (device, stage, template), histogram in sorted(self._histograms.items())
+            ]
+            counters = [
+                {"device": device, "name": name, "template": template, "value": value}
+                for (device, name, template), value in sorted(self._counters.items())
+            ]
+        return {
+            "started_at": self.started_at,
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "stages": histograms,
+            "counters": counters,
+        }
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# TYPE auto_click_stage_milliseconds histogram",
+            "# TYPE auto_click_events_total counter",
+        ]
+        with self._lock:
+            for (device, stage, template), histogram in sorted(self._histograms.items()):
+                labels = f'device="{device}",stage="{stage}",template="{template}"'
+                cumulative = 0
+                for bound, count in zip(_BUCKETS_MS, histogram.counts, strict=True):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else str(bound)
+                    lines.append(
+                        f'auto_click_stage_milliseconds_bucket{{{labels},le="{le}"}} {cumulative}'
+                    )
+                lines.append(f"auto_click_stage_milliseconds_sum{{{labels}}} {histogram.total_ms}")
+                lines.append(f"auto_click_stage_milliseconds_count{{{labels}}} {cumulative}")
+            for (device, name, template), value in sorted(self._counters.items()):
+                labels = f'device="{device}",name="{name}",template="{template}"'
+                lines.append(f"auto_click_events_total{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Writes a JSON snapshot, replacing the previous one atomically."""
+        dump_path = Path(path)
+        dump_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = dump_path.with_name(f"{dump_path.name}.tmp")
+        temp_path.write_bytes(orjson.dumps(self.snapshot(), option=orjson.OPT_INDENT_2))
+        temp_path.replace(dump_path)
+
+    async def dump_periodically(self, path: str, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.dump, path)
+
+    async def _handle_scrape(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            target = parts[1] if len(parts) > 1 else "/"
+            if target.startswith("/metrics"):
+                body = self.to_prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            else:
+                body = orjson.dumps(self.snapshot())
+                content_type = "application/json"
+            writer.write(
+                f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9464) -> asyncio.Server:
+        """Serves Prometheus text on `/metrics` and the JSON snapshot on every other path.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 picks a free one.
+
+        Returns:
+            asyncio.Server: The started server.
+        """
+        server = await asyncio.start_server(self._handle_scrape, host=host, port=port)
+        logfire.info("Serving tick metrics", host=host, port=server.sockets[0].getsockname()[1])
+        return server
+
+
+metrics = TickMetrics()
@@ -1,13 +1,16 @@
 import io
+import time
+import asyncio
 from pathlib import Path
 import datetime
+import contextlib
 
 from PIL import Image
 import httpx
 import dotenv
 import orjson
 import logfire
-from pydantic import Field, ConfigDict, AliasChoices
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr, AliasChoices
 from pydantic_settings import BaseSettings
 
 dotenv.load_dotenv()
@@ -60,7 +63,8 @@ class DiscordNotify(BaseSettings):
         deprecated=False,
     )
 
-    async def _send_notify(self) -> None:
+    def build_request(self) -> dict[str, object]:
+        """Builds the keyword arguments of the webhook POST, encoding the image if any."""
         timestamp = datetime.datetime.now().isoformat()  # ISO 8601 格式
 
         embed = {
@@ -100,36 +104,166 @@ class DiscordNotify(BaseSettings):
             embed["image"] = {"url": "attachment://image.jpg"}
 
         payload = {"avatar_url": self.avatar_url, "content": self.content, "embeds": [embed]}
-
-        # 發送請求到 Discord Webhook
-        async with httpx.AsyncClient() as client:
-            if files:
-                response = await client.post(
-                    url=self.discord_webhook_url,
-                    data={"payload_json": orjson.dumps(payload).decode("utf-8")},
-                    files=files,
-                )
-            else:
-                response = await client.post(url=self.discord_webhook_url, json=payload)
-            response.raise_for_status()  # 確保請求成功
+        if files:
+            return {
+                "url": self.discord_webhook_url,
+                "data": {"payload_json": orjson.dumps(payload).decode("utf-8")},
+                "files": files,
+            }
+        return {"url": self.discord_webhook_url, "json": payload}
 
     async def send_notify(self) -> None:
+        """Queues the notification on the process-wide dispatcher and returns immediately."""
         if not self.discord_webhook_url:
             logfire.warn("Discord Webhook Url is not set, skipping.")
             return
+        dispatcher.submit(self)
+
+
+class NotificationDispatcher(BaseModel):
+    """Delivers notifications in the background so sending never stalls the tick loop.
+
+    One dispatcher serves the whole process. It keeps a pooled HTTP client, drops a
+    notification whose title was already sent or queued within `coalesce_window`, retries
+    after the delay Discord asks for on HTTP 429 and backs off exponentially on server and
+    network errors.
+
+    Attributes:
+        max_queue (int): Notifications waiting beyond this are dropped.
+        coalesce_window (float): Seconds during which a repeated title is dropped.
+        max_retries (int): Retries per notification after the first attempt.
+        backoff (float): Seconds before the first retry, doubled on every further retry.
+        timeout (float): Seconds before a webhook request times out.
+        close_timeout (float): Seconds `close` waits for queued notifications.
+
+    Methods:
+        submit: Queues a notification without waiting for it to be sent.
+        close: Sends what is queued, then stops the worker and closes the client.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    max_queue: int = Field(default=64, description="The capacity of the notification queue")
+    coalesce_window: float = Field(
+        default=60.0, description="Seconds during which a repeated title is dropped"
+    )
+    max_retries: int = Field(default=3, description="Retries after the first attempt")
+    backoff: float = Field(default=1.0, description="Seconds before the first retry")
+    timeout: float = Field(default=10.0, description="Seconds before a request times out")
+    close_timeout: float = Field(
+        default=10.0, description="Seconds to wait for queued notifications on close"
+    )
+    _queue: asyncio.Queue["DiscordNotify"] | None = PrivateAttr(default=None)
+    _client: httpx.AsyncClient | None = PrivateAttr(default=None)
+    _worker: asyncio.Task[None] | None = PrivateAttr(default=None)
+    _loop: asyncio.AbstractEventLoop | None = PrivateAttr(default=None)
+    _last_seen: dict[str, float] = PrivateAttr(default_factory=dict)
+    _coalesced: int = PrivateAttr(default=0)
+
+    def _ensure_worker(self) -> asyncio.Queue["DiscordNotify"]:
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop:
+            # Queues, clients and tasks are bound to the loop that created them
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._client = None
+            self._loop = loop
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._deliver_forever())
+        return self._queue
+
+    def submit(self, notify: "DiscordNotify") -> bool:
+        """Queues a notification unless its title was seen recently or the queue is full.
+
+        Args:
+            notify (DiscordNotify): The notification to send.
+
+        Returns:
+            bool: Whether the notification was queued.
+        """
+        now = time.monotonic()
+        last_seen = self._last_seen.get(notify.title)
+        if last_seen is not None and now - last_seen < self.coalesce_window:
+            self._coalesced += 1
+            return False
+        queue = self._ensure_worker()
         try:
-            await self._send_notify()
-        except Exception:
-            logfire.error("Failed to send Discord notification.")
+            queue.put_nowait(notify)
+        except asyncio.QueueFull:
+            logfire.warn("Notification queue is full, dropping", title=notify.title)
+            return False
+        self._last_seen[notify.title] = now
+        return True
 
+    def _retry_delay(self, response: httpx.Response | None, attempt: int) -> float | None:
+        """Seconds to wait before retrying, or None if the request should not be retried."""
+        if response is None or response.status_code >= 500:
+            return self.backoff * 2**attempt
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            with contextlib.suppress(orjson.JSONDecodeError, AttributeError):
+                retry_after = orjson.loads(response.content).get("retry_after", retry_after)
+            return float(retry_after) if retry_after is not None else self.backoff * 2**attempt
+        return None
 
-if __name__ == "__main__":
-    import asyncio
+    async def _deliver(self, notify: "DiscordNotify") -> None:
+        request = await asyncio.to_thread(notify.build_request)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = await self._client.post(**request)
+                response.raise_for_status()
+                return
+            except (httpx.HTTPStatusError, httpx.TransportError):
+                delay = self._retry_delay(response, attempt)
+                if delay is None or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _deliver_forever(self) -> None:
+        if self._client is None:
+            # Loading the TLS certificates takes a while, keep it off the loop and out of submit
+            self._client = await asyncio.to_thread(httpx.AsyncClient, timeout=self.timeout)
+        while True:
+            notify = await self._queue.get()
+            try:
+                await self._deliver(notify)
+            except Exception:
+                logfire.error("Failed to send Discord notification.", title=notify.title)
+            finally:
+                self._queue.task_done()
+
+    async def close(self) -> None:
+        """Waits up to `close_timeout` seconds for queued notifications, then shuts down."""
+        if self._queue is not None and self._loop is asyncio.get_running_loop():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=self.close_timeout)
+            except TimeoutError:
+                logfire.warn("Dropping unsent notifications", count=self._queue.qsize())
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._coalesced:
+            logfire.info("Coalesced duplicate notifications", count=self._coalesced)
+        self._queue = None
+        self._loop = None
 
+
+dispatcher = NotificationDispatcher()
+
+
+if __name__ == "__main__":
     notify = DiscordNotify(
         title="老大, 我已經幫您打完王朝了",
         description="王朝已完成，將繼續為您採棉花。",
         target_image="./data/allstars/back.png",
     )
 
-    asyncio.run(notify.send_notify())
+    async def _main() -> None:
+        await notify.send_notify()
+        await dispatcher.close()
+
+    asyncio.run(_main())
@@ -0,0 +1,285 @@
+import os
+from typing import TypeVar
+import asyncio
+from collections import deque
+from collections.abc import Callable
+import multiprocessing
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+from numpy.lib.array_utils import byte_bounds
+
+from .bundle import TemplateBundle
+
+T = TypeVar("T")
+
+# (kind, name, offset, shape, strides, dtype) of an array another process can map itself
+ArrayDescriptor = tuple[str, str, int, tuple[int, ...], tuple[int, ...], str]
+
+
+class MatchPool(BaseModel):
+    """A bounded worker pool for template matching shared by several devices.
+
+    Jobs are queued per owner and dispatched round-robin, so a device that submits many
+    templates at once cannot starve the other devices on the same event loop.
+
+    Attributes:
+        max_workers (int): The number of matching threads, defaults to the CPU count.
+
+    Methods:
+        run: Runs a function in the pool on behalf of an owner.
+        share: Makes the arrays of a frame available to the workers.
+        release: Frees what `share` allocated.
+        share_bundle: Makes the templates of a bundle available to the workers.
+        shutdown: Stops the worker threads.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    max_workers: int = Field(
+        default_factory=lambda: os.cpu_count() or 1, description="The number of worker threads"
+    )
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _pending: dict[str, deque[asyncio.Future[None]]] = PrivateAttr(default_factory=dict)
+    _order: deque[str] = PrivateAttr(default_factory=deque)
+    _active: int = PrivateAttr(default=0)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="match"
+            )
+        return self._executor
+
+    def _dispatch(self) -> None:
+        """Hands free worker slots to waiting owners in round-robin order."""
+        while self._active < self.max_workers and self._order:
+            owner = self._order.popleft()
+            waiters = self._pending[owner]
+            waiter = waiters.popleft()
+            if waiters:
+                self._order.append(owner)
+            else:
+                del self._pending[owner]
+            if waiter.cancelled():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    async def run(self, owner: str, func: Callable[..., T], *args: object) -> T:
+        """Runs `func(*args)` in a worker thread once the owner's turn comes up.
+
+        Args:
+            owner (str): The device or controller the job belongs to.
+            func (Callable[..., T]): The CPU-bound function to run.
+            *args (object): Positional arguments for `func`.
+
+        Returns:
+            T: The return value of `func`.
+        """
+        loop = asyncio.get_running_loop()
+        turn: asyncio.Future[None] = loop.create_future()
+        if owner not in self._pending:
+            self._pending[owner] = deque()
+            self._order.append(owner)
+        self._pending[owner].append(turn)
+        self._dispatch()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            if turn.done() and not turn.cancelled():
+                self._release()
+            raise
+        try:
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self._release()
+
+    def share(self, arrays: list[np.ndarray]) -> None:
+        """Threads already see every array of the process, so there is nothing to do."""
+
+    def release(self, arrays: list[np.ndarray]) -> None:
+        """Threads already see every array of the process, so there is nothing to do."""
+
+    def share_bundle(self, bundle: TemplateBundle, replaces: TemplateBundle | None = None) -> None:
+        """Threads already see every array of the process, so there is nothing to do."""
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_worker_bundles: dict[str, np.memmap] = {}
+
+
+def _init_worker(bundle_paths: list[str]) -> None:
+    # Every process matches one template at a time, OpenCV threads would only compete
+    cv2.setNumThreads(1)
+    for path in bundle_paths:
+        _worker_bundles[path] = np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _call_in_worker(func: Callable[..., T], *args: object) -> T:
+    """Rebuilds the described arrays from shared memory and bundle files, then calls `func`."""
+    blocks: list[SharedMemory] = []
+    resolved: list[object] = []
+    for arg in args:
+        if not isinstance(arg, tuple) or not arg or arg[0] not in {"shm", "file"}:
+            resolved.append(arg)
+            continue
+        kind, name, offset, shape, strides, dtype = arg
+        if kind == "shm":
+            block = SharedMemory(name=name)
+            blocks.append(block)
+            buffer = block.buf
+        else:
+            if name not in _worker_bundles:
+                _worker_bundles[name] = np.memmap(name, dtype=np.uint8, mode="r")
+            buffer = _worker_bundles[name]
+        resolved.append(
+            np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset, strides=strides)
+        )
+    try:
+        return func(*resolved)
+    finally:
+        # The views must be gone before the blocks can be closed
+        del resolved
+        for block in blocks:
+            block.close()
+
+
+class ProcessMatchPool(MatchPool):
+    """A match pool whose workers are processes, for hosts matching on many devices at once.
+
+    Matching in threads shares one interpreter with validation, logging and image decoding.
+    Worker processes escape that, and the arrays they match are never pickled: frames are
+    copied once into a shared memory block per tick and templates are read from the
+    memory-mapped bundles, so a job only carries small descriptors of where its arrays are.
+    Arrays the pool does not know about are pickled as usual.
+
+    Attributes:
+        max_workers (int): The number of worker processes, defaults to the CPU count.
+    """
+
+    # (low, high, kind, name, base, owner); holding the owner keeps the address range
+    # from being freed and reused by another array while the region is registered
+    _regions: list[tuple[int, int, str, str, int, np.ndarray]] = PrivateAttr(default_factory=list)
+    _blocks: dict[int, SharedMemory] = PrivateAttr(default_factory=dict)
+    _bundles: dict[str, TemplateBundle] = PrivateAttr(default_factory=dict)
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # Forking a process that runs threads and OpenCV can deadlock the children
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(list(self._bundles),),
+            )
+        return self._executor
+
+    def share(self, arrays: list[np.ndarray]) -> None:
+        """Copies arrays into shared memory, so slices of them reach the workers by name.
+
+        Args:
+            arrays (list[np.ndarray]): The frame's grayscale image and reduced levels.
+        """
+        for array in arrays:
+            if id(array) in self._blocks or not array.flags.c_contiguous:
+                continue
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+            shared[...] = array
+            del shared
+            self._blocks[id(array)] = block
+            low, high = byte_bounds(array)
+            self._regions.append((low, high, "shm", block.name, low, array))
+
+    def release(self, arrays: list[np.ndarray]) -> None:
+        for array in arrays:
+            block = self._blocks.pop(id(array), None)
+            if block is None:
+                continue
+            self._regions = [region for region in self._regions if region[3] != block.name]
+            block.close()
+            block.unlink()
+
+    def share_bundle(self, bundle: TemplateBundle, replaces: TemplateBundle | None = None) -> None:
+        """Lets the workers map templates of a bundle instead of receiving their pixels.
+
+        A bundle loaded again from a known path takes over the path's region, so arrays of
+        the earlier mapping are pickled from then on. When it was also recompiled, it replaces
+        the file the workers have mapped, so the workers are replaced too.
+
+        Args:
+            bundle (TemplateBundle): The bundle to share.
+            replaces (TemplateBundle | None): An earlier bundle at another path whose region
+                is dropped.
+        """
+        if replaces is not None and replaces.path != bundle.path:
+            self._bundles.pop(replaces.path, None)
+            self._regions = [region for region in self._regions if region[3] != replaces.path]
+        shared = self._bundles.get(bundle.path)
+        if bundle.data is None or shared is bundle:
+            return
+        if shared is not None:
+            self._regions = [region for region in self._regions if region[3] != bundle.path]
+            if shared.entries != bundle.entries and self._executor is not None:
+                # Running jobs finish on the old workers, new jobs start new ones
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        self._bundles[bundle.path] = bundle
+        low, high = byte_bounds(bundle.data)
+        self._regions.append((
+            low,
+            high,
+            "file",
+            bundle.path,
+            low - bundle.data.offset,
+            bundle.data,
+        ))
+
+    def _describe(self, arg: object) -> object:
+        if not isinstance(arg, np.ndarray):
+            return arg
+        low, high = byte_bounds(arg)
+        for start, end, kind, name, base, _ in self._regions:
+            if start <= low and high <= end:
+                return (kind, name, low - base, arg.shape, arg.strides, arg.dtype.str)
+        return arg
+
+    async def run(self, owner: str, func: Callable[..., T], *args: object) -> T:
+        """Runs `func(*args)` in a worker process once the owner's turn comes up.
+
+        Args:
+            owner (str): The device or controller the job belongs to.
+            func (Callable[..., T]): A module-level CPU-bound function.
+            *args (object): Positional arguments for `func`; shared arrays and slices of
+                them are passed as descriptors.
+
+        Returns:
+            T: The return value of `func`.
+        """
+        described = [self._describe(arg) for arg in args]
+        return await super().run(owner, _call_in_worker, func, *described)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            # Wait for the workers to exit rather than leaving them to finish starting up
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks.clear()
+        self._regions = [region for region in self._regions if region[2] == "file"]
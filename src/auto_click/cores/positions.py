@@ -0,0 +1,174 @@
+import io
+import os
+import csv
+from pathlib import Path
+import threading
+
+import logfire
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr
+
+from .config import ImageModel
+from .locking import file_lock
+
+_COLUMNS = ("image_name", "image_path", "x", "y")
+
+
+def _read_positions(path: Path) -> dict[tuple[str, str], tuple[int, int]] | None:
+    """Reads a position CSV where later rows override earlier rows of the same image."""
+    with path.open(encoding="utf-8", newline="") as csv_file:
+        reader = csv.DictReader(csv_file)
+        if not set(_COLUMNS).issubset(reader.fieldnames or ()):
+            return None
+        positions = {}
+        for row in reader:
+            # A partially written last line has no usable coordinates
+            if not row["x"] or not row["y"]:
+                continue
+            try:
+                positions[row["image_name"], row["image_path"]] = (
+                    int(float(row["x"])),
+                    int(float(row["y"])),
+                )
+            except ValueError:
+                continue
+        return positions
+
+
+def _format_rows(rows: list[tuple[str, str, int, int]], header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(_COLUMNS)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+class PositionIndex(BaseModel):
+    """In-memory index of the last known button centers, keyed by image name and path.
+
+    Changed positions are appended to a CSV log by a background thread, so recording a
+    hit never waits for disk I/O. Flushes append complete lines and `close` compacts the log
+    down to one row per image, both under a lock file shared by every index and process
+    writing to the same log, so no writer's rows are lost to a concurrent compaction.
+
+    Attributes:
+        positions (dict[tuple[str, str], tuple[int, int]]): Button centers keyed by
+            `(image_name, image_path)`.
+        log_path (str): The append-only CSV log that changed positions are written to.
+        flush_interval (float): Seconds between background flushes.
+
+    Methods:
+        load: Builds an index from the seed and log CSV files.
+        get: Returns the last known center of an image.
+        update: Stores a new center for an image and queues it for the log.
+        flush: Appends the queued positions to the log.
+        compact: Rewrites the log with only the latest row of each image.
+        close: Stops the flusher, then flushes and compacts the log.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    positions: dict[tuple[str, str], tuple[int, int]] = Field(
+        default_factory=dict, description="The last known button centers."
+    )
+    log_path: str = Field(
+        default="./logs/positions.csv", description="The append-only position log."
+    )
+    flush_interval: float = Field(default=1.0, description="Seconds between background flushes.")
+    _pending: list[tuple[str, str, int, int]] = PrivateAttr(default_factory=list)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stopped: threading.Event = PrivateAttr(default_factory=threading.Event)
+    _flusher: threading.Thread | None = PrivateAttr(default=None)
+
+    @classmethod
+    def load(
+        cls,
+        paths: tuple[str, ...] = ("./data/positions.csv", "./logs/positions.csv"),
+        log_path: str = "./logs/positions.csv",
+    ) -> "PositionIndex":
+        """Loads known positions from CSV files, later files overriding earlier ones.
+
+        Args:
+            paths (tuple[str, ...]): CSV files with `image_name,image_path,x,y` columns.
+            log_path (str): Where changed positions are appended.
+
+        Returns:
+            PositionIndex: The loaded index, empty when none of the files exist.
+        """
+        index = cls(log_path=log_path)
+        for path in paths:
+            csv_path = Path(path)
+            if not csv_path.exists():
+                continue
+            positions = _read_positions(csv_path)
+            if positions is None:
+                logfire.warn("Skipping position file without x/y columns", path=path)
+                continue
+            index.positions.update(positions)
+        return index
+
+    def get(self, image_cfg: ImageModel) -> tuple[int, int] | None:
+        return self.positions.get((image_cfg.image_name, image_cfg.image_path))
+
+    def update(self, image_cfg: ImageModel, x: int, y: int) -> bool:
+        """Stores the latest center of an image and queues it for the log.
+
+        Args:
+            image_cfg (ImageModel): The image configuration.
+            x (int): The x-coordinate of the button center.
+            y (int): The y-coordinate of the button center.
+
+        Returns:
+            bool: Whether the stored position changed.
+        """
+        key = (image_cfg.image_name, image_cfg.image_path)
+        if self.positions.get(key) == (x, y):
+            return False
+        self.positions[key] = (x, y)
+        with self._lock:
+            self._pending.append((*key, x, y))
+            if self._flusher is None and not self._stopped.is_set():
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, name="position-flusher", daemon=True
+                )
+                self._flusher.start()
+        return True
+
+    def _flush_periodically(self) -> None:
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> None:
+        """Appends every queued position to the log in a single write."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        with file_lock(self.log_path):
+            log_path = Path(self.log_path)
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not log_path.exists() or log_path.stat().st_size == 0
+            with log_path.open("a", encoding="utf-8", newline="") as log_file:
+                log_file.write(_format_rows(rows, header=new_file))
+
+    def compact(self) -> None:
+        """Rewrites the log with the latest row of each image, including other writers' rows."""
+        with file_lock(self.log_path):
+            log_path = Path(self.log_path)
+            if not log_path.exists():
+                return
+            positions = _read_positions(log_path)
+            if positions is None:
+                return
+            rows = [(*key, x, y) for key, (x, y) in positions.items()]
+            temp_path = log_path.with_name(f"{log_path.name}.{os.getpid()}.tmp")
+            temp_path.write_text(_format_rows(rows, header=True), encoding="utf-8", newline="")
+            temp_path.replace(log_path)
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self.compact()
@@ -0,0 +1,97 @@
+from typing import Any
+import asyncio
+from pathlib import Path
+from collections.abc import AsyncIterator
+
+import cv2
+import yaml
+import logfire
+from pydantic import Field, BaseModel, PrivateAttr, ValidationError, model_validator
+
+from .config import ConfigModel
+
+
+class ConfigWatcher(BaseModel):
+    """Polls a game config file and validates every new version of it off the event loop.
+
+    A version is only handed out once it parses, validates and every template it names
+    exists and decodes, so a half-saved or mistyped file or template never reaches a
+    running controller.
+
+    Attributes:
+        path (str): The YAML config file.
+        interval (float): Seconds between two checks of the file.
+        overrides (dict[str, Any]): Values applied on top of the file, like a fleet's serial.
+
+    Methods:
+        poll: Returns the config if the file changed and is valid.
+        changes: Yields every valid new version of the config.
+    """
+
+    path: str = Field(..., description="The YAML config file")
+    interval: float = Field(default=1.0, gt=0, description="Seconds between two checks")
+    overrides: dict[str, Any] = Field(
+        default_factory=dict, description="Values applied on top of the file"
+    )
+    _version: tuple[int, int] | None = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _remember_version(self) -> "ConfigWatcher":
+        # The version already running is not a change
+        self._version = self._stat()
+        return self
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            stat = Path(self.path).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> ConfigModel | None:
+        """Reads and validates the file if it changed since the last poll.
+
+        Returns:
+            ConfigModel | None: The new config, or None if the file is unchanged or invalid.
+        """
+        version = self._stat()
+        if version is None or version == self._version:
+            return None
+        self._version = version
+        try:
+            config_dict = yaml.safe_load(Path(self.path).read_text(encoding="utf-8"))
+            config = ConfigModel(**{**config_dict, **self.overrides})
+        except (OSError, TypeError, yaml.YAMLError, ValidationError) as e:
+            logfire.warn("Ignoring invalid config change", path=self.path, error=str(e))
+            return None
+        missing = [
+            image_cfg.image_path
+            for image_cfg in config.image_list
+            if not Path(image_cfg.image_path).is_file()
+        ]
+        if missing:
+            logfire.warn(
+                "Ignoring config change with missing templates", path=self.path, missing=missing
+            )
+            return None
+        unreadable = [
+            image_cfg.image_path
+            for image_cfg in config.image_list
+            if cv2.imread(image_cfg.image_path) is None
+        ]
+        if unreadable:
+            logfire.warn(
+                "Ignoring config change with unreadable templates",
+                path=self.path,
+                unreadable=unreadable,
+            )
+            return None
+        logfire.info("Config changed", path=self.path)
+        return config
+
+    async def changes(self) -> AsyncIterator[ConfigModel]:
+        while True:
+            await asyncio.sleep(self.interval)
+            config = await asyncio.to_thread(self.poll)
+            if config is not None:
+                yield config
@@ -0,0 +1,180 @@
+import time
+import struct
+import asyncio
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from collections.abc import Iterable
+
+import logfire
+from pydantic import Field, BaseModel, PrivateAttr, model_validator
+
+_MAGIC = b"ACRF"
+_RECORD = struct.Struct("<dI")
+
+
+def write_recording(path: str, frames: Iterable[tuple[float, bytes]]) -> int:
+    """Writes frames into a single recorded-frame file.
+
+    The file is the magic `ACRF` followed by one `(timestamp, length)` record and the
+    encoded image per frame.
+
+    Args:
+        path (str): The file to write.
+        frames (Iterable[tuple[float, bytes]]): Capture timestamps in seconds and PNG bytes.
+
+    Returns:
+        int: The number of frames written.
+    """
+    count = 0
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with Path(path).open("wb") as recording:
+        recording.write(_MAGIC)
+        for timestamp, image in frames:
+            recording.write(_RECORD.pack(timestamp, len(image)))
+            recording.write(image)
+            count += 1
+    return count
+
+
+def read_recording(path: str) -> list[tuple[float, bytes]]:
+    """Reads a recorded-frame file, or every PNG of a directory in file name order.
+
+    Frames of a directory are timed by their modification times.
+
+    Args:
+        path (str): A recorded-frame file or a directory of PNG files.
+
+    Returns:
+        list[tuple[float, bytes]]: Capture timestamps in seconds and PNG bytes.
+
+    Raises:
+        ValueError: If the file is not a recorded-frame file.
+    """
+    source = Path(path)
+    if source.is_dir():
+        return [
+            (image_path.stat().st_mtime, image_path.read_bytes())
+            for image_path in sorted(source.glob("*.png"))
+        ]
+    content = source.read_bytes()
+    if content[: len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"Not a recorded-frame file: {path}")
+    frames = []
+    offset = len(_MAGIC)
+    while offset < len(content):
+        timestamp, length = _RECORD.unpack_from(content, offset)
+        offset += _RECORD.size
+        frames.append((timestamp, content[offset : offset + length]))
+        offset += length
+    return frames
+
+
+class ReplayClick(BaseModel):
+    x: int = Field(..., description="The x coordinate of the click.")
+    y: int = Field(..., description="The y coordinate of the click.")
+    frame: int = Field(..., description="The index of the frame on screen when clicking.")
+    at: float = Field(..., description="Seconds since the replay started.")
+
+
+class ReplayDevice(BaseModel):
+    """A stand-in device that records the clicks sent to it instead of performing them.
+
+    Attributes:
+        clicks (list[ReplayClick]): Every click received, in order.
+    """
+
+    clicks: list[ReplayClick] = Field(default_factory=list)
+    _source: "ReplaySource | None" = PrivateAttr(default=None)
+
+    def attach(self, source: "ReplaySource") -> None:
+        """Timestamps later clicks with the replay position of `source`."""
+        self._source = source
+
+    def click(self, x: int, y: int) -> None:
+        frame, elapsed = (0, 0.0) if self._source is None else self._source.position
+        self.clicks.append(ReplayClick(x=x, y=y, frame=frame, at=round(elapsed, 6)))
+
+
+class ReplaySource(BaseModel):
+    """Streams recorded frames in place of a live device.
+
+    Targets look like `replay://<path>?speed=1&loop=0`, where the path is a recorded-frame
+    file or a directory of PNG files. A speed of 1 plays the frames back with their recorded
+    timing, larger values play faster, and 0 serves them as fast as they are requested.
+
+    Attributes:
+        path (str): The recorded-frame file or directory.
+        speed (float): The playback speed relative to the recording, 0 for maximum speed.
+        loop (bool): Whether to start over after the last frame.
+        device (ReplayDevice): The fake device receiving clicks.
+
+    Methods:
+        from_target: Parses a `replay://` target.
+        next_frame: Waits until the next frame is due and returns it.
+    """
+
+    path: str = Field(..., description="The recorded-frame file or directory")
+    speed: float = Field(default=1.0, ge=0, description="0 replays at maximum speed")
+    loop: bool = Field(default=False, description="Start over after the last frame")
+    device: ReplayDevice = Field(default_factory=ReplayDevice)
+    _frames: list[tuple[float, bytes]] = PrivateAttr(default_factory=list)
+    _index: int = PrivateAttr(default=0)
+    _started_at: float | None = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _load_frames(self) -> "ReplaySource":
+        self._frames = read_recording(self.path)
+        if not self._frames:
+            raise ValueError(f"No frames to replay in {self.path}")
+        self.device.attach(self)
+        return self
+
+    @classmethod
+    def from_target(cls, target: str) -> "ReplaySource":
+        parsed = urlparse(target)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        return cls(
+            path=f"{parsed.netloc}{parsed.path}",
+            speed=float(query.get("speed", 1.0)),
+            loop=query.get("loop", "0").lower() in {"1", "true", "yes"},
+        )
+
+    @property
+    def position(self) -> tuple[int, float]:
+        """The index of the frame last served and the seconds since the replay started."""
+        if self._started_at is None:
+            return 0, 0.0
+        return max(self._index - 1, 0), time.perf_counter() - self._started_at
+
+    async def next_frame(self) -> bytes:
+        """Returns the next frame, waiting for its recorded time unless replaying at full speed.
+
+        Returns:
+            bytes: The PNG encoded frame.
+
+        Raises:
+            EOFError: If every frame has been served and the replay does not loop.
+        """
+        if self._index >= len(self._frames):
+            if not self.loop:
+                _, elapsed = self.position
+                logfire.info(
+                    "Replay finished",
+                    frames=self._index,
+                    seconds=round(elapsed, 3),
+                    frames_per_second=round(self._index / elapsed, 2) if elapsed else None,
+                    clicks=len(self.device.clicks),
+                )
+                raise EOFError(f"Replay of {self.path} finished")
+            self._index = 0
+            self._started_at = None
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        timestamp, image = self._frames[self._index]
+        if self.speed > 0:
+            due = (timestamp - self._frames[0][0]) / self.speed
+            delay = due - (time.perf_counter() - self._started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        self._index += 1
+        return image
@@ -0,0 +1,104 @@
+import time
+
+import logfire
+from pydantic import Field, BaseModel, PrivateAttr, model_validator
+
+from .config import SceneModel
+
+
+class SceneTracker(BaseModel):
+    """Follows the scene graph of a config to decide which images are worth testing.
+
+    The tracker starts in the first scene. A hit moves it along the scene's transition for
+    the found image and restarts the scene's timeout. When the timeout passes without any
+    hit, every image is tested again until a hit points to a scene.
+
+    Attributes:
+        scenes (list[SceneModel]): The scene graph, empty to always test every image.
+        default_timeout (float): The timeout of scenes that do not set their own.
+
+    Methods:
+        active_images: The image names to test this tick, or None for every image.
+        observe: Moves to the next scene after the images found in a tick.
+    """
+
+    scenes: list[SceneModel] = Field(default_factory=list, description="The scene graph")
+    default_timeout: float = Field(default=30.0, description="The default scene timeout")
+    _current: SceneModel | None = PrivateAttr(default=None)
+    _entered_at: float = PrivateAttr(default_factory=time.monotonic)
+
+    @model_validator(mode="after")
+    def _start(self) -> "SceneTracker":
+        self._current = self.scenes[0] if self.scenes else None
+        return self
+
+    @property
+    def current(self) -> str | None:
+        return self._current.name if self._current is not None else None
+
+    def _enter(self, scene: SceneModel | None, now: float) -> None:
+        if scene is not self._current:
+            logfire.info(
+                "Scene changed",
+                previous=self.current,
+                current=scene.name if scene is not None else None,
+            )
+        self._current = scene
+        self._entered_at = now
+
+    def active_images(self, now: float | None = None) -> set[str] | None:
+        """Returns the images of the current scene, falling back to a full scan on timeout.
+
+        Args:
+            now (float | None): The current `time.monotonic()`.
+
+        Returns:
+            set[str] | None: The image names worth testing, or None to test every image.
+        """
+        if self._current is None:
+            return None
+        now = time.monotonic() if now is None else now
+        timeout = self._current.timeout or self.default_timeout
+        if now - self._entered_at > timeout:
+            logfire.warn("Scene timed out, testing every image", scene=self._current.name)
+            self._enter(None, now)
+            return None
+        return set(self._current.images)
+
+    def observe(self, found_names: list[str], now: float | None = None) -> None:
+        """Moves along the scene graph after the images found in a tick.
+
+        Args:
+            found_names (list[str]): The names of the images found, in `image_list` order.
+            now (float | None): The current `time.monotonic()`.
+        """
+        if not self.scenes or not found_names:
+            return
+        now = time.monotonic() if now is None else now
+        if self._current is not None:
+            for name in found_names:
+                if name in self._current.transitions:
+                    self._enter(self._scene(self._current.transitions[name]), now)
+                    return
+            # Still in the same scene, a hit keeps it alive
+            self._entered_at = now
+            return
+        # After a full scan, a hit tells which scene the game is in
+        scene = self._locate(found_names)
+        if scene is not None:
+            self._enter(scene, now)
+
+    def _locate(self, found_names: list[str]) -> SceneModel | None:
+        """Finds the scene a hit leads to, or else the first scene showing a found image."""
+        for name in found_names:
+            for scene in self.scenes:
+                if name in scene.transitions:
+                    return self._scene(scene.transitions[name])
+        for name in found_names:
+            for scene in self.scenes:
+                if name in scene.images:
+                    return scene
+        return None
+
+    def _scene(self, name: str) -> SceneModel:
+        return next(scene for scene in self.scenes if scene.name == name)
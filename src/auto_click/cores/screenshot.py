@@ -1,12 +1,32 @@
+import io
+import base64
 import asyncio
 
 from PIL import Image, ImageGrab
-from adbutils import adb
-from pydantic import BaseModel, ConfigDict
+import numpy as np
+import logfire
+from adbutils import AdbClient
+from pydantic import Field, BaseModel, ConfigDict
 from pygetwindow import Win32Window, getWindowsWithTitle
-from adbutils._device import AdbDevice
+from adbutils.errors import AdbError
 from playwright_stealth import Stealth
-from playwright.async_api import Page, Browser, Playwright, BrowserContext, async_playwright
+from playwright.async_api import (
+    Page,
+    Browser,
+    CDPSession,
+    Playwright,
+    BrowserContext,
+    async_playwright,
+)
+
+from .config import AdbCaptureMode, BrowserCaptureMode, BrowserImageFormat
+from .device import AsyncAdbDevice
+from .replay import ReplayDevice, ReplaySource
+from .metrics import TickMetrics, metrics
+
+
+class ForegroundError(Exception):
+    """Raised when another app than the target is in the foreground of the device."""
 
 
 class ShiftPosition(BaseModel):
@@ -26,17 +46,33 @@ class Screenshot(BaseModel):
 
     Attributes:
         model_config (ConfigDict): The configuration dictionary for the model.
-        screenshot (Union[bytes, Image.Image]): The screenshot image data.
-        device (Union[AdbDevice, Page, ShiftPosition]): The device from which the screenshot was captured.
+        screenshot (Union[bytes, Image.Image, np.ndarray]): The screenshot image data, RGBA
+            pixels for raw framebuffer captures.
+        device (Union[AsyncAdbDevice, Page, ShiftPosition, ReplayDevice]): The device from which the screenshot was captured.
+        origin (tuple[int, int]): Where the top-left pixel of a clipped capture is on screen.
 
     Methods:
         save: Save the screenshot to a specified path.
         calibrate: Adjust the button center coordinates based on the device
+        to_image: Convert the screenshot to a PIL image.
     """
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
-    screenshot: bytes | Image.Image
-    device: AdbDevice | Page | ShiftPosition
+    screenshot: bytes | Image.Image | np.ndarray
+    device: AsyncAdbDevice | Page | ShiftPosition | ReplayDevice
+    origin: tuple[int, int] = (0, 0)
+
+    def to_image(self) -> Image.Image:
+        """Converts the screenshot to a PIL image, e.g. for notification attachments.
+
+        Returns:
+            Image.Image: The screenshot as a PIL image.
+        """
+        if isinstance(self.screenshot, np.ndarray):
+            return Image.fromarray(self.screenshot, mode="RGBA").convert("RGB")
+        if isinstance(self.screenshot, bytes):
+            return Image.open(io.BytesIO(self.screenshot))
+        return self.screenshot
 
 
 class ScreenshotManager(BaseModel):
@@ -47,8 +83,20 @@ class ScreenshotManager(BaseModel):
         _browser (Browser | None): Cached browser instance for reuse.
         _context (BrowserContext | None): Cached browser context for reuse.
         _browser_page (Page | None): Cached browser page instance for reuse.
-        _adb_device (AdbDevice | None): Cached ADB device instance for reuse.
-        _adb_serial (str | None): Cached serial number for ADB device.
+        _adb_device (AsyncAdbDevice | None): Cached ADB device running calls off the loop.
+        _foreground_task (asyncio.Task | None): Background task verifying the foreground app.
+        _foreground_error (Exception | None): Set while the target app is not in the foreground.
+        _replay_source (ReplaySource | None): The recorded frames served for a `replay://` target.
+        _browser_url (str | None): The URL the persistent browser page has navigated to.
+        _cdp_session (CDPSession | None): The session streaming screencast frames.
+        _screencast_frame (bytes | None): The latest screencast frame.
+        _screencast_ready (asyncio.Event | None): Set once the first screencast frame arrived.
+        browser_channel (str | None): The browser channel to launch, None for bundled Chromium.
+        adb_client (AdbClient | None): The ADB client of new devices, a dedicated one per
+            device when None.
+        metrics (TickMetrics): Records how long the background foreground checks take.
+        screencast_timeout (float): Seconds to wait for the first screencast frame before
+            taking a screenshot instead.
     """
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -56,8 +104,26 @@ class ScreenshotManager(BaseModel):
     _browser: Browser | None = None
     _context: BrowserContext | None = None
     _browser_page: Page | None = None
-    _adb_device: AdbDevice | None = None
-    _adb_serial: str | None = None
+    _adb_device: AsyncAdbDevice | None = None
+    _foreground_task: asyncio.Task[None] | None = None
+    _foreground_error: Exception | None = None
+    _replay_source: ReplaySource | None = None
+    _browser_url: str | None = None
+    _cdp_session: CDPSession | None = None
+    _screencast_frame: bytes | None = None
+    _screencast_ready: asyncio.Event | None = None
+    browser_channel: str | None = Field(
+        default="chrome", description="The browser channel, None for the bundled Chromium"
+    )
+    adb_client: AdbClient | None = Field(
+        default=None, description="The ADB client of new devices, a dedicated one when None"
+    )
+    metrics: TickMetrics = Field(
+        default_factory=lambda: metrics, description="Records the background foreground checks"
+    )
+    screencast_timeout: float = Field(
+        default=5.0, description="Seconds to wait for the first screencast frame"
+    )
 
     async def from_window(self, window_title: str) -> Screenshot:
         """Captures a screenshot of the specified window.
@@ -88,39 +154,174 @@ class ScreenshotManager(BaseModel):
         shift_position = ShiftPosition(shift_x=shift_x, shift_y=shift_y)
         return Screenshot(screenshot=screenshot, device=shift_position)
 
-    async def from_adb(self, url: str, serial: str) -> Screenshot:
+    async def verify_foreground(self, url: str) -> None:
+        """Checks that the target app is in the foreground of the connected device.
+
+        Args:
+            url (str): The package name of the app to verify.
+
+        Raises:
+            ForegroundError: If the current app on the device is not the specified URL.
+            AdbError: If the device could not be asked for its current app.
+        """
+        if self._adb_device is None:
+            return
+        running_app = await self._adb_device.app_current()
+        if running_app.package != url:
+            self._foreground_error = ForegroundError(
+                f"{running_app.package} is in the foreground instead of {url}"
+            )
+            raise self._foreground_error
+        self._foreground_error = None
+
+    async def _verify_foreground_periodically(
+        self, url: str, interval: float, device: str
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                with self.metrics.measure(device, "foreground_check"):
+                    await self.verify_foreground(url=url)
+            except ForegroundError:
+                logfire.warn("The target app is not in the foreground", package=url)
+            except (AdbError, OSError, TimeoutError) as e:
+                # The next capture raises it, so the failure reaches the controller
+                self._foreground_error = e
+                logfire.warn("Checking the foreground app failed", package=url, error=repr(e))
+
+    async def from_adb(
+        self,
+        url: str,
+        serial: str,
+        mode: AdbCaptureMode = "png",
+        check_interval: float = 5.0,
+        device_name: str = "",
+    ) -> Screenshot:
         """Capture a screenshot from an Android device using ADB.
 
         Args:
             url (str): The package name of the app to verify.
             serial (str): The serial number of the Android device.
+            mode (AdbCaptureMode): `png` for `screencap -p`, `raw` for an uncompressed
+                framebuffer per call, or `stream` for raw frames over a persistent shell.
+            check_interval (float): Seconds between background foreground-app checks.
+            device_name (str): The device the background checks are recorded for in
+                `metrics`, the serial when empty.
 
         Returns:
             Screenshot: An instance of the Screenshot class containing the screenshot and device information.
 
         Raises:
-            Exception: If the current app on the device is not the specified URL.
+            ForegroundError: If the current app on the device is not the specified URL.
+            AdbError: If the device failed, also when the last background check failed.
 
         Notes:
             ADB device instance is cached and reused across calls for better performance.
+            Every ADB call runs in the device's own threads with a timeout, reconnecting on
+            failure, so a slow device never blocks the event loop.
+            The raw modes skip PNG encoding on the device and decoding on the host.
+            The foreground app is verified in a background task instead of on every frame.
         """
         # Reuse existing ADB connection if serial matches
-        if self._adb_device is None or self._adb_serial != serial:
-            adb.connect(serial)
-            self._adb_device = adb.device(serial=serial)
-            self._adb_serial = serial
-
-        running_app = self._adb_device.app_current()
-        if running_app.package != url:
-            raise Exception("The current app is not the specified URL")
-        screenshot = self._adb_device.screenshot()
+        if self._adb_device is None or self._adb_device.serial != serial:
+            if self._adb_device is not None:
+                await self._adb_device.close()
+                self._adb_device = None
+            adb_device = AsyncAdbDevice(serial=serial, client=self.adb_client)
+            try:
+                await adb_device.connect()
+            except BaseException:
+                await adb_device.close()
+                raise
+            # Only a connected device is reused, a failed connect is retried next tick
+            self._adb_device = adb_device
+            if self._foreground_task is not None:
+                self._foreground_task.cancel()
+                self._foreground_task = None
+
+        if self._foreground_task is None or self._foreground_task.done():
+            # Verify once up front, then keep checking in the background off the hot path
+            await self.verify_foreground(url=url)
+            self._foreground_task = asyncio.create_task(
+                self._verify_foreground_periodically(
+                    url=url, interval=check_interval, device=device_name or serial
+                )
+            )
+        if self._foreground_error is not None:
+            raise self._foreground_error
+        screenshot = await self._adb_device.capture(mode=mode)
         return Screenshot(screenshot=screenshot, device=self._adb_device)
 
-    async def from_browser(self, url: str) -> Screenshot:
+    async def from_replay(self, url: str) -> Screenshot:
+        """Serves the next recorded frame of a `replay://` target.
+
+        Args:
+            url (str): The replay target, e.g. `replay://./data/frames/mahjong?speed=0`.
+
+        Returns:
+            Screenshot: The recorded frame and the fake device recording clicks.
+
+        Raises:
+            EOFError: If the recording has been played to the end.
+        """
+        if self._replay_source is None:
+            self._replay_source = await asyncio.to_thread(ReplaySource.from_target, url)
+        screenshot = await self._replay_source.next_frame()
+        return Screenshot(screenshot=screenshot, device=self._replay_source.device)
+
+    async def _on_screencast_frame(self, event: dict) -> None:
+        self._screencast_frame = base64.b64decode(event["data"])
+        self._screencast_ready.set()
+        await self._cdp_session.send("Page.screencastFrameAck", {"sessionId": event["sessionId"]})
+
+    async def _start_screencast(self, image_format: BrowserImageFormat, quality: int) -> None:
+        self._screencast_ready = asyncio.Event()
+        self._cdp_session = await self._context.new_cdp_session(self._browser_page)
+        self._cdp_session.on("Page.screencastFrame", self._on_screencast_frame)
+        params: dict[str, object] = {"format": image_format, "everyNthFrame": 1}
+        if image_format == "jpeg":
+            params["quality"] = quality
+        await self._cdp_session.send("Page.startScreencast", params)
+
+    async def _stop_screencast(self) -> None:
+        if self._cdp_session is not None:
+            await self._cdp_session.send("Page.stopScreencast")
+            await self._cdp_session.detach()
+            self._cdp_session = None
+            self._screencast_frame = None
+            self._screencast_ready = None
+
+    def _clamp_clip(
+        self, clip: tuple[int, int, int, int] | None
+    ) -> tuple[int, int, int, int] | None:
+        viewport = self._browser_page.viewport_size
+        if clip is None or viewport is None:
+            return None
+        x0, y0 = max(clip[0], 0), max(clip[1], 0)
+        x1, y1 = min(clip[2], viewport["width"]), min(clip[3], viewport["height"])
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    async def from_browser(
+        self,
+        url: str,
+        mode: BrowserCaptureMode = "reload",
+        clip: tuple[int, int, int, int] | None = None,
+        image_format: BrowserImageFormat = "png",
+        quality: int = 80,
+    ) -> Screenshot:
         """Takes a screenshot of a webpage from a given URL using an automated browser.
 
         Args:
             url (str): The URL of the webpage to take a screenshot of.
+            mode (BrowserCaptureMode): `reload` navigates before every screenshot,
+                `persistent` navigates once and then only takes screenshots, and `screencast`
+                navigates once and serves the latest frame pushed by a CDP screencast.
+            clip (tuple[int, int, int, int] | None): In `persistent` mode, only capture this
+                (x0, y0, x1, y1) region of the page.
+            image_format (BrowserImageFormat): `png` or `jpeg` frames.
+            quality (int): The JPEG quality.
 
         Returns:
             Screenshot: An object containing the screenshot and the device (page) used to capture it.
@@ -135,12 +336,13 @@ class ScreenshotManager(BaseModel):
             - The function sets a specific user agent and other browser context options.
             - The function uses a stealth mode to further avoid detection.
             - Browser instance is reused across calls for better performance.
+            - Clipped captures report where they start on the page in `Screenshot.origin`.
         """
         # Initialize browser on first call
         if self._browser_page is None:
             self._playwright = await async_playwright().start()
             self._browser = await self._playwright.chromium.launch(
-                channel="chrome",
+                channel=self.browser_channel,
                 headless=True,
                 # 反反爬蟲
                 args=[
@@ -167,10 +369,47 @@ class ScreenshotManager(BaseModel):
             await stealth.apply_stealth_async(self._context)
             self._browser_page = await self._context.new_page()
 
-        # Navigate to URL and take screenshot
-        await self._browser_page.goto(url)
-        screenshot = await self._browser_page.screenshot()
-        return Screenshot(screenshot=screenshot, device=self._browser_page)
+        if mode == "reload":
+            # Navigate to URL and take screenshot
+            await self._browser_page.goto(url)
+            screenshot = await self._browser_page.screenshot()
+            return Screenshot(screenshot=screenshot, device=self._browser_page)
+
+        # The game keeps running in the page, only navigate when the target changes
+        if self._browser_url != url:
+            await self._stop_screencast()
+            await self._browser_page.goto(url)
+            self._browser_url = url
+        if mode == "screencast":
+            if self._cdp_session is None:
+                await self._start_screencast(image_format=image_format, quality=quality)
+            # Chrome only pushes frames when the page repaints, a quiet page keeps its last one
+            try:
+                await asyncio.wait_for(
+                    self._screencast_ready.wait(), timeout=self.screencast_timeout
+                )
+                return Screenshot(screenshot=self._screencast_frame, device=self._browser_page)
+            except TimeoutError:
+                # A page that never painted sends no frame, the screenshot forces one
+                logfire.warn(
+                    "No screencast frame arrived, taking a screenshot",
+                    url=url,
+                    timeout=self.screencast_timeout,
+                )
+                clip = None
+
+        options: dict[str, object] = {"type": image_format}
+        if image_format == "jpeg":
+            options["quality"] = quality
+        region = self._clamp_clip(clip)
+        if region is None:
+            screenshot = await self._browser_page.screenshot(**options)
+            return Screenshot(screenshot=screenshot, device=self._browser_page)
+        x0, y0, x1, y1 = region
+        screenshot = await self._browser_page.screenshot(
+            clip={"x": x0, "y": y0, "width": x1 - x0, "height": y1 - y0}, **options
+        )
+        return Screenshot(screenshot=screenshot, device=self._browser_page, origin=(x0, y0))
 
     async def cleanup(self) -> None:
         """Cleanup browser and ADB resources.
@@ -178,6 +417,8 @@ class ScreenshotManager(BaseModel):
         Should be called when the ScreenshotManager is no longer needed.
         """
         # Cleanup browser resources
+        await self._stop_screencast()
+        self._browser_url = None
         if self._browser_page is not None:
             await self._browser_page.close()
             self._browser_page = None
@@ -192,6 +433,11 @@ class ScreenshotManager(BaseModel):
             self._playwright = None
 
         # Cleanup ADB resources
+        if self._foreground_task is not None:
+            self._foreground_task.cancel()
+            self._foreground_task = None
+            self._foreground_error = None
         if self._adb_device is not None:
+            await self._adb_device.close()
             self._adb_device = None
-            self._adb_serial = None
+        self._replay_source = None
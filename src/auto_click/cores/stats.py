@@ -0,0 +1,99 @@
+import numpy as np
+from pydantic import Field, BaseModel, ConfigDict, PrivateAttr, model_validator
+
+
+class HitStatistics(BaseModel):
+    """Recent hit rates of the images of one controller, kept in flat arrays.
+
+    Every match decays the image's earlier counts, so the rates follow the current phase of
+    a long session rather than its whole history. Rates use a Laplace prior, which makes an
+    image that was never tested look likely and get tested early.
+
+    Attributes:
+        size (int): The number of images, indexed like `image_list`.
+        decay (float): The weight of the earlier counts after every match of an image.
+        rare_hit_rate (float): Images hit less often than this are tested less often.
+        max_interval (int): The most ticks between two tests of a rarely hit image.
+        warmup (int): Matches before an image's rate is trusted.
+
+    Methods:
+        record: Stores the outcome of one match.
+        probability: The recent hit rate of every image.
+        order: Sorts image indices by recent hit rate, most likely first.
+        is_due: Whether an image should be tested in a tick.
+        reindex: Rearranges the counts for a new image list.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    size: int = Field(..., ge=0, description="The number of images")
+    decay: float = Field(default=0.99, gt=0, le=1, description="The decay per match")
+    rare_hit_rate: float = Field(default=0.05, ge=0, le=1, description="The rare hit rate")
+    max_interval: int = Field(default=4, ge=1, description="The longest test interval in ticks")
+    warmup: int = Field(default=20, ge=0, description="Matches before a rate is trusted")
+    _tests: np.ndarray = PrivateAttr()
+    _hits: np.ndarray = PrivateAttr()
+    _matches: np.ndarray = PrivateAttr()
+    _last_tested: np.ndarray = PrivateAttr()
+
+    @model_validator(mode="after")
+    def _allocate(self) -> "HitStatistics":
+        self._tests = np.zeros(self.size, dtype=np.float64)
+        self._hits = np.zeros(self.size, dtype=np.float64)
+        self._matches = np.zeros(self.size, dtype=np.int64)
+        self._last_tested = np.full(self.size, -self.max_interval, dtype=np.int64)
+        return self
+
+    def record(self, index: int, hit: bool, tick: int) -> None:
+        """Stores the outcome of matching an image in a tick.
+
+        Args:
+            index (int): The image's position in `image_list`.
+            hit (bool): Whether the image was found.
+            tick (int): The tick the match ran in.
+        """
+        self._tests[index] = self._tests[index] * self.decay + 1
+        self._hits[index] = self._hits[index] * self.decay + hit
+        self._matches[index] += 1
+        self._last_tested[index] = tick
+
+    def probability(self) -> np.ndarray:
+        return (self._hits + 1) / (self._tests + 2)
+
+    def order(self, indices: list[int]) -> list[int]:
+        """Sorts image indices by recent hit rate, keeping `image_list` order for ties."""
+        if not indices:
+            return []
+        probability = self.probability()[indices]
+        return [indices[i] for i in np.argsort(-probability, kind="stable")]
+
+    def interval(self, index: int) -> int:
+        """The ticks between two tests of an image, longer the rarer its hits."""
+        if self._matches[index] < self.warmup:
+            return 1
+        probability = float(self.probability()[index])
+        if probability >= self.rare_hit_rate:
+            return 1
+        return min(self.max_interval, int(self.rare_hit_rate / max(probability, 1e-9)))
+
+    def is_due(self, index: int, tick: int) -> bool:
+        return tick - int(self._last_tested[index]) >= self.interval(index)
+
+    def reindex(self, sources: list[int | None]) -> None:
+        """Rearranges the counts for a new image list, keeping those of the kept images.
+
+        Args:
+            sources (list[int | None]): For every image of the new list, its index in the
+                current one, or None for a new image.
+        """
+        origins = np.array(
+            [-1 if source is None else source for source in sources], dtype=np.int64
+        )
+        kept = origins >= 0
+        arrays = {"_tests": 0, "_hits": 0, "_matches": 0, "_last_tested": -self.max_interval}
+        for name, initial in arrays.items():
+            current = getattr(self, name)
+            rearranged = np.full(len(sources), initial, dtype=current.dtype)
+            rearranged[kept] = current[origins[kept]]
+            setattr(self, name, rearranged)
+        self.size = len(sources)
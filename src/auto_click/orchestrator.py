@@ -0,0 +1,107 @@
+import time
+import asyncio
+
+import logfire
+from pydantic import Field, BaseModel
+
+from auto_click.cli import AutoClicker
+from auto_click.controller import RemoteController
+from auto_click.cores.pool import MatchPool, ProcessMatchPool
+from auto_click.cores.notify import dispatcher
+
+
+class DeviceEntry(BaseModel):
+    config_path: str = Field(..., description="The game config to run on this device.")
+    host: str | None = Field(default=None, description="Overrides the ADB host of the config.")
+    serial: str | None = Field(default=None, description="Overrides the ADB serial of the config.")
+
+
+class Orchestrator(AutoClicker):
+    """Runs one controller per device concurrently on a single event loop.
+
+    All controllers share the process-wide template cache and one bounded matching pool that
+    schedules devices round-robin, made of threads or, with `processes`, worker processes.
+
+    Attributes:
+        fleet_path (str): A YAML file with a `devices` list of config/device pairs.
+        max_workers (int | None): The matching pool size, defaults to the CPU count.
+        processes (bool): Match in worker processes fed through shared memory.
+        report_interval (float): Seconds between per-device throughput reports.
+    """
+
+    fleet_path: str = Field(default="./configs/fleet.yaml")
+    max_workers: int | None = Field(
+        default=None, description="The number of matching threads, defaults to the CPU count"
+    )
+    processes: bool = Field(
+        default=False, description="Match in worker processes instead of threads"
+    )
+    report_interval: float = Field(
+        default=30.0, description="Seconds between per-device ticks per second reports"
+    )
+
+    async def load_fleet(self) -> list[DeviceEntry]:
+        fleet_dict = await self.load_yaml(config_path=self.fleet_path)
+        return [DeviceEntry(**entry) for entry in fleet_dict["devices"]]
+
+    async def report(self, controllers: list[RemoteController]) -> None:
+        """Periodically logs how many ticks per second each device achieves."""
+        last_ticks = [controller.tick_count for controller in controllers]
+        last_time = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.perf_counter()
+            for index, controller in enumerate(controllers):
+                ticks_per_second = (controller.tick_count - last_ticks[index]) / (now - last_time)
+                last_ticks[index] = controller.tick_count
+                logfire.info(
+                    "Device throughput",
+                    device=controller.device_name,
+                    ticks_per_second=round(ticks_per_second, 2),
+                )
+            last_time = now
+
+    async def __call__(self) -> None:
+        entries = await self.load_fleet()
+        pool_class = ProcessMatchPool if self.processes else MatchPool
+        match_pool = (
+            pool_class() if self.max_workers is None else pool_class(max_workers=self.max_workers)
+        )
+        controllers = []
+        watchers = []
+        for entry in entries:
+            config = await self.load_yaml(config_path=entry.config_path)
+            overrides = entry.model_dump(exclude={"config_path"}, exclude_none=True)
+            config.update(overrides)
+            controller = RemoteController(**config, match_pool=match_pool)
+            controllers.append(controller)
+            if self.reload_interval is not None:
+                watchers.append(
+                    asyncio.create_task(
+                        self.watch_config(controller, entry.config_path, overrides)
+                    )
+                )
+        reporter = asyncio.create_task(self.report(controllers))
+        metrics_tasks = await self.start_metrics()
+        try:
+            await asyncio.gather(*[self.drive(controller) for controller in controllers])
+        finally:
+            reporter.cancel()
+            for watcher in watchers:
+                watcher.cancel()
+            await self.stop_metrics(metrics_tasks)
+            for controller in controllers:
+                await asyncio.to_thread(controller.position_index.close)
+                await asyncio.to_thread(controller.archiver.close)
+            match_pool.shutdown()
+            await dispatcher.close()
+
+
+def main() -> None:
+    import fire
+
+    fire.Fire(Orchestrator)
+
+
+if __name__ == "__main__":
+    main()
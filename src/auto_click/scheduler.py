@@ -0,0 +1,39 @@
+from pydantic import Field, BaseModel, PrivateAttr
+
+
+class PollingScheduler(BaseModel):
+    """Adapts the delay between ticks to how much is happening on screen.
+
+    The delay grows exponentially while ticks find nothing on an idle screen, and snaps back
+    to `min_delay` as soon as a click is made or the screen changes.
+
+    Attributes:
+        min_delay (float): The fastest polling interval in seconds.
+        max_delay (float): The slowest polling interval in seconds.
+        backoff_factor (float): How much the delay grows after each idle tick.
+
+    Methods:
+        next_delay: Returns the delay before the next tick.
+    """
+
+    min_delay: float = Field(default=0.1, description="The fastest polling interval")
+    max_delay: float = Field(default=2.0, description="The slowest polling interval")
+    backoff_factor: float = Field(default=1.5, description="The growth factor when idle")
+    _delay: float | None = PrivateAttr(default=None)
+
+    def next_delay(self, clicked: bool, matched: bool, screen_changed: bool) -> float:
+        """Computes the delay before the next tick from the outcome of the last one.
+
+        Args:
+            clicked (bool): Whether the last tick clicked something.
+            matched (bool): Whether any image was found in the last tick.
+            screen_changed (bool): Whether the screen changed since the previous tick.
+
+        Returns:
+            float: The delay in seconds.
+        """
+        if self._delay is None or clicked or screen_changed:
+            self._delay = self.min_delay
+        elif not matched:
+            self._delay = min(self._delay * self.backoff_factor, self.max_delay)
+        return self._delay
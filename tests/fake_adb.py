@@ -0,0 +1,112 @@
+"""A minimal stand-in for the ADB server, speaking just enough of the host protocol for tests."""
+
+import time
+import socket
+import struct
+from typing import Self
+import threading
+import socketserver
+from collections.abc import Callable
+
+import numpy as np
+from adbutils import AdbClient
+
+_OKAY = b"OKAY"
+
+
+def raw_screencap(pixels: np.ndarray, header_size: int = 16) -> bytes:
+    """Encodes RGBA pixels the way `screencap` without `-p` writes them."""
+    height, width = pixels.shape[:2]
+    header = struct.pack("<III", width, height, 1)
+    if header_size == 16:
+        header += struct.pack("<I", 0)
+    return header + pixels.tobytes()
+
+
+class FakeAdbServer:
+    """Serves shell commands for a single fake device.
+
+    Attributes:
+        shell_outputs (dict[str, bytes | Callable[[], bytes]]): The output of each one-shot
+            shell command.
+        latency (float): Seconds to wait before answering a shell command.
+        commands (list[str]): Every shell command received, including interactive lines.
+    """
+
+    def __init__(self, shell_outputs: dict[str, bytes | Callable[[], bytes]], latency: float = 0):
+        self.shell_outputs = shell_outputs
+        self.latency = latency
+        self.commands: list[str] = []
+        self.connections = 0
+        server = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                server.connections += 1
+                server._handle(self.request)
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def client(self) -> AdbClient:
+        return AdbClient(host="127.0.0.1", port=self._server.server_address[1])
+
+    def __enter__(self) -> Self:
+        """Starts serving in a background thread."""
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        """Stops the server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _output(self, command: str) -> bytes:
+        output = self.shell_outputs[command]
+        return output() if callable(output) else output
+
+    def _handle(self, conn: socket.socket) -> None:
+        reader = conn.makefile("rb")
+        while True:
+            length = reader.read(4)
+            if not length:
+                return
+            command = reader.read(int(length, 16)).decode("utf-8")
+            if command == "host:version":
+                conn.sendall(_OKAY + b"0004" + b"0029")
+                return
+            if command.startswith("host:connect:"):
+                self.commands.append(command)
+                message = f"already connected to {command.removeprefix('host:connect:')}"
+                conn.sendall(_OKAY + f"{len(message):04x}".encode() + message.encode())
+                return
+            if command.startswith("host:tport:serial:"):
+                conn.sendall(_OKAY + struct.pack("<Q", 1))
+                continue
+            if command.startswith("host:transport:"):
+                conn.sendall(_OKAY)
+                continue
+            if command == "shell:sh":
+                conn.sendall(_OKAY)
+                self._serve_session(conn, reader)
+                return
+            if command.startswith("shell:"):
+                shell_command = command.removeprefix("shell:")
+                self.commands.append(shell_command)
+                time.sleep(self.latency)
+                conn.sendall(_OKAY + self._output(shell_command))
+                conn.shutdown(socket.SHUT_WR)
+                return
+            conn.sendall(b"FAIL" + f"{len(command):04x}".encode() + command.encode())
+            return
+
+    def _serve_session(self, conn: socket.socket, reader: "socket.SocketIO") -> None:
+        """Answers `;`-separated commands written line by line to an interactive shell."""
+        for line in reader:
+            self.commands.append(line.decode("utf-8").strip())
+            time.sleep(self.latency)
+            for part in line.decode("utf-8").strip().split(";"):
+                if part.strip() in self.shell_outputs:
+                    conn.sendall(self._output(part.strip()))
@@ -0,0 +1,72 @@
+from pathlib import Path
+import threading
+
+import cv2
+import numpy as np
+
+from auto_click.cores.config import ImageModel
+from auto_click.cores.archive import CaptureArchiver
+from auto_click.cores.compare import Frame
+
+image_cfg = ImageModel(
+    image_name="確認",
+    image_path="./data/allstars/confirm.png",
+    delay_after_click=0,
+    enable_click=True,
+    enable_screenshot=True,
+    confidence=0.8,
+)
+
+
+def make_frame(seed: int) -> Frame:
+    rng = np.random.default_rng(seed=seed)
+    return Frame.from_screenshot(rng.integers(0, 255, size=(360, 640, 4), dtype=np.uint8))
+
+
+def test_archiver_downscales_and_rotates_within_quota(tmp_path: Path) -> None:
+    archiver = CaptureArchiver(
+        directory=tmp_path.as_posix(), image_format="webp", quality=50, scale=0.5, quota_mb=0.1
+    )
+    for seed in range(6):
+        archiver.submit(make_frame(seed), image_cfg)
+    archiver.close()
+
+    archived = sorted(tmp_path.glob("*_confirm.webp"))
+    # The queue holds all six frames, so only the quota removed the oldest files
+    assert 0 < len(archived) < 6
+    assert sum(path.stat().st_size for path in archived) <= 0.1 * 1024 * 1024
+    archiver.submit(make_frame(7), image_cfg)
+    assert sorted(tmp_path.glob("*_confirm.webp")) == archived
+
+
+def test_archiver_drops_oldest_when_queue_is_full(tmp_path: Path, monkeypatch) -> None:
+    encoding, release = threading.Event(), threading.Event()
+    imencode = cv2.imencode
+
+    def slow_imencode(*args: object) -> tuple[bool, np.ndarray]:
+        encoding.set()
+        release.wait()
+        return imencode(*args)
+
+    monkeypatch.setattr(cv2, "imencode", slow_imencode)
+    archiver = CaptureArchiver(directory=tmp_path.as_posix(), max_queue=2)
+    archiver.submit(make_frame(0), image_cfg)
+    # While the worker encodes the first frame, only the last two of four more stay queued
+    assert encoding.wait(timeout=5)
+    for seed in range(1, 5):
+        archiver.submit(make_frame(seed), image_cfg)
+    release.set()
+    archiver.close()
+    assert archiver.dropped == 2
+    assert len(list(tmp_path.glob("*_confirm.jpg"))) == 3
+
+
+def test_controllers_share_one_archiver_per_directory(tmp_path: Path) -> None:
+    first = CaptureArchiver.shared(directory=tmp_path.as_posix(), quota_mb=1)
+    assert CaptureArchiver.shared(directory=f"{tmp_path.as_posix()}/.", quota_mb=1) is first
+    other = CaptureArchiver.shared(directory=tmp_path.joinpath("other").as_posix())
+    assert other is not first
+    other.close()
+    first.close()
+    first.close()
+    assert CaptureArchiver.shared(directory=tmp_path.as_posix()) is not first
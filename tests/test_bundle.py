@@ -0,0 +1,94 @@
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+from auto_click.cores.bundle import TemplateBundle, default_bundle_path
+from auto_click.cores.compare import (
+    forget_templates,
+    _template_bundles,
+    _load_reduced_template,
+    register_template_bundle,
+    _load_and_convert_template,
+)
+
+data_dir = Path(__file__).parents[1].joinpath("data/allstars")
+
+
+def test_bundle_matches_decoded_templates(tmp_path: Path) -> None:
+    image_paths = [path.as_posix() for path in sorted(data_dir.glob("*.png"))[:3]]
+    bundle = TemplateBundle.compile(image_paths, (tmp_path / "templates.bundle").as_posix())
+    for image_path in image_paths:
+        gray = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2GRAY)
+        assert np.array_equal(bundle.get(image_path), gray)
+        height, width = gray.shape
+        reduced = cv2.resize(gray, (width // 4, height // 4), interpolation=cv2.INTER_AREA)
+        assert np.array_equal(bundle.get(image_path, 4), reduced)
+    assert bundle.get("missing.png") is None
+
+    register_template_bundle(bundle)
+    try:
+        template = _load_and_convert_template(image_paths[0])
+        assert np.shares_memory(template, bundle.get(image_paths[0]))
+        assert (
+            _load_reduced_template(image_paths[0], 2).shape == bundle.get(image_paths[0], 2).shape
+        )
+    finally:
+        _template_bundles.clear()
+        forget_templates()
+
+
+def test_registering_a_bundle_only_drops_the_replaced_templates(tmp_path: Path) -> None:
+    image_paths = [path.as_posix() for path in sorted(data_dir.glob("*.png"))[:2]]
+    first = TemplateBundle.compile(image_paths, (tmp_path / "first.bundle").as_posix())
+    register_template_bundle(first)
+    try:
+        kept, replaced = (_load_and_convert_template(image_path) for image_path in image_paths)
+        second = TemplateBundle.compile(image_paths, (tmp_path / "second.bundle").as_posix())
+        register_template_bundle(second, image_paths=image_paths[1:])
+        assert _load_and_convert_template(image_paths[0]) is kept
+        assert _load_and_convert_template(image_paths[1]) is not replaced
+        assert np.shares_memory(
+            _load_and_convert_template(image_paths[1]), second.get(image_paths[1])
+        )
+    finally:
+        _template_bundles.clear()
+        forget_templates()
+
+
+def test_bundle_recompiles_when_a_source_changes(tmp_path: Path) -> None:
+    image_path = (tmp_path / "button.png").as_posix()
+    shutil.copy(data_dir / "confirm.png", image_path)
+    bundle_path = (tmp_path / "templates.bundle").as_posix()
+    first = TemplateBundle.ensure([image_path], bundle_path)
+    assert TemplateBundle.ensure([image_path], bundle_path).entries == first.entries
+
+    cv2.imwrite(image_path, np.zeros((20, 30, 3), dtype=np.uint8))
+    assert not first.is_fresh([image_path])
+    assert TemplateBundle.ensure([image_path], bundle_path).get(image_path).shape == (20, 30)
+
+
+def test_an_edited_template_gets_a_new_bundle_and_the_old_one_stays(tmp_path: Path) -> None:
+    image_path = (tmp_path / "button.png").as_posix()
+    shutil.copy(data_dir / "confirm.png", image_path)
+    directory = (tmp_path / "templates").as_posix()
+    first = TemplateBundle.ensure([image_path], default_bundle_path([image_path], directory))
+    original = first.get(image_path).copy()
+
+    cv2.imwrite(image_path, np.zeros((20, 30, 3), dtype=np.uint8))
+    second_path = default_bundle_path([image_path], directory)
+    assert second_path != first.path
+    second = TemplateBundle.ensure([image_path], second_path)
+    assert second.get(image_path).shape == (20, 30)
+    # The mapping still in use was never rewritten
+    assert np.array_equal(first.get(image_path), original)
+
+
+def test_an_unreadable_template_is_named(tmp_path: Path) -> None:
+    image_path = tmp_path / "partial.png"
+    image_path.write_bytes(b"\x89PNG\r\n")
+    with pytest.raises(ValueError, match=r"partial\.png"):
+        TemplateBundle.compile([image_path.as_posix()], (tmp_path / "t.bundle").as_posix())
+    assert list(tmp_path.iterdir()) == [image_path]
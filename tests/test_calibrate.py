@@ -0,0 +1,51 @@
+from pathlib import Path
+import threading
+
+import cv2
+import numpy as np
+
+from auto_click.cores.bundle import TemplateBundle, rescale_template
+from auto_click.cores.calibrate import ScaleCalibration, estimate_scale
+
+data_dir = Path(__file__).parents[1].joinpath("data/allstars")
+anchor_path = data_dir.joinpath("confirm.png").as_posix()
+anchor = cv2.cvtColor(cv2.imread(anchor_path), cv2.COLOR_BGR2GRAY)
+
+
+def test_estimate_scale_of_a_smaller_screen(tmp_path: Path) -> None:
+    rng = np.random.default_rng(seed=0)
+    # Templates were cut at 1920x1080, the device runs at 1280x720
+    screen = rng.integers(0, 255, size=(720, 1280), dtype=np.uint8)
+    scaled = rescale_template(anchor, 2 / 3)
+    screen[400 : 400 + scaled.shape[0], 600 : 600 + scaled.shape[1]] = scaled
+    scale, score = estimate_scale(screen, [anchor])
+    assert abs(scale - 2 / 3) <= 0.01
+    assert score > 0.9
+
+    calibration = ScaleCalibration.load((tmp_path / "calibration.json").as_posix())
+    calibration.set("emulator", 1280, 720, scale)
+    reloaded = ScaleCalibration.load(calibration.path)
+    assert reloaded.get("emulator", 1280, 720) == scale
+    assert reloaded.get("emulator", 1920, 1080) is None
+
+    bundle = TemplateBundle.compile([anchor_path], (tmp_path / "t.bundle").as_posix(), scale=scale)
+    assert bundle.get(anchor_path).shape == rescale_template(anchor, scale).shape
+    assert TemplateBundle.ensure([anchor_path], bundle.path).scale == 1
+
+
+def test_writers_keep_each_others_scales(tmp_path: Path) -> None:
+    path = (tmp_path / "calibration.json").as_posix()
+    # Every controller loads the file before any of them has calibrated
+    calibrations = [ScaleCalibration.load(path) for _ in range(8)]
+    threads = [
+        threading.Thread(target=calibration.set, args=(f"device-{i}", 1280, 720, 0.5 + i / 100))
+        for i, calibration in enumerate(calibrations)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reloaded = ScaleCalibration.load(path)
+    assert {key: reloaded.get(key, 1280, 720) for key in [f"device-{i}" for i in range(8)]} == {
+        f"device-{i}": 0.5 + i / 100 for i in range(8)
+    }
@@ -0,0 +1,80 @@
+import numpy as np
+
+from auto_click.cores.change import TileChangeDetector
+from auto_click.cores.compare import Frame
+
+
+def make_frame(gray: np.ndarray) -> Frame:
+    return Frame(source=b"", gray=gray)
+
+
+def test_static_screen_is_clean() -> None:
+    detector = TileChangeDetector()
+    gray = np.random.default_rng(seed=0).integers(0, 255, size=(1080, 1920), dtype=np.uint8)
+    assert detector.update(make_frame(gray)) is None
+    assert detector.any_dirty
+    dirty = detector.update(make_frame(gray.copy()))
+    assert dirty is not None
+    assert not detector.any_dirty
+    assert detector.dirty_bounds() is None
+
+
+def test_changed_tile_is_located() -> None:
+    detector = TileChangeDetector(tile_size=64, downsample=4)
+    gray = np.zeros((1080, 1920), dtype=np.uint8)
+    detector.update(make_frame(gray))
+    changed = gray.copy()
+    changed[700:740, 1300:1400] = 255
+    detector.update(make_frame(changed))
+    assert detector.is_dirty((1280, 640, 1420, 760))
+    assert not detector.is_dirty((0, 0, 600, 400))
+    x0, y0, x1, y1 = detector.dirty_bounds()
+    assert x0 <= 1300
+    assert y0 <= 700
+    assert x1 >= 1400
+    assert y1 >= 740
+
+
+def test_slow_fade_is_caught_against_the_marked_frame() -> None:
+    detector = TileChangeDetector(threshold=2.0)
+    gray = np.zeros((1080, 1920), dtype=np.uint8)
+    detector.update(make_frame(gray))
+    detector.mark("button")
+    for level in range(1, 6):
+        faded = gray.copy()
+        faded[700:764, 1280:1344] = level
+        detector.update(make_frame(faded))
+        # Every step stays below the threshold of the consecutive comparison
+        assert not detector.any_dirty
+    assert detector.is_dirty((1280, 700, 1344, 764), since="button")
+    assert not detector.is_dirty((0, 0, 600, 400), since="button")
+    assert detector.dirty_bounds(since="button") is not None
+    assert detector.is_dirty(since="unknown")
+
+
+def test_forgotten_results_are_always_dirty() -> None:
+    detector = TileChangeDetector()
+    gray = np.random.default_rng(seed=0).integers(0, 255, size=(1080, 1920), dtype=np.uint8)
+    detector.update(make_frame(gray))
+    detector.mark("kept")
+    detector.mark("replaced")
+    detector.update(make_frame(gray.copy()))
+    detector.forget(["replaced"])
+    assert not detector.is_dirty(since="kept")
+    assert detector.is_dirty(since="replaced")
+    detector.forget()
+    assert detector.is_dirty(since="kept")
+
+
+def test_clipped_frames_are_compared_where_they_overlap_on_screen() -> None:
+    detector = TileChangeDetector()
+    gray = np.random.default_rng(seed=0).integers(0, 255, size=(1080, 1920), dtype=np.uint8)
+    detector.update(make_frame(gray))
+    clipped = Frame(source=b"", gray=gray[640:900, 1216:1600].copy(), origin=(1216, 640))
+    assert detector.update(clipped) is not None
+    assert not detector.any_dirty
+    # Back to the full screen, only the clipped area is known to be unchanged
+    detector.update(make_frame(gray.copy()))
+    assert not detector.any_dirty
+    assert not detector.is_dirty((1280, 700, 1344, 764))
+    assert detector.is_dirty((0, 0, 600, 400))
@@ -0,0 +1,191 @@
+import io
+from pathlib import Path
+import threading
+
+from PIL import Image
+import cv2
+import numpy as np
+
+from auto_click.cores.bundle import rescale_template
+from auto_click.cores.config import ImageModel
+from auto_click.cores.compare import (
+    MATCHERS,
+    Frame,
+    ImageComparison,
+    _orb_features,
+    select_matcher,
+    forget_templates,
+)
+from auto_click.cores.positions import PositionIndex
+
+template_path = Path(__file__).parents[1].joinpath("data/allstars/confirm.png").as_posix()
+image_cfg = ImageModel(
+    image_name="確認",
+    image_path=template_path,
+    delay_after_click=0,
+    enable_click=True,
+    enable_screenshot=False,
+    confidence=0.8,
+)
+
+
+def make_screen(x: int = 1232, y: int = 814) -> Image.Image:
+    rng = np.random.default_rng(seed=0)
+    screen = rng.integers(0, 255, size=(1080, 1920, 3), dtype=np.uint8)
+    template = cv2.imread(template_path)
+    screen[y : y + template.shape[0], x : x + template.shape[1]] = template
+    return Image.fromarray(cv2.cvtColor(screen, cv2.COLOR_BGR2RGB))
+
+
+def test_frame_from_png_and_pil_agree() -> None:
+    screen = make_screen()
+    png_bytes = io.BytesIO()
+    screen.save(png_bytes, format="PNG")
+    pil_frame = Frame.from_screenshot(screen)
+    png_frame = Frame.from_screenshot(png_bytes.getvalue())
+    assert pil_frame.gray.shape == png_frame.gray.shape == (1080, 1920)
+    assert np.abs(pil_frame.gray.astype(int) - png_frame.gray.astype(int)).max() <= 1
+    assert png_frame.color.shape == (1080, 1920, 3)
+
+
+async def test_find_with_shared_frame() -> None:
+    frame = Frame.from_screenshot(make_screen())
+    found = await ImageComparison(image_cfg=image_cfg, screenshot=frame).find()
+    assert found.button_x == 1232 + 197 // 2
+    assert found.button_y == 814 + 76 // 2
+    assert found.found_button_name_en == "confirm"
+
+
+async def test_find_searches_known_position_then_full_frame(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    frame = Frame.from_screenshot(make_screen(x=200, y=100))
+    position_index = PositionIndex()
+    position_index.update(image_cfg, 1331, 852)
+    found = await ImageComparison(
+        image_cfg=image_cfg, screenshot=frame, position_index=position_index
+    ).find()
+    assert (found.button_x, found.button_y) == (200 + 197 // 2, 100 + 76 // 2)
+    assert position_index.get(image_cfg) == (found.button_x, found.button_y)
+    position_index.close()
+    assert tmp_path.joinpath("logs/positions.csv").read_text(encoding="utf-8").count("\n") == 2
+
+
+def test_position_index_loads_seed_csv() -> None:
+    position_index = PositionIndex.load(paths=("./data/positions.csv",))
+    assert position_index.positions["確認", "./data/allstars/confirm.png"] == (1331, 852)
+
+
+async def test_pyramid_mode_matches_full_resolution_score() -> None:
+    frame = Frame.from_screenshot(make_screen(x=733, y=421))
+    full = await ImageComparison(image_cfg=image_cfg, screenshot=frame).find()
+    pyramid = await ImageComparison(
+        image_cfg=image_cfg, screenshot=frame, match_mode="pyramid", pyramid_factor=4
+    ).find()
+    assert (pyramid.button_x, pyramid.button_y) == (full.button_x, full.button_y)
+
+
+async def test_search_region_limits_full_frame_search() -> None:
+    frame = Frame.from_screenshot(make_screen(x=1232, y=814))
+    outside = await ImageComparison(
+        image_cfg=image_cfg, screenshot=frame, search_region=(0, 0, 900, 600)
+    ).find()
+    assert outside.button_x is None
+    inside = await ImageComparison(
+        image_cfg=image_cfg, screenshot=frame, search_region=(1100, 700, 1600, 1000)
+    ).find()
+    assert (inside.button_x, inside.button_y) == (1232 + 197 // 2, 814 + 76 // 2)
+
+
+def test_position_log_is_appended_and_compacted(tmp_path) -> None:
+    log_path = tmp_path.joinpath("positions.csv")
+    writers = [PositionIndex(log_path=log_path.as_posix()) for _ in range(2)]
+    writers[0].update(image_cfg, 10, 20)
+    writers[1].update(image_cfg, 30, 40)
+    writers[0].flush()
+    writers[1].flush()
+    writers[0].update(image_cfg, 50, 60)
+    writers[0].flush()
+    assert log_path.read_text(encoding="utf-8").count("\n") == 4
+
+    writers[1].close()
+    writers[0].close()
+    assert log_path.read_text(encoding="utf-8").count("\n") == 2
+    reloaded = PositionIndex.load(paths=(log_path.as_posix(),))
+    assert reloaded.get(image_cfg) == (50, 60)
+
+
+def test_concurrent_compaction_keeps_every_writers_rows(tmp_path) -> None:
+    log_path = tmp_path.joinpath("positions.csv").as_posix()
+    compactor = PositionIndex(log_path=log_path)
+
+    def write(writer: int) -> None:
+        index = PositionIndex(log_path=log_path)
+        for row in range(50):
+            index.update(image_cfg.model_copy(update={"image_name": f"{writer}-{row}"}), row, row)
+            index.flush()
+            compactor.compact()
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(PositionIndex.load(paths=(log_path,)).positions) == 200
+
+
+async def test_find_in_clipped_frame_reports_screen_position(tmp_path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    screen = np.asarray(make_screen())
+    frame = Frame.from_screenshot(Image.fromarray(screen[700:1000, 1100:1600]), origin=(1100, 700))
+    position_index = PositionIndex()
+    position_index.update(image_cfg, 1331, 852)
+    found = await ImageComparison(
+        image_cfg=image_cfg, screenshot=frame, position_index=position_index
+    ).find()
+    assert (found.button_x, found.button_y) == (1232 + 197 // 2, 814 + 76 // 2)
+    position_index.close()
+
+
+def test_matchers_agree_and_selection_picks_an_accurate_one() -> None:
+    button_image = cv2.cvtColor(cv2.imread(template_path), cv2.COLOR_BGR2GRAY)
+    # A flat screen like a game UI, pixel noise would drown the template's keypoints
+    gray = np.tile(np.linspace(60, 120, 1920, dtype=np.uint8), (1080, 1))
+    gray[814 : 814 + button_image.shape[0], 1232 : 1232 + button_image.shape[1]] = button_image
+    for name, matcher in MATCHERS.items():
+        max_val, max_loc = matcher(gray, button_image)
+        assert max_val > 0.95, name
+        assert abs(max_loc[0] - 1232) <= 2, name
+        assert abs(max_loc[1] - 814) <= 2, name
+
+    empty = np.tile(np.linspace(60, 120, 1920, dtype=np.uint8), (1080, 1))
+    name, timings = select_matcher(
+        button_image, [(gray, (1232, 814)), (empty, None)], confidence=0.8, repeat=1
+    )
+    assert name in timings
+    assert timings[name] == min(timings.values())
+    # Keypoints still find the button on a device with a larger screen
+    scaled = rescale_template(button_image, 1.5)
+    gray[100 : 100 + scaled.shape[0], 100 : 100 + scaled.shape[1]] = scaled
+    gray[814:, 1232:] = 90
+    max_val, (loc_x, loc_y) = MATCHERS["orb"](gray, button_image)
+    assert max_val > 0.9
+    assert abs(loc_x + button_image.shape[1] // 2 - (100 + scaled.shape[1] // 2)) <= 3
+    assert abs(loc_y + button_image.shape[0] // 2 - (100 + scaled.shape[0] // 2)) <= 3
+
+
+def test_selection_keeps_ccoeff_without_a_frame_showing_the_template() -> None:
+    button_image = cv2.cvtColor(cv2.imread(template_path), cv2.COLOR_BGR2GRAY)
+    empty = np.tile(np.linspace(60, 120, 1920, dtype=np.uint8), (1080, 1))
+    # Every matcher rejects an empty frame, which says nothing about finding the button
+    name, timings = select_matcher(button_image, [(empty, None)], confidence=0.8, repeat=1)
+    assert name == "ccoeff"
+    assert set(timings) == set(MATCHERS)
+
+
+async def test_orb_keypoints_are_cached_per_template_and_scale() -> None:
+    frame = Frame.from_screenshot(make_screen())
+    found = await ImageComparison(image_cfg=image_cfg, screenshot=frame, matcher="orb").find()
+    assert found.button_x is not None
+    assert (template_path, 1.0) in _orb_features
+    forget_templates([template_path])
+    assert (template_path, 1.0) not in _orb_features
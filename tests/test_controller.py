@@ -0,0 +1,221 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("pyautogui")
+
+from auto_click.cores import compare
+from auto_click.controller import RemoteController
+from auto_click.cores.pool import ProcessMatchPool
+from auto_click.cores.bundle import rescale_template
+from auto_click.cores.config import ConfigModel
+from auto_click.cores.compare import Frame, FoundPosition
+from auto_click.cores.calibrate import ScaleCalibration
+from auto_click.cores.screenshot import ForegroundError, ScreenshotManager
+
+from tests.test_screenshot import fake_phone
+
+data_dir = Path(__file__).parents[1].joinpath("data/allstars")
+image_list = [
+    {
+        "image_name": "確認",
+        "image_path": data_dir.joinpath("confirm.png").as_posix(),
+        "delay_after_click": 0,
+        "enable_click": True,
+        "enable_screenshot": False,
+        "confidence": 0.9,
+    }
+]
+
+
+async def test_foreground_is_checked_after_missed_ticks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Bundles and logs go to ./logs
+    monkeypatch.chdir(tmp_path)
+    focus = {"package": "com.game"}
+    with fake_phone(focus) as server:
+        manager = ScreenshotManager(adb_client=server.client)
+        controller = RemoteController(
+            target="com.game",
+            host="",
+            serial="",
+            enable=True,
+            image_list=image_list,
+            screenshot_manager=manager,
+            foreground_check_misses=3,
+        )
+        try:
+            await manager.from_adb(url="com.game", serial="fake", mode="raw", check_interval=60)
+            focus["package"] = "com.launcher"
+            controller.missed_ticks = 2
+            await controller.check_foreground()
+            controller.missed_ticks = 3
+            with pytest.raises(ForegroundError):
+                await controller.check_foreground()
+            assert controller.missed_ticks == 0
+        finally:
+            await manager.cleanup()
+
+
+async def test_calibration_is_retried_until_an_anchor_is_on_screen(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    controller = RemoteController(
+        target="com.game",
+        host="",
+        serial="",
+        enable=True,
+        image_list=image_list,
+        calibration_anchors=["確認"],
+        calibration_retry_interval=5,
+        calibration=ScaleCalibration(path=(tmp_path / "calibration.json").as_posix()),
+    )
+    rng = np.random.default_rng(seed=0)
+    # A loading screen without any anchor on it
+    screen = rng.integers(0, 255, size=(720, 1280), dtype=np.uint8)
+    await controller.calibrate(Frame(source=b"", gray=screen.copy()))
+    assert controller.calibrated_resolution is None
+    controller.tick_count = 4
+    assert not controller.calibration_due
+    controller.tick_count = 5
+    assert controller.calibration_due
+
+    anchor = cv2.cvtColor(cv2.imread(image_list[0]["image_path"]), cv2.COLOR_BGR2GRAY)
+    scaled = rescale_template(anchor, 2 / 3)
+    screen[400 : 400 + scaled.shape[0], 600 : 600 + scaled.shape[1]] = scaled
+    await controller.calibrate(Frame(source=b"", gray=screen))
+    assert controller.calibrated_resolution == (1280, 720)
+    assert abs(controller.template_scale - 2 / 3) <= 0.01
+    assert not controller.calibration_due
+
+
+def test_unknown_matchers_in_the_selection_are_ignored(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    selection_path = tmp_path / "matchers.json"
+    selection_path.write_text(
+        '{"a.png": "orb", "b.png": "sift", "c.png": "sqdiff"}', encoding="utf-8"
+    )
+    controller = RemoteController(
+        target="com.game",
+        host="",
+        serial="",
+        enable=True,
+        image_list=image_list,
+        matcher_selection_path=selection_path.as_posix(),
+    )
+    assert controller.matcher_selection == {"a.png": "orb", "c.png": "sqdiff"}
+
+
+async def test_reload_swaps_the_config_and_keeps_what_did_not_change(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    confirm = cv2.imread(image_list[0]["image_path"])
+    cv2.imwrite((tmp_path / "a.png").as_posix(), confirm)
+    cv2.imwrite(
+        (tmp_path / "b.png").as_posix(), cv2.imread(data_dir.joinpath("back.png").as_posix())
+    )
+    images = [
+        {**image_list[0], "image_name": name, "image_path": (tmp_path / f"{name}.png").as_posix()}
+        for name in ("a", "b")
+    ]
+    match_pool = ProcessMatchPool(max_workers=1)
+    controller = RemoteController(
+        target="com.game",
+        host="",
+        serial="",
+        enable=True,
+        image_list=images,
+        match_pool=match_pool,
+    )
+    templates = {
+        image["image_name"]: compare._load_and_convert_template(image["image_path"])
+        for image in images
+    }
+    controller.change_detector.update(Frame(source=b"", gray=np.zeros((720, 1280), np.uint8)))
+    for index in range(2):
+        controller.hit_stats.record(index, hit=index == 0, tick=0)
+        controller.change_detector.mark((images[index]["image_name"], images[index]["image_path"]))
+        controller.previous_results[(images[index]["image_name"], images[index]["image_path"])] = (
+            FoundPosition(button_x=index, button_y=index)
+        )
+    probability_a, probability_b = controller.hit_stats.probability()
+
+    # b is edited in place, c is new and a moves to the end
+    cv2.imwrite(images[1]["image_path"], cv2.flip(confirm, 1))
+    cv2.imwrite((tmp_path / "c.png").as_posix(), cv2.flip(confirm, 0))
+    new_images = [
+        images[1],
+        {**images[0], "image_name": "c", "image_path": (tmp_path / "c.png").as_posix()},
+        images[0],
+    ]
+    controller.pending_config = ConfigModel(
+        target="com.game",
+        host="",
+        serial="",
+        enable=True,
+        image_list=new_images,
+        stop_after_click=True,
+        capture_mode="stream",
+    )
+    # Nothing changes until the reload runs between two ticks
+    assert [image.image_name for image in controller.image_list] == ["a", "b"]
+    await controller.reload()
+
+    assert controller.pending_config is None
+    assert [image.image_name for image in controller.image_list] == ["b", "c", "a"]
+    assert controller.stop_after_click is True
+    # The capture session is kept, so its fields need a restart
+    assert controller.capture_mode == "png"
+    # Only the edited template is read again
+    assert compare._load_and_convert_template(images[0]["image_path"]) is templates["a"]
+    reloaded_b = compare._load_and_convert_template(images[1]["image_path"])
+    assert reloaded_b is not templates["b"]
+    assert np.array_equal(reloaded_b, cv2.flip(templates["a"], 1))
+    probability = controller.hit_stats.probability()
+    # Hit counts follow the images to their new place, the new image starts without any
+    assert probability.tolist() == [probability_b, 0.5, probability_a]
+    assert list(controller.previous_results) == [("a", images[0]["image_path"])]
+    # The edited template is never compared with frames marked for its old result
+    assert list(controller.change_detector._references) == [("a", images[0]["image_path"])]
+
+    controller.pending_config = ConfigModel(
+        target="com.game", host="", serial="", enable=True, image_list=new_images
+    )
+    await controller.reload()
+    # Only the bundle in use keeps a region however often the config is reloaded
+    assert [region[3] for region in match_pool._regions] == [controller.template_bundles[1.0].path]
+    match_pool.shutdown()
+
+
+async def test_reload_onto_an_unreadable_template_keeps_the_running_config(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    controller = RemoteController(
+        target="com.game", host="", serial="", enable=True, image_list=image_list
+    )
+    bundles = dict(controller.template_bundles)
+    partial = tmp_path / "partial.png"
+    partial.write_bytes(b"\x89PNG\r\n")
+    controller.pending_config = ConfigModel(
+        target="com.game",
+        host="",
+        serial="",
+        enable=True,
+        image_list=[*image_list, {**image_list[0], "image_path": partial.as_posix()}],
+        stop_after_click=False,
+    )
+    await controller.reload()
+
+    assert controller.pending_config is None
+    assert [image.image_path for image in controller.image_list] == [image_list[0]["image_path"]]
+    assert controller.stop_after_click is True
+    assert controller.template_bundles == bundles
@@ -0,0 +1,136 @@
+import time
+import asyncio
+
+import numpy as np
+import pytest
+from adbutils.errors import AdbError
+
+from auto_click.cores import device as device_module
+from auto_click.cores.device import AsyncAdbDevice
+
+from tests.fake_adb import FakeAdbServer
+
+
+async def test_slow_device_does_not_block_other_devices() -> None:
+    outputs = {"echo hi": b"hi\n"}
+    with FakeAdbServer(outputs, latency=0.5) as slow, FakeAdbServer(outputs) as fast:
+        slow_device = AsyncAdbDevice(serial="slow", client=slow.client)
+        fast_device = AsyncAdbDevice(serial="fast", client=fast.client)
+        slow_call = asyncio.create_task(slow_device.shell("echo hi"))
+        started = time.perf_counter()
+        for _ in range(5):
+            assert await fast_device.shell("echo hi") == "hi"
+        assert time.perf_counter() - started < 0.3
+        assert not slow_call.done()
+        assert await slow_call == "hi"
+        await slow_device.close()
+        await fast_device.close()
+
+
+async def test_timed_out_calls_reconnect_and_retry() -> None:
+    with FakeAdbServer({"echo hi": b"hi\n"}, latency=0.3) as server:
+        device = AsyncAdbDevice(
+            serial="127.0.0.1:5555", client=server.client, max_retries=1, backoff=0.01
+        )
+        with pytest.raises(TimeoutError):
+            await device.run(lambda device: device.shell("echo hi"), call_timeout=0.1)
+        # Taps are never retried
+        with pytest.raises(TimeoutError):
+            await device.run(lambda device: device.shell("echo hi"), call_timeout=0.1, retries=0)
+        await device.close()
+    assert server.commands.count("host:connect:127.0.0.1:5555") == 1
+
+
+class _SlowStream:
+    def __init__(self, device: object) -> None:
+        self.closed = False
+        self.closed_during_capture = False
+
+    def capture(self) -> np.ndarray:
+        time.sleep(0.2)
+        self.closed_during_capture = self.closed
+        return np.zeros((4, 4, 4), dtype=np.uint8)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+async def test_reconnect_waits_for_a_capture_in_progress(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(device_module, "FramebufferStream", _SlowStream)
+
+    def fail(_device: object) -> None:
+        raise AdbError("device offline")
+
+    with FakeAdbServer({}) as server:
+        device = AsyncAdbDevice(serial="fake", client=server.client, backoff=0.01)
+        capture = asyncio.create_task(device.capture("stream"))
+        await asyncio.sleep(0.05)
+        stream = device._stream
+        # The failed call reconnects on the other worker while the capture is running
+        with pytest.raises(AdbError):
+            await device.run(fail, retries=1)
+        assert (await capture).shape == (4, 4, 4)
+        await device.close()
+    assert stream.closed
+    assert not stream.closed_during_capture
+
+
+async def test_taps_are_batched_through_one_input_shell() -> None:
+    done = b"__auto_click_input_done__\n"
+    with FakeAdbServer({"echo __auto_click_input_done__": done}, latency=0.2) as server:
+        device = AsyncAdbDevice(serial="fake", client=server.client, touch_injection=False)
+        first = asyncio.create_task(device.click(10, 20))
+        await asyncio.sleep(0.05)
+        # Everything queued while the first tap is on its way follows in one batch
+        latencies = await asyncio.gather(
+            *[device.click(x, 40) for x in range(3)], device.swipe(1, 2, 3, 4)
+        )
+        assert 200 <= await first < latencies[0]
+        await device.close()
+    assert server.commands == [
+        "input tap 10 20;echo __auto_click_input_done__",
+        "input tap 0 40;input tap 1 40;input tap 2 40;input swipe 1 2 3 4 300;"
+        "echo __auto_click_input_done__",
+    ]
+
+
+_GETEVENT = b"""add device 1: /dev/input/event3
+  name:     "gpio-keys"
+  events:
+    KEY (0001): 0072  0073  0074
+add device 2: /dev/input/event2
+  name:     "sec_touchscreen"
+  events:
+    KEY (0001): 014a
+    ABS (0003): 0035  : value 0, min 0, max 4095, fuzz 0, flat 0, resolution 0
+                0036  : value 0, min 0, max 4095, fuzz 0, flat 0, resolution 0
+                0039  : value 0, min 0, max 65535, fuzz 0, flat 0, resolution 0
+"""
+
+
+async def test_taps_are_written_to_the_touchscreen() -> None:
+    outputs = {
+        "getevent -p": _GETEVENT,
+        "wm size": b"Physical size: 1080x2400\n",
+        # The game runs in landscape on a phone that is naturally portrait
+        "dumpsys input": b"    SurfaceOrientation: 1\n",
+        "test -w /dev/input/event2 && echo writable": b"writable\n",
+        "echo __auto_click_input_done__": b"__auto_click_input_done__\n",
+    }
+    with FakeAdbServer(outputs) as server:
+        device = AsyncAdbDevice(serial="fake", client=server.client)
+        await device.click(600, 270)
+        await device.close()
+    event = "sendevent /dev/input/event2"
+    # A quarter across the landscape screen is a quarter down the portrait panel
+    assert server.commands[-1] == ";".join([
+        f"{event} 3 57 1",
+        f"{event} 1 330 1",
+        f"{event} 3 53 3072",
+        f"{event} 3 54 1024",
+        f"{event} 0 0 0",
+        f"{event} 3 57 -1",
+        f"{event} 1 330 0",
+        f"{event} 0 0 0",
+        "echo __auto_click_input_done__",
+    ])
@@ -0,0 +1,32 @@
+import cv2
+import numpy as np
+
+from auto_click.cores.compare import Frame
+from auto_click.cores.framebuffer import FramebufferStream, capture_raw
+
+from tests.fake_adb import FakeAdbServer, raw_screencap
+
+recorded = cv2.cvtColor(cv2.imread("./data/allstars/game_5v5.png"), cv2.COLOR_BGR2RGBA)
+
+
+def test_capture_raw_wraps_framebuffer_for_both_header_sizes() -> None:
+    for header_size in (12, 16):
+        outputs = {"screencap": raw_screencap(recorded, header_size=header_size)}
+        with FakeAdbServer(outputs) as server:
+            pixels = capture_raw(server.client.device(serial="fake"))
+        assert pixels.shape == recorded.shape
+        assert np.array_equal(pixels, recorded)
+        frame = Frame.from_screenshot(pixels)
+        assert np.array_equal(frame.gray, cv2.cvtColor(recorded, cv2.COLOR_RGBA2GRAY))
+
+
+def test_stream_keeps_one_shell_session() -> None:
+    frames = iter([recorded, 255 - recorded, recorded])
+    outputs = {"screencap": lambda: raw_screencap(next(frames))}
+    with FakeAdbServer(outputs) as server:
+        stream = FramebufferStream(device=server.client.device(serial="fake"))
+        captured = [stream.capture() for _ in range(3)]
+        stream.close()
+    assert np.array_equal(captured[1], 255 - recorded)
+    assert np.array_equal(captured[2], recorded)
+    assert server.commands == ["screencap", "screencap", "screencap"]
@@ -0,0 +1,31 @@
+import time
+from types import SimpleNamespace
+
+from auto_click.cores.manager import ForegroundIndex
+
+
+def test_refresh_is_concurrent_and_cached(monkeypatch) -> None:
+    queried: list[str] = []
+
+    def query_package(device: SimpleNamespace) -> str:
+        queried.append(device.serial)
+        time.sleep(0.1)
+        return device.package
+
+    monkeypatch.setattr(ForegroundIndex, "_query_package", staticmethod(query_package))
+    devices = [
+        SimpleNamespace(serial=f"127.0.0.1:{16384 + i * 32}", package=f"com.game{i % 2}")
+        for i in range(10)
+    ]
+    index = ForegroundIndex(ttl=60)
+    started = time.perf_counter()
+    index.refresh(devices)
+    assert time.perf_counter() - started < 0.5
+    assert len(index.serials_for("com.game0")) == 5
+
+    index.refresh(devices)
+    assert len(queried) == 10
+
+    index.refresh(devices[:3])
+    assert len(queried) == 10
+    assert index.serials_for("com.game1") == ["127.0.0.1:16416"]
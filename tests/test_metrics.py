@@ -0,0 +1,47 @@
+import json
+import asyncio
+from pathlib import Path
+
+from auto_click.cores.metrics import TickMetrics, LatencyHistogram
+
+
+def test_histogram_buckets_and_quantiles() -> None:
+    histogram = LatencyHistogram()
+    for elapsed_ms in [0.5, 3, 3, 4, 40, 700]:
+        histogram.observe(elapsed_ms)
+    summary = histogram.summary()
+    assert summary["count"] == 6
+    assert summary["buckets"] == {"1": 1, "5": 3, "50": 1, "1000": 1}
+    assert summary["p50_ms"] == 5
+    assert summary["p95_ms"] == 700
+
+
+async def test_stages_are_dumped_and_scraped(tmp_path: Path) -> None:
+    metrics = TickMetrics()
+    with metrics.measure("device", "capture"):
+        await asyncio.sleep(0.01)
+    metrics.observe("device", "match", 12.0, template="confirm.png")
+    metrics.increment("device", "hits", template="confirm.png")
+
+    dump_path = tmp_path / "metrics.json"
+    metrics.dump(dump_path.as_posix())
+    snapshot = json.loads(dump_path.read_text())
+    capture = next(stage for stage in snapshot["stages"] if stage["stage"] == "capture")
+    assert capture["count"] == 1
+    assert capture["max_ms"] >= 10
+    assert snapshot["counters"] == [
+        {"device": "device", "name": "hits", "template": "confirm.png", "value": 1}
+    ]
+
+    server = await metrics.serve(port=0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    response = (await reader.read()).decode()
+    writer.close()
+    server.close()
+    assert response.startswith("HTTP/1.1 200 OK")
+    assert (
+        'auto_click_stage_milliseconds_count{device="device",stage="match",'
+        'template="confirm.png"} 1' in response
+    )
@@ -0,0 +1,56 @@
+import json
+import time
+from typing import ClassVar
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from auto_click.cores.notify import DiscordNotify, NotificationDispatcher
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    """Answers the first request with a rate limit and later ones after a slow response."""
+
+    received: ClassVar[list[dict]] = []
+
+    def do_POST(self) -> None:
+        """Records the posted payload."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if not self.received:
+            self.received.append({})
+            self._respond(429, json.dumps({"retry_after": 0.05}).encode())
+            return
+        time.sleep(0.2)
+        self.received.append(json.loads(body))
+        self._respond(204, b"")
+
+    def _respond(self, status: int, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_: object) -> None:
+        """Keeps the test output quiet."""
+
+
+async def test_dispatcher_coalesces_and_retries_rate_limits() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Webhook)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/webhook"
+    dispatcher = NotificationDispatcher(coalesce_window=60.0, backoff=0.01)
+    try:
+        started = time.perf_counter()
+        for description in ["first", "second", "third"]:
+            notify = DiscordNotify(
+                title="發生錯誤", description=description, discord_webhook_url=url
+            )
+            dispatcher.submit(notify)
+        dispatcher.submit(DiscordNotify(title="完成", description="done", discord_webhook_url=url))
+        # Submitting never waits for the slow webhook
+        assert time.perf_counter() - started < 0.1
+        await dispatcher.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+    delivered = [payload["embeds"][0]["description"] for payload in _Webhook.received[1:]]
+    assert delivered == ["first", "done"]
@@ -0,0 +1,94 @@
+import time
+import asyncio
+from pathlib import Path
+import threading
+
+import numpy as np
+
+from auto_click.cores.pool import MatchPool, ProcessMatchPool
+from auto_click.cores.bundle import TemplateBundle
+from auto_click.cores.compare import _sync_match_template
+
+
+async def test_owners_are_served_round_robin() -> None:
+    match_pool = MatchPool(max_workers=1)
+    order: list[str] = []
+
+    def job(owner: str) -> str:
+        order.append(owner)
+        return owner
+
+    busy = [match_pool.run("busy", job, "busy") for _ in range(8)]
+    quiet = [match_pool.run("quiet", job, "quiet") for _ in range(2)]
+    results = await asyncio.gather(*busy, *quiet)
+    match_pool.shutdown()
+    assert results.count("busy") == 8
+    # The first busy job starts before the quiet device has submitted anything
+    assert order[:5] == ["busy", "busy", "quiet", "busy", "quiet"]
+
+
+async def test_pool_is_bounded() -> None:
+    match_pool = MatchPool(max_workers=2)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def job() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    await asyncio.gather(*[match_pool.run(f"device{i % 3}", job) for i in range(9)])
+    match_pool.shutdown()
+    assert peak == 2
+
+
+async def test_process_pool_matches_shared_frames_and_bundled_templates(tmp_path) -> None:
+    image_path = Path(__file__).parents[1].joinpath("data/allstars/confirm.png").as_posix()
+    bundle = TemplateBundle.compile([image_path], (tmp_path / "t.bundle").as_posix())
+    template = bundle.get(image_path)
+    rng = np.random.default_rng(seed=0)
+    gray = rng.integers(0, 255, size=(1080, 1920), dtype=np.uint8)
+    gray[814 : 814 + template.shape[0], 1232 : 1232 + template.shape[1]] = template
+    window = gray[700:1000, 1100:1600]
+
+    match_pool = ProcessMatchPool(max_workers=2)
+    match_pool.share_bundle(bundle)
+    match_pool.share([gray])
+    try:
+        # Neither the frame window nor the template is pickled, only where to find them
+        assert match_pool._describe(window)[0] == "shm"
+        assert match_pool._describe(template)[:2] == ("file", bundle.path)
+        results = await asyncio.gather(
+            match_pool.run("a", _sync_match_template, window, template),
+            match_pool.run("b", _sync_match_template, gray, template),
+        )
+    finally:
+        match_pool.release([gray])
+        match_pool.shutdown()
+    assert results[0][1] == (132, 114)
+    assert results[1][1] == (1232, 814)
+    assert min(score for score, _ in results) > 0.99
+    assert [region[2] for region in match_pool._regions] == ["file"]
+
+
+def test_a_reloaded_bundle_replaces_the_region_of_its_path(tmp_path) -> None:
+    image_path = Path(__file__).parents[1].joinpath("data/allstars/confirm.png").as_posix()
+    bundle_path = (tmp_path / "t.bundle").as_posix()
+    first = TemplateBundle.compile([image_path], bundle_path)
+    match_pool = ProcessMatchPool(max_workers=1)
+    match_pool.share_bundle(first)
+    for _ in range(3):
+        match_pool.share_bundle(TemplateBundle.load(bundle_path))
+    latest = match_pool._bundles[bundle_path]
+    # One region per path, owned by the mapping it describes
+    [region] = match_pool._regions
+    assert region[3] == bundle_path
+    assert region[5] is latest.data
+    assert isinstance(match_pool._describe(first.get(image_path)), np.ndarray)
+    assert match_pool._describe(latest.get(image_path))[:2] == ("file", bundle_path)
+    match_pool.shutdown()
@@ -0,0 +1,36 @@
+import os
+from pathlib import Path
+
+from auto_click.cores.reload import ConfigWatcher
+
+config_text = Path("./configs/games/all_stars.yaml").read_text(encoding="utf-8")
+
+
+def _rewrite(config_path: Path, content: str, version: int) -> None:
+    config_path.write_text(content, encoding="utf-8")
+    # Saves within one clock tick must still count as a change
+    os.utime(config_path, ns=(version, version))
+
+
+def test_only_valid_changes_are_handed_out(tmp_path: Path) -> None:
+    config_path = tmp_path / "all_stars.yaml"
+    _rewrite(config_path, config_text, version=1)
+    watcher = ConfigWatcher(path=config_path.as_posix(), overrides={"serial": "5555"})
+    assert watcher.poll() is None
+
+    _rewrite(config_path, config_text.replace("confidence: 0.75", "confidence: 0.9"), version=2)
+    config = watcher.poll()
+    assert config is not None
+    assert config.image_list[0].confidence == 0.9
+    assert config.serial == "5555"
+    assert watcher.poll() is None
+
+    _rewrite(config_path, config_text.replace("confidence: 0.75", "confidence: [0.9"), version=3)
+    assert watcher.poll() is None
+    _rewrite(config_path, config_text.replace("start.png", "missing.png"), version=4)
+    assert watcher.poll() is None
+    # A template caught halfway through being saved exists but does not decode
+    (tmp_path / "partial.png").write_bytes(b"\x89PNG\r\n")
+    partial = (tmp_path / "partial.png").as_posix()
+    _rewrite(config_path, config_text.replace("./data/allstars/start.png", partial), version=5)
+    assert watcher.poll() is None
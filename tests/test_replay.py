@@ -0,0 +1,36 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from auto_click.cores.replay import ReplaySource, read_recording, write_recording
+
+frames = [(100.0, b"first"), (100.2, b"second"), (100.4, b"third")]
+
+
+def test_recording_round_trip(tmp_path: Path) -> None:
+    path = (tmp_path / "session.frames").as_posix()
+    assert write_recording(path, frames) == 3
+    assert read_recording(path) == frames
+    (tmp_path / "bad.frames").write_bytes(b"not a recording")
+    with pytest.raises(ValueError, match="Not a recorded-frame file"):
+        read_recording((tmp_path / "bad.frames").as_posix())
+
+
+async def test_replay_timing_and_clicks(tmp_path: Path) -> None:
+    path = (tmp_path / "session.frames").as_posix()
+    write_recording(path, frames)
+
+    source = ReplaySource.from_target(f"replay://{path}?speed=2")
+    started = time.perf_counter()
+    assert [await source.next_frame() for _ in frames] == [image for _, image in frames]
+    # 0.4s of recording at double speed
+    assert time.perf_counter() - started == pytest.approx(0.2, abs=0.1)
+    source.device.click(x=10, y=20)
+    assert source.device.clicks[0].frame == 2
+    with pytest.raises(EOFError):
+        await source.next_frame()
+
+    looping = ReplaySource.from_target(f"replay://{path}?speed=0&loop=1")
+    served = [await looping.next_frame() for _ in range(4)]
+    assert served[3] == b"first"
@@ -0,0 +1,34 @@
+import pytest
+from pydantic import ValidationError
+
+from auto_click.cores.scene import SceneTracker
+from auto_click.cores.config import SceneModel, ConfigModel
+
+scenes = [
+    SceneModel(name="lobby", images=["開始配對"], transitions={"開始配對": "result"}),
+    SceneModel(
+        name="result", images=["勝利", "失敗", "確認"], transitions={"確認": "lobby"}, timeout=60
+    ),
+]
+
+
+def test_hits_move_along_the_scene_graph_and_time_out() -> None:
+    tracker = SceneTracker(scenes=scenes, default_timeout=10)
+    assert tracker.active_images(now=0) == {"開始配對"}
+    tracker.observe(["開始配對"], now=1)
+    assert tracker.active_images(now=30) == {"勝利", "失敗", "確認"}
+    # A hit without a transition keeps the scene alive
+    tracker.observe(["勝利"], now=50)
+    assert tracker.active_images(now=100) == {"勝利", "失敗", "確認"}
+    assert tracker.active_images(now=111) is None
+    assert tracker.current is None
+    # After the full scan, the hit's transition tells where the game is
+    tracker.observe(["確認"], now=112)
+    assert tracker.current == "lobby"
+
+
+def test_scenes_must_name_known_images() -> None:
+    with pytest.raises(ValidationError, match="unknown images"):
+        ConfigModel(
+            target="com.example", host="", serial="", enable=True, image_list=[], scenes=scenes
+        )
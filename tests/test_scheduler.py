@@ -0,0 +1,36 @@
+import numpy as np
+
+from auto_click.scheduler import PollingScheduler
+from auto_click.cores.change import TileChangeDetector
+from auto_click.cores.compare import Frame
+
+
+def test_backs_off_when_idle_and_snaps_back() -> None:
+    scheduler = PollingScheduler(min_delay=0.1, max_delay=1.0, backoff_factor=2.0)
+    delays = [
+        scheduler.next_delay(clicked=False, matched=False, screen_changed=False) for _ in range(6)
+    ]
+    assert delays[0] == 0.1
+    assert delays[1:4] == [0.2, 0.4, 0.8]
+    assert delays[-1] == 1.0
+    assert scheduler.next_delay(clicked=True, matched=True, screen_changed=False) == 0.1
+    scheduler.next_delay(clicked=False, matched=False, screen_changed=False)
+    assert scheduler.next_delay(clicked=False, matched=False, screen_changed=True) == 0.1
+
+
+def test_backs_off_on_a_static_browser_page_captured_in_clips() -> None:
+    scheduler = PollingScheduler(min_delay=0.1, max_delay=1.0, backoff_factor=2.0)
+    detector = TileChangeDetector()
+    page = np.random.default_rng(seed=0).integers(0, 255, size=(720, 1280), dtype=np.uint8)
+    delays = []
+    for tick in range(6):
+        # Every third tick captures the whole page, the others the area around the buttons
+        if tick % 3 == 0:
+            frame = Frame(source=b"", gray=page.copy())
+        else:
+            frame = Frame(source=b"", gray=page[128:400, 256:900].copy(), origin=(256, 128))
+        detector.update(frame)
+        delays.append(
+            scheduler.next_delay(clicked=False, matched=False, screen_changed=detector.any_dirty)
+        )
+    assert delays == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
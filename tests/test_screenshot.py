@@ -0,0 +1,120 @@
+import socket
+import asyncio
+from pathlib import Path
+
+import numpy as np
+import pytest
+from adbutils import AdbClient
+from adbutils.errors import AdbError
+
+pytest.importorskip("playwright")
+pytest.importorskip("pyautogui")
+
+from playwright.async_api import Page
+
+from auto_click.cores.metrics import TickMetrics
+from auto_click.cores.screenshot import ForegroundError, ScreenshotManager
+
+from tests.fake_adb import FakeAdbServer, raw_screencap
+
+PAGE = """<html><body style="margin:0">
+<script>window.loads = (window.loads || 0) + 1;</script>
+<div style="width:100px;height:50px;margin:200px 0 0 300px;background:#f00"></div>
+</body></html>"""
+
+
+async def test_persistent_browser_capture_navigates_once_and_clips(tmp_path: Path) -> None:
+    page_path = tmp_path / "index.html"
+    page_path.write_text(PAGE, encoding="utf-8")
+    url = page_path.as_uri()
+    manager = ScreenshotManager(browser_channel=None)
+    try:
+        full = await manager.from_browser(url=url, mode="persistent")
+        page = full.device
+        await page.evaluate("window.marker = 1")
+        clipped = await manager.from_browser(
+            url=url, mode="persistent", clip=(250, 150, 450, 300), image_format="jpeg"
+        )
+        # The page was not reloaded, so state set between captures survives
+        assert await page.evaluate("window.marker") == 1
+        assert clipped.origin == (250, 150)
+        assert clipped.to_image().size == (200, 150)
+        screencast = await manager.from_browser(url=url, mode="screencast", image_format="jpeg")
+        assert screencast.screenshot[:2] == b"\xff\xd8"
+    finally:
+        await manager.cleanup()
+
+
+class _QuietPage(Page):
+    def __init__(self) -> None:
+        pass
+
+    @property
+    def viewport_size(self) -> dict[str, int]:
+        return {"width": 800, "height": 800}
+
+    async def screenshot(self, **options: object) -> bytes:
+        return f"screenshot {options['type']}".encode()
+
+
+async def test_screencast_without_frames_falls_back_to_a_screenshot() -> None:
+    manager = ScreenshotManager(browser_channel=None, screencast_timeout=0.05)
+    # A screencast is running on a page that has not painted since it started
+    manager._browser_page = _QuietPage()
+    manager._browser_url = "https://game.example"
+    manager._cdp_session = object()
+    manager._screencast_ready = asyncio.Event()
+    screenshot = await manager.from_browser(
+        url="https://game.example", mode="screencast", clip=(0, 0, 10, 10), image_format="jpeg"
+    )
+    assert screenshot.screenshot == b"screenshot jpeg"
+    assert screenshot.origin == (0, 0)
+
+
+def fake_phone(focus: dict[str, str]) -> FakeAdbServer:
+    """A device showing `focus["package"]` in the foreground and a black 4x4 screen."""
+    return FakeAdbServer({
+        "dumpsys window windows": lambda: (
+            f"mCurrentFocus=Window{{1 u0 {focus['package']}/.Main}}\n".encode()
+        ),
+        "screencap": raw_screencap(np.zeros((4, 4, 4), dtype=np.uint8)),
+    })
+
+
+async def test_foreground_app_is_verified_in_the_background() -> None:
+    focus = {"package": "com.game"}
+    with fake_phone(focus) as server:
+        manager = ScreenshotManager(adb_client=server.client, metrics=TickMetrics())
+        capture = {"url": "com.game", "serial": "fake", "mode": "raw", "check_interval": 0.05}
+        try:
+            await manager.from_adb(**capture)
+            focus["package"] = "com.launcher"
+            await asyncio.sleep(0.3)
+            with pytest.raises(ForegroundError):
+                await manager.from_adb(**capture)
+            focus["package"] = "com.game"
+            await asyncio.sleep(0.3)
+            screenshot = await manager.from_adb(**capture)
+            assert screenshot.screenshot.shape == (4, 4, 4)
+        finally:
+            await manager.cleanup()
+    stages = manager.metrics.snapshot()["stages"]
+    checks = [h for h in stages if h["stage"] == "foreground_check" and h["device"] == "fake"]
+    assert checks[0]["count"] >= 4
+
+
+async def test_failed_connect_is_retried_on_the_next_capture() -> None:
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        dead_port = unused.getsockname()[1]
+    manager = ScreenshotManager(adb_client=AdbClient(host="127.0.0.1", port=dead_port))
+    capture = {"url": "com.game", "serial": "127.0.0.1:5555", "mode": "raw"}
+    try:
+        with pytest.raises(AdbError):
+            await manager.from_adb(**capture)
+        with fake_phone({"package": "com.game"}) as server:
+            manager.adb_client = server.client
+            await manager.from_adb(**capture)
+        assert "host:connect:127.0.0.1:5555" in server.commands
+    finally:
+        await manager.cleanup()
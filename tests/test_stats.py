@@ -0,0 +1,31 @@
+from auto_click.cores.stats import HitStatistics
+
+
+def test_frequent_hits_come_first_and_rare_images_wait() -> None:
+    stats = HitStatistics(size=3, warmup=5, rare_hit_rate=0.2, max_interval=4)
+    # Untested images keep their config order
+    assert stats.order([0, 1, 2]) == [0, 1, 2]
+    for tick in range(40):
+        stats.record(0, hit=False, tick=tick)
+        stats.record(1, hit=tick % 10 == 0, tick=tick)
+        stats.record(2, hit=True, tick=tick)
+    assert stats.order([0, 1, 2]) == [2, 1, 0]
+    assert stats.interval(2) == 1
+    assert stats.interval(1) == 1
+    assert stats.interval(0) == 4
+    assert not stats.is_due(0, tick=42)
+    assert stats.is_due(0, tick=43)
+    assert stats.is_due(2, tick=40)
+
+
+def test_kept_images_keep_their_counts_after_a_reindex() -> None:
+    stats = HitStatistics(size=2, warmup=0)
+    for tick in range(10):
+        stats.record(0, hit=False, tick=tick)
+        stats.record(1, hit=True, tick=tick)
+    hit_rate = stats.probability()[1]
+    stats.reindex([1, None, 0])
+    assert stats.size == 3
+    assert stats.probability()[0] == hit_rate
+    assert stats.probability()[1] == 0.5
+    assert stats.order([0, 1, 2]) == [0, 1, 2]